@@ -0,0 +1,96 @@
+import time
+from threading import Event
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+RESYNC_INTERVAL = 30 * 60  # Контрольная сверка (accounts.txt, потерянные аккаунты), сек
+
+
+class AccountReconciler:
+    """
+    Сверяет нужный набор аккаунтов с уже запущенными и действует только на разницу:
+    новые аккаунты планируются, удалённые снимаются, потерянные (без таймера, не в очереди
+    и не в обработке) планируются заново.
+
+    Сверка выполняется по событию request() (изменение настроек, новые профили AdsPower)
+    и раз в resync_interval секунд. Запуск аккаунтов по времени выполняют таймеры
+    DeadlineScheduler, сверка для этого не нужна.
+    """
+
+    def __init__(self, get_desired, get_tracked, add_accounts, remove_accounts,
+                 stop_event, resync_interval=RESYNC_INTERVAL):
+        """
+        :param get_desired: Функция, возвращающая список нужных аккаунтов.
+        :param get_tracked: Функция, возвращающая множество аккаунтов с таймером, в очереди или в обработке.
+        :param add_accounts: Функция, планирующая список аккаунтов.
+        :param remove_accounts: Функция, снимающая список аккаунтов.
+        :param stop_event: Событие остановки.
+        :param resync_interval: Интервал контрольной сверки (сек).
+        """
+        self.get_desired = get_desired
+        self.get_tracked = get_tracked
+        self.add_accounts = add_accounts
+        self.remove_accounts = remove_accounts
+        self.stop_event = stop_event
+        self.resync_interval = resync_interval
+        self.wake = Event()
+        self.known = set()
+
+    def request(self, *args):
+        """
+        Запрашивает сверку. Аргументы игнорируются, чтобы метод можно было
+        передавать как обработчик событий.
+        """
+        self.wake.set()
+
+    def reconcile(self):
+        """
+        Выполняет одну сверку.
+
+        :return: Кортеж (добавленные, удалённые, восстановленные аккаунты).
+        """
+        desired = list(self.get_desired())
+        if not desired and self.known:
+            # Источник списка недоступен (например, AdsPower не отвечает): ничего не снимаем
+            logger.warning("Account list is empty. Keeping current accounts.")
+            return [], [], []
+        desired_set = set(desired)
+        tracked = self.get_tracked()
+
+        added = [account for account in desired if account not in self.known]
+        removed = [account for account in self.known if account not in desired_set]
+        orphaned = [account for account in desired
+                    if account in self.known and account not in tracked]
+
+        if removed:
+            logger.info(f"Accounts removed: {len(removed)}.")
+            self.remove_accounts(removed)
+        if added or orphaned:
+            if added:
+                logger.info(f"Accounts added: {len(added)}.")
+            if orphaned:
+                logger.debug(f"Rescheduling accounts without timers: {orphaned}")
+            self.add_accounts(added + orphaned)
+
+        self.known = desired_set
+        return added, removed, orphaned
+
+    def run(self):
+        """
+        Выполняет первую сверку и затем сверяет по событиям до установки stop_event.
+        """
+        next_resync = time.monotonic()  # Первая сверка выполняется сразу
+        while not self.stop_event.is_set():
+            # Короткие ожидания, чтобы быстро реагировать на stop_event
+            if time.monotonic() < next_resync and not self.wake.wait(1):
+                continue
+            self.wake.clear()
+            if self.stop_event.is_set():
+                break
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"Error during account reconciliation: {e}")
+            next_resync = time.monotonic() + self.resync_interval
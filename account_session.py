@@ -0,0 +1,221 @@
+import time
+from threading import Lock
+from colorama import Fore
+import logging
+from retry_policy import NavigationError, SelectorMissingError, InvalidBalanceError, ResourceLimitError
+from browser_watchdog import browser_watchdog
+from settings_manager import settings_manager
+from utils import stop_event, is_debug_enabled
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+# Открытые сессии браузера в этом процессе (закрываются при остановке)
+active_bots = set()
+active_bots_lock = Lock()
+
+
+def parse_balance(balance, account=None):
+    """
+    Парсинг баланса из строки в число.
+
+    :param balance: Строка с балансом.
+    :param account: Аккаунт (для логирования).
+    :return: Баланс в формате float или 0.0 при ошибке.
+    """
+    try:
+        if balance is None:
+            if is_debug_enabled():
+                logger.debug(
+                    f"#{account}: Received None for balance. Returning 0.0.")
+            return 0.0
+
+        if isinstance(balance, (int, float)):
+            if is_debug_enabled():
+                logger.debug(
+                    f"#{account}: Balance is already numeric: {balance}")
+            return float(balance)
+
+        if isinstance(balance, str) and balance.replace('.', '', 1).isdigit():
+            parsed_balance = float(balance)
+            if is_debug_enabled():
+                logger.debug(
+                    f"#{account}: Parsed balance successfully: {parsed_balance}")
+            return parsed_balance
+
+        if is_debug_enabled():
+            logger.debug(
+                f"#{account}: Invalid balance format: {balance}. Returning 0.0.")
+        return 0.0
+    except Exception as e:
+        logger.error(f"#{account}: Error parsing balance: {e}")
+        if is_debug_enabled():
+            logger.debug(
+                f"#{account}: Error traceback:", exc_info=True)
+        return 0.0
+
+
+def navigate_and_perform_actions(bot, account, emit, wait_for_full=0):
+    """
+    Навигация и выполнение всех задач с ботом.
+
+    :param emit: Функция emit(вид, данные) для передачи этапов ("phase")
+                 и доступности зависимостей ("success") обработчику аккаунта.
+    :param wait_for_full: Сколько секунд ждать заполнения хранилища (см. TelegramBotAutomation.farming).
+    """
+    if stop_event.is_set():
+        logger.info("Stop event detected. Aborting navigation and actions.")
+        return
+
+    emit("phase", "navigate")
+    if not bot.navigate_to_bot():
+        raise NavigationError("Failed to navigate to bot")
+    emit("success", "telegram")
+
+    if stop_event.is_set():
+        logger.debug("Stop event detected. Aborting after navigation.")
+        return
+
+    emit("phase", "send_message")
+    if not bot.send_message():
+        raise SelectorMissingError("Failed to send message")
+
+    if stop_event.is_set():
+        logger.debug("Stop event detected. Aborting after sending message.")
+        return
+
+    emit("phase", "open_app")
+    if not bot.click_link():
+        raise SelectorMissingError("Failed to start app")
+
+    if stop_event.is_set():
+        logger.debug("Stop event detected. Aborting after starting app.")
+        return
+
+    # if bot.is_new_account_page():
+    #     if bot.run_account_registration_process():
+    #         logger.info("New account created successfully.")
+    #     else:
+    #         logger.warning("Failed to create new account.")
+    # bot.process_claim_block()
+
+    # if not quest_cache.is_account_completed(account):
+    #     try:
+    #         bot.process_mission_quests()
+    #     except Exception as e:
+    #         logger.error(f"Error occurred during mission quests: {e}")
+    #         bot.open_section(1, "Home")
+    # else:
+    #     logger.info(f"Account {account}: Quests already completed, skipping.")
+
+    if stop_event.is_set():
+        logger.debug("Stop event detected. Aborting before run courses.")
+        return
+
+    emit("phase", "farming")
+    logger.debug("Starting farming...")
+    bot.farming(wait_for_full=wait_for_full)
+    if stop_event.is_set():
+        logger.debug("Stop event detected. Aborting before performing quests.")
+        return
+
+    bot.farming()
+
+
+def run_session(account, options, emit):
+    """
+    Сессия браузера для одного аккаунта: запуск профиля, переход в бот, клейм и чтение
+    состояния. Выполняется в процессе бота или в дочернем процессе (process_pool),
+    поэтому принимает и возвращает только простые данные.
+
+    :param account: Аккаунт.
+    :param options: Словарь: wait_for_full — ожидание заполнения хранилища (сек).
+    :param emit: Функция emit(вид, данные) для событий сессии.
+    :return: Словарь: username, balance, schedule_time, remaining_seconds,
+             storage_readings, claimed_at, finished_at.
+    """
+    # selenium импортируется при первом запуске аккаунта, а не при старте
+    from telegram_bot_automation import TelegramBotAutomation
+
+    bot = None
+    try:
+        emit("phase", "launch")
+        bot = TelegramBotAutomation(account, settings_manager)
+        with active_bots_lock:
+            active_bots.add(bot)
+        emit("success", "adspower")
+
+        # При превышении лимитов памяти или CPU сторож закрывает браузер, сессия прерывается
+        breach = []
+
+        def recycle(reason):
+            breach.append(reason)
+            bot.browser_manager.close_browser()
+
+        browser_watchdog.register(account, bot.browser_manager.debug_port, recycle)
+
+        # Выполнение действий
+        navigate_and_perform_actions(
+            bot, account, emit, options.get("wait_for_full", 0))
+
+        # Получение данных аккаунта
+        emit("phase", "read_state")
+        username = bot.get_username()
+        if not username or username == "N/A":
+            raise NavigationError(
+                f"#{account}: Invalid username")
+
+        balance = parse_balance(bot.get_update_balance(), account)
+        if balance <= 0:
+            raise InvalidBalanceError(
+                f"#{account}: Invalid balance")
+
+        return {
+            "username": username,
+            "balance": balance,
+            "schedule_time": bot.get_remaining_time(),
+            "remaining_seconds": bot.remaining_seconds,
+            "storage_readings": list(bot.storage_readings),
+            "claimed_at": bot.claimed_at,
+            "finished_at": time.time(),
+        }
+    except Exception as e:
+        if bot and breach:
+            raise ResourceLimitError(f"#{account}: {breach[0]}") from e
+        raise
+    finally:
+        browser_watchdog.unregister(account)
+        # При остановке браузер закрывает close_active_sessions
+        if bot and not stop_event.is_set():
+            with active_bots_lock:
+                active_bots.discard(bot)
+            try:
+                bot.browser_manager.close_browser()
+            except Exception:
+                logger.debug(
+                    f"#{account}: Failed to close browser.")
+
+
+def close_active_sessions():
+    """
+    Закрывает браузеры сессий, выполняющихся в этом процессе (при остановке бота).
+    """
+    with active_bots_lock:
+        bots = list(active_bots)
+        active_bots.clear()
+    for bot in bots:
+        try:
+            logger.info("Closing browser during cleanup...",
+                        extra={'color': Fore.CYAN})
+            bot.browser_manager.close_browser()
+        except Exception as e:
+            logger.warning(f"Failed to close browser: {e}")
+
+
+def close_profile(account):
+    """
+    Закрывает профиль AdsPower через API (после принудительного завершения дочернего
+    процесса, когда объект сессии недоступен).
+    """
+    from browser_manager import BrowserManager
+    BrowserManager(account).close_browser()
@@ -0,0 +1,64 @@
+from enum import Enum
+
+
+class AccountStatus(Enum):
+    """
+    Статус аккаунта. Значения совпадают со строками в timers.json и таблицах.
+    """
+    SUCCESS = "Success"
+    ERROR = "ERROR"
+    ACTIVE = "Active"
+
+    @classmethod
+    def parse(cls, value):
+        """
+        Преобразует строку из timers.json в статус (неизвестное значение — ACTIVE).
+        """
+        if isinstance(value, cls):
+            return value
+        try:
+            return cls(value)
+        except ValueError:
+            return cls.ACTIVE
+
+
+class AccountState:
+    """
+    Состояние аккаунта в памяти: время хранится в epoch (int), статус — AccountStatus.
+    Строки формируются только при выводе таблиц и сохранении в timers.json.
+    """
+    __slots__ = ("username", "balance", "next_schedule", "status")
+
+    def __init__(self, username="N/A", balance=0.0, next_schedule=None,
+                 status=AccountStatus.ACTIVE):
+        self.username = username
+        self.balance = balance
+        self.next_schedule = next_schedule  # epoch или None
+        self.status = status
+
+    def to_record(self):
+        """
+        Запись для timers.json.
+        """
+        return {
+            "username": self.username,
+            "balance": self.balance,
+            "next_schedule": self.next_schedule,
+            "status": self.status.value,
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Создаёт состояние из записи timers.json (next_schedule уже в epoch).
+        """
+        return cls(
+            username=record.get("username", "N/A"),
+            balance=record.get("balance", 0.0),
+            next_schedule=record.get("next_schedule"),
+            status=AccountStatus.parse(record.get("status")),
+        )
+
+    def __repr__(self):
+        return (f"AccountState(username={self.username!r}, balance={self.balance!r}, "
+                f"next_schedule={self.next_schedule!r}, status={self.status.value})")
@@ -0,0 +1,112 @@
+import os
+import json
+from threading import Lock
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+STATS_FILE = os.path.join("temp", "account_stats.json")
+MAX_BALANCE_SAMPLES = 20  # Сколько последних замеров баланса хранить на аккаунт
+MAX_DURATION_SAMPLES = 10  # Сколько последних длительностей сессий хранить
+DEFAULT_SESSION_DURATION = 60.0  # Ожидаемая длительность сессии (сек), если истории нет
+
+
+class AccountStats:
+    """
+    Хранит историю балансов и длительностей сессий по аккаунтам.
+    Используется для оценки скорости фарма и ожидаемой длительности запуска.
+    """
+
+    def __init__(self, stats_file=STATS_FILE):
+        """
+        :param stats_file: Путь к файлу статистики; None — хранить только в памяти.
+        """
+        self.stats_file = stats_file
+        self.lock = Lock()
+        self.data = self._load()
+        self._fleet_rate = None  # Кэш средней скорости по всем аккаунтам
+
+    def _load(self):
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return {}
+        try:
+            with open(self.stats_file, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.debug(f"Failed to load account stats '{self.stats_file}': {e}")
+            return {}
+
+    def _save(self):
+        if not self.stats_file:
+            return
+        try:
+            directory = os.path.dirname(self.stats_file)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.stats_file, "w") as f:
+                json.dump(self.data, f)
+        except Exception as e:
+            logger.debug(f"Failed to save account stats '{self.stats_file}': {e}")
+
+    def record_run(self, account, started_at, finished_at, balance):
+        """
+        Сохраняет результат успешного запуска.
+
+        :param account: Аккаунт.
+        :param started_at: Время начала сессии (epoch).
+        :param finished_at: Время окончания сессии (epoch).
+        :param balance: Баланс после сессии.
+        """
+        with self.lock:
+            entry = self.data.setdefault(
+                str(account), {"balances": [], "durations": []})
+            entry["balances"].append([finished_at, balance])
+            entry["balances"] = entry["balances"][-MAX_BALANCE_SAMPLES:]
+            entry["durations"].append(max(0.0, finished_at - started_at))
+            entry["durations"] = entry["durations"][-MAX_DURATION_SAMPLES:]
+            self._fleet_rate = None
+            self._save()
+
+    def farming_rate(self, account):
+        """
+        Возвращает оценку скорости фарма (HOT в час) по истории балансов.
+        Учитываются только приросты баланса. Если истории нет — средняя по всем аккаунтам.
+        """
+        with self.lock:
+            rate = self._account_rate(str(account))
+            if rate is not None:
+                return rate
+            if self._fleet_rate is None:
+                rates = [r for r in (self._account_rate(a) for a in self.data)
+                         if r is not None]
+                self._fleet_rate = sum(rates) / len(rates) if rates else 0.0
+            return self._fleet_rate
+
+    def _account_rate(self, account):
+        samples = self.data.get(account, {}).get("balances", [])
+        if len(samples) < 2:
+            return None
+        earned = 0.0
+        for (_, previous), (_, current) in zip(samples, samples[1:]):
+            if current > previous:
+                earned += current - previous
+        span_hours = (samples[-1][0] - samples[0][0]) / 3600
+        if span_hours <= 0:
+            return None
+        return earned / span_hours
+
+    def expected_session_duration(self, account):
+        """
+        Возвращает ожидаемую длительность сессии аккаунта в секундах.
+        """
+        with self.lock:
+            durations = self.data.get(str(account), {}).get("durations", [])
+            if not durations:
+                return DEFAULT_SESSION_DURATION
+            return sum(durations) / len(durations)
+
+
+# Общий экземпляр статистики
+account_stats = AccountStats()
+
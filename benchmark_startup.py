@@ -0,0 +1,78 @@
+"""
+Замер времени запуска: импорт main.py в отдельном процессе.
+
+Каждый замер выполняется в новом интерпретаторе, поэтому учитывает импорт
+всех модулей и побочные эффекты при импорте.
+
+Пример:
+    python benchmark_startup.py --runs 10
+    python benchmark_startup.py --importtime  # самые долгие импорты
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure(module, runs):
+    """
+    Импортирует модуль runs раз в новых процессах.
+
+    :return: Список длительностей в миллисекундах.
+    """
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"],
+                       check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def slowest_imports(module, limit):
+    """
+    Запускает импорт с -X importtime и возвращает самые долгие модули.
+
+    :return: Список кортежей (накопленное время в мс, модуль).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            check=True, stderr=subprocess.PIPE,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for line in result.stderr.decode("utf-8", "replace").splitlines():
+        match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+(.*)", line)
+        if match:
+            rows.append((int(match.group(1)) / 1000, match.group(2).strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure how long it takes to import the bot.")
+    parser.add_argument("--module", default="main",
+                        help="Module to import")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="Number of measurements")
+    parser.add_argument("--importtime", action="store_true",
+                        help="Show the slowest imports")
+    parser.add_argument("--top", type=int, default=15,
+                        help="Number of imports to show with --importtime")
+    args = parser.parse_args()
+
+    # Первый запуск прогревает кэш байткода и не учитывается
+    measure(args.module, 1)
+    durations = measure(args.module, args.runs)
+    print(f"import {args.module}: min {min(durations):.0f} ms, "
+          f"median {statistics.median(durations):.0f} ms, "
+          f"max {max(durations):.0f} ms ({args.runs} runs)")
+
+    if args.importtime:
+        for cumulative, name in slowest_imports(args.module, args.top):
+            print(f"{cumulative:10.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
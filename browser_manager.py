@@ -1,5 +1,7 @@
 import requests
 import time
+import json
+from urllib.parse import quote
 from selenium import webdriver
 from requests.exceptions import RequestException
 from selenium.webdriver.chrome.service import Service
@@ -7,6 +9,7 @@ from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException
 import traceback
 from utils import visible, stop_event
+from display_pool import display_pool
 from colorama import Fore, Style
 import logging
 
@@ -20,7 +23,11 @@ class BrowserManager:
     def __init__(self, serial_number):
         self.serial_number = serial_number
         self.driver = None
+        self.debug_port = None  # Порт отладки браузера (для browser_watchdog)
+        self.display = None  # Виртуальный дисплей Xvfb браузера (display_pool)
         self.headless_mode = 0 if visible.is_set() else 1
+        # Признак того, что последний запуск не удался из-за недоступности API AdsPower
+        self.api_unreachable = False
 
     def check_browser_status(self):
         """
@@ -119,11 +126,17 @@ class BrowserManager:
                     self.close_browser()
                     stop_event.wait(5)
 
+                # Видимый браузер на сервере без экрана открывается на своём дисплее Xvfb
+                if not self.headless_mode and self.display is None and display_pool.enabled():
+                    self.display = display_pool.acquire()
+
                 # Формирование URL для запуска браузера
                 request_url = (
                     f'http://local.adspower.net:50325/api/v1/browser/start?'
                     f'serial_number={self.serial_number}&ip_tab=0&headless={self.headless_mode}'
                 )
+                if self.display:
+                    request_url += '&launch_args=' + quote(json.dumps([f"--display={self.display}"]))
                 logger.debug(
                     f"#{self.serial_number}: Request URL for starting browser: {request_url}")
 
@@ -131,11 +144,14 @@ class BrowserManager:
                 response = requests.get(request_url)
                 response.raise_for_status()
                 data = response.json()
+                self.api_unreachable = False
                 logger.debug(f"#{self.serial_number}: API response: {data}")
 
                 if data['code'] == 0:
                     selenium_address = data['data']['ws']['selenium']
                     webdriver_path = data['data']['webdriver']
+                    self.debug_port = data['data'].get(
+                        'debug_port') or selenium_address.rsplit(':', 1)[-1]
                     logger.debug(
                         f"#{self.serial_number}: Selenium address: {selenium_address}, WebDriver path: {webdriver_path}")
 
@@ -171,6 +187,7 @@ class BrowserManager:
             except requests.exceptions.RequestException as e:
                 logger.error(
                     f"#{self.serial_number}: Network issue when starting browser: {str(e)}")
+                self.api_unreachable = True
                 retries += 1
                 stop_event.wait(5)
             except WebDriverException as e:
@@ -186,6 +203,7 @@ class BrowserManager:
 
         logger.error(
             f"#{self.serial_number}: Failed to start browser after {self.MAX_RETRIES} retries.")
+        self.release_display()
         return False
 
     def close_browser(self):
@@ -239,6 +257,7 @@ class BrowserManager:
             if data.get('code') == 0:
                 logger.debug(
                     f"#{self.serial_number}: Browser stopped successfully via API.")
+                self.release_display()
                 return True
             else:
                 logger.warning(
@@ -252,4 +271,13 @@ class BrowserManager:
 
         logger.error(
             f"#{self.serial_number}: Browser closure process completed with errors.")
+        self.release_display()
         return False
+
+    def release_display(self):
+        """
+        Освобождает виртуальный дисплей браузера.
+        """
+        if self.display:
+            display_pool.release(self.display)
+            self.display = None
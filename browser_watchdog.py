@@ -0,0 +1,251 @@
+import os
+import sys
+from threading import Lock, Thread
+import logging
+from colorama import Fore
+from utils import stop_event
+from settings_manager import settings_manager
+
+try:
+    import psutil  # Необязательная зависимость: без неё сторож браузеров не работает
+except ImportError:
+    psutil = None
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+WATCHDOG_INTERVAL = 15  # Интервал замеров процессов браузера (сек)
+BREACH_SAMPLES = 3  # Сколько замеров подряд лимит должен быть превышен
+CPU_PERIOD = 100000  # Период cpu.max в cgroup v2 (мкс)
+
+
+def browser_processes(debug_port):
+    """
+    Дерево процессов браузера профиля: главный процесс (запущен AdsPower с
+    --remote-debugging-port) и все его дочерние процессы.
+
+    :return: Список psutil.Process (пустой, если браузер не найден).
+    """
+    marker = f"--remote-debugging-port={debug_port}"
+    matches = []
+    for process in psutil.process_iter(["cmdline", "ppid"]):
+        if marker in (process.info["cmdline"] or []):
+            matches.append(process)
+    pids = {process.pid for process in matches}
+    roots = [process for process in matches if process.info["ppid"] not in pids]
+    tree = []
+    for root in roots:
+        tree.append(root)
+        try:
+            tree.extend(root.children(recursive=True))
+        except psutil.Error:
+            pass
+    return tree
+
+
+class BrowserSession:
+    """
+    Браузер одного аккаунта под наблюдением сторожа.
+    """
+
+    def __init__(self, account, debug_port, on_breach):
+        self.account = account
+        self.debug_port = debug_port
+        self.on_breach = on_breach
+        self.processes = {}  # {pid: psutil.Process} — для замера CPU между вызовами
+        self.constrained = set()  # Процессы, к которым уже применены nice и cgroup
+        self.breaches = 0
+        self.rss = 0
+        self.cpu = 0.0
+        self.recycled = False
+
+
+class BrowserWatchdog:
+    """
+    Сторож процессов браузеров AdsPower.
+
+    Каждую сессию связывает с деревом процессов её браузера (по порту отладки),
+    раз в WATCHDOG_INTERVAL суммирует RSS и загрузку CPU дерева и при превышении
+    BROWSER_MAX_MEMORY_MB или BROWSER_MAX_CPU_PERCENT в BREACH_SAMPLES замерах подряд
+    вызывает on_breach — сессия закрывает профиль и повторяется позже.
+    Дополнительно понижает приоритет процессов (BROWSER_NICE) и помещает каждый профиль
+    в отдельную cgroup v2 внутри BROWSER_CGROUP с ограничениями memory.max и cpu.max (Linux).
+
+    Работает в процессе, где выполняется сессия (основном или дочернем, ISOLATED_WORKERS).
+    """
+
+    def __init__(self, settings, interval=WATCHDOG_INTERVAL):
+        self.settings = settings
+        self.interval = interval
+        self.lock = Lock()
+        self.sessions = {}
+        self.thread = None
+        self.warned = set()  # Предупреждения, которые уже выводились
+
+    def _warn_once(self, key, message):
+        if key not in self.warned:
+            self.warned.add(key)
+            logger.warning(message)
+
+    def enabled(self):
+        settings = self.settings
+        return bool(settings.value("BROWSER_MAX_MEMORY_MB") or settings.value("BROWSER_MAX_CPU_PERCENT")
+                    or settings.value("BROWSER_NICE") or settings.value("BROWSER_CGROUP").strip())
+
+    def register(self, account, debug_port, on_breach):
+        """
+        Ставит браузер аккаунта под наблюдение.
+
+        :param debug_port: Порт отладки браузера (из ответа AdsPower).
+        :param on_breach: Функция on_breach(причина), вызываемая при превышении лимита.
+        """
+        if not self.enabled() or debug_port is None:
+            return
+        if psutil is None:
+            self._warn_once("psutil", "psutil is not installed: browser resource limits are disabled.")
+            return
+        session = BrowserSession(account, debug_port, on_breach)
+        try:
+            # Ограничения применяются сразу, не дожидаясь первого замера
+            self._sample(session)
+            self._constrain(session)
+        except Exception as e:
+            logger.debug(f"#{account}: Failed to sample browser processes: {e}")
+        with self.lock:
+            self.sessions[account] = session
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def unregister(self, account):
+        with self.lock:
+            session = self.sessions.pop(account, None)
+        if session is not None:
+            self._remove_cgroup(session)
+
+    def _run(self):
+        while not stop_event.wait(self.interval):
+            with self.lock:
+                if not self.sessions:
+                    self.thread = None
+                    return
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Browser watchdog failed: {e}")
+
+    def check(self):
+        """
+        Один замер всех браузеров под наблюдением.
+        """
+        with self.lock:
+            sessions = list(self.sessions.values())
+        max_memory = self.settings.value("BROWSER_MAX_MEMORY_MB") * 1024 * 1024
+        max_cpu = self.settings.value("BROWSER_MAX_CPU_PERCENT")
+        for session in sessions:
+            if session.recycled:
+                continue
+            self._sample(session)
+            self._constrain(session)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"#{session.account}: Browser RSS {session.rss / 1024 / 1024:.0f} MB, "
+                    f"CPU {session.cpu:.0f}% ({len(session.processes)} processes).")
+            reason = None
+            if max_memory and session.rss > max_memory:
+                reason = f"browser memory {session.rss / 1024 / 1024:.0f} MB exceeds {max_memory // 1024 // 1024} MB"
+            elif max_cpu and session.cpu > max_cpu:
+                reason = f"browser CPU {session.cpu:.0f}% exceeds {max_cpu}%"
+            session.breaches = session.breaches + 1 if reason else 0
+            if session.breaches >= BREACH_SAMPLES:
+                session.recycled = True
+                logger.warning(f"#{session.account}: Recycling browser: {reason}.",
+                               extra={'color': Fore.YELLOW})
+                try:
+                    session.on_breach(reason)
+                except Exception as e:
+                    logger.error(f"#{session.account}: Failed to recycle browser: {e}")
+
+    def _sample(self, session):
+        current = {}
+        for process in browser_processes(session.debug_port):
+            # Прежний объект Process нужен для замера CPU с прошлого вызова
+            current[process.pid] = session.processes.get(process.pid, process)
+        session.processes = current
+        rss = 0
+        cpu = 0.0
+        for process in current.values():
+            try:
+                rss += process.memory_info().rss
+                cpu += process.cpu_percent(interval=None)
+            except psutil.Error:
+                continue
+        session.rss = rss
+        session.cpu = cpu
+
+    def _cgroup_path(self, session):
+        base = self.settings.value("BROWSER_CGROUP").strip()
+        return os.path.join(base, f"profile-{session.account}") if base else None
+
+    def _constrain(self, session):
+        """
+        Применяет BROWSER_NICE и cgroup профиля к новым процессам браузера.
+        """
+        new = [process for pid, process in session.processes.items() if pid not in session.constrained]
+        if not new:
+            return
+        nice = self.settings.value("BROWSER_NICE")
+        cgroup = self._cgroup_path(session)
+        if cgroup and not self._prepare_cgroup(cgroup):
+            cgroup = None
+        for process in new:
+            session.constrained.add(process.pid)
+            try:
+                if nice:
+                    process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS if sys.platform == "win32" else nice)
+                if cgroup:
+                    with open(os.path.join(cgroup, "cgroup.procs"), "w") as f:
+                        f.write(str(process.pid))
+            except (psutil.Error, OSError) as e:
+                self._warn_once(("constrain", type(e).__name__),
+                                f"Failed to apply browser resource constraints: {e}")
+
+    def _prepare_cgroup(self, path):
+        """
+        Создаёт cgroup профиля и задаёт memory.max и cpu.max по лимитам сторожа.
+
+        :return: True, если cgroup готова.
+        """
+        try:
+            os.makedirs(path, exist_ok=True)
+            max_memory = self.settings.value("BROWSER_MAX_MEMORY_MB")
+            max_cpu = self.settings.value("BROWSER_MAX_CPU_PERCENT")
+            if max_memory:
+                with open(os.path.join(path, "memory.max"), "w") as f:
+                    f.write(str(max_memory * 1024 * 1024))
+            if max_cpu:
+                with open(os.path.join(path, "cpu.max"), "w") as f:
+                    f.write(f"{max_cpu * CPU_PERIOD // 100} {CPU_PERIOD}")
+            return True
+        except OSError as e:
+            self._warn_once("cgroup", f"Failed to set up browser cgroup '{path}': {e}")
+            return False
+
+    def _remove_cgroup(self, session):
+        cgroup = self._cgroup_path(session)
+        if cgroup and os.path.isdir(cgroup):
+            try:
+                os.rmdir(cgroup)  # Удаляется только пустая cgroup (браузер закрыт)
+            except OSError as e:
+                logger.debug(f"#{session.account}: Browser cgroup not removed: {e}")
+
+    def status(self):
+        with self.lock:
+            return [{"account": session.account, "processes": len(session.processes),
+                     "rss_mb": round(session.rss / 1024 / 1024, 1), "cpu": session.cpu,
+                     "recycled": session.recycled}
+                    for session in self.sessions.values()]
+
+
+# Общий сторож браузеров процесса
+browser_watchdog = BrowserWatchdog(settings_manager)
@@ -0,0 +1,174 @@
+import time
+from threading import Lock
+from colorama import Fore
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_FAILURE_THRESHOLD = 5  # Сколько сбоев подряд (по всем аккаунтам) открывают цепь
+DEFAULT_PROBE_INTERVAL = 300  # Интервал между пробными запусками (сек)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для общей зависимости (API AdsPower, web.telegram.org).
+
+    После failure_threshold сбоев подряд по всему парку аккаунтов цепь размыкается
+    и запуск аккаунтов приостанавливается. Раз в probe_interval секунд пропускается
+    один пробный аккаунт: успех замыкает цепь, сбой — снова размыкает.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 probe_interval=DEFAULT_PROBE_INTERVAL, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_account = None
+
+    def probe_due(self):
+        return self.state == OPEN and self.clock() - self.opened_at >= self.probe_interval
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.probe_account = None
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Circuit '{self.name}' closed. Resuming dispatch.",
+                        extra={'color': Fore.GREEN})
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.probe_account = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            logger.warning(
+                f"Circuit '{self.name}': probe failed. Pausing dispatch for {self.probe_interval} seconds.")
+            self._open()
+        elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            logger.warning(
+                f"Circuit '{self.name}' opened after {self.consecutive_failures} consecutive failures. "
+                f"Pausing dispatch for {self.probe_interval} seconds.")
+            self._open()
+
+    def finish_probe(self, account):
+        """
+        Возвращает цепь в разомкнутое состояние, если пробный аккаунт завершился,
+        не дойдя до проверки этой зависимости.
+        """
+        if self.state == HALF_OPEN and self.probe_account == account:
+            self._open()
+
+
+class CircuitBreakerGroup:
+    """
+    Набор предохранителей, которые совместно разрешают или запрещают запуск аккаунта.
+    Классы сбоев (см. retry_policy.classify_failure) сопоставляются с предохранителями.
+    """
+
+    def __init__(self, breakers, failure_classes):
+        """
+        :param breakers: Словарь {имя: CircuitBreaker}.
+        :param failure_classes: Словарь {класс_сбоя: имя предохранителя}.
+        """
+        self.breakers = breakers
+        self.failure_classes = failure_classes
+        self.lock = Lock()
+
+    def allow_dispatch(self, account):
+        """
+        Проверяет, можно ли запускать аккаунт.
+        Если у разомкнутой цепи подошло время проверки, аккаунт становится пробным.
+
+        :return: True, если запуск разрешён.
+        """
+        with self.lock:
+            probing = []
+            for breaker in self.breakers.values():
+                if breaker.state == HALF_OPEN:
+                    return False  # Пробный аккаунт уже выполняется
+                if breaker.state == OPEN:
+                    if not breaker.probe_due():
+                        return False
+                    probing.append(breaker)
+
+            for breaker in probing:
+                breaker.state = HALF_OPEN
+                breaker.probe_account = account
+                logger.info(
+                    f"Circuit '{breaker.name}': probing with account #{account}.",
+                    extra={'color': Fore.YELLOW})
+            return True
+
+    def record_success(self, name):
+        with self.lock:
+            self.breakers[name].record_success()
+
+    def record_failure(self, failure_class):
+        name = self.failure_classes.get(failure_class)
+        if not name:
+            return
+        with self.lock:
+            self.breakers[name].record_failure()
+
+    def finish_dispatch(self, account):
+        with self.lock:
+            for breaker in self.breakers.values():
+                breaker.finish_probe(account)
+
+    def is_open(self):
+        with self.lock:
+            return any(breaker.state != CLOSED for breaker in self.breakers.values())
+
+    def apply_settings(self, settings):
+        """
+        Применяет порог и интервал проверки из настроек ко всем предохранителям.
+        """
+        threshold, probe_interval = read_breaker_settings(settings)
+        with self.lock:
+            for breaker in self.breakers.values():
+                breaker.failure_threshold = threshold
+                breaker.probe_interval = probe_interval
+
+
+def read_breaker_settings(settings):
+    """
+    :return: Кортеж (порог сбоев, интервал пробного запуска).
+    """
+    def read_int(key, default):
+        try:
+            return int(settings.get(key, default) or default)
+        except ValueError:
+            logger.warning(f"Invalid value for '{key}'. Using {default}.")
+            return default
+
+    return (read_int("CIRCUIT_BREAKER_THRESHOLD", DEFAULT_FAILURE_THRESHOLD),
+            read_int("CIRCUIT_BREAKER_PROBE_INTERVAL", DEFAULT_PROBE_INTERVAL))
+
+
+def create_circuit_breakers(settings):
+    """
+    Создаёт предохранители для API AdsPower и веб-версии Telegram по настройкам.
+    """
+    threshold, probe_interval = read_breaker_settings(settings)
+    return CircuitBreakerGroup(
+        breakers={
+            "adspower": CircuitBreaker("adspower", threshold, probe_interval),
+            "telegram": CircuitBreaker("telegram", threshold, probe_interval),
+        },
+        failure_classes={
+            "api_unreachable": "adspower",
+            "navigation": "telegram",
+        },
+    )
@@ -0,0 +1,238 @@
+import time
+import socket
+import sqlite3
+import hashlib
+from threading import Lock, Thread
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+HEARTBEAT_INTERVAL = 30  # Интервал отметки узла (сек)
+NODE_TIMEOUT = 120  # Узел без отметки дольше этого считается отключённым (сек)
+LEASE_DURATION = 5 * 60  # Аренда аккаунта, продлевается при каждой отметке (сек)
+DB_TIMEOUT = 30  # Ожидание блокировки файла базы (сек)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    account TEXT PRIMARY KEY,
+    node_id TEXT,
+    expires_at REAL NOT NULL DEFAULT 0,
+    next_schedule INTEGER
+);
+"""
+
+
+def rendezvous_owner(account, nodes):
+    """
+    Узел-владелец аккаунта по rendezvous-хешированию: при отключении узла
+    переходят только его аккаунты, остальные остаются на месте.
+    """
+    def weight(node):
+        return hashlib.sha1(f"{node}:{account}".encode("utf-8")).digest()
+    return max(nodes, key=weight) if nodes else None
+
+
+class ClusterCoordinator:
+    """
+    Распределение аккаунтов между несколькими узлами (main.py со своим AdsPower)
+    через общую базу SQLite (файл на общем диске, блокировки файла SQLite).
+
+    Узлы раз в HEARTBEAT_INTERVAL отмечаются в таблице nodes. Аккаунт принадлежит
+    живому узлу с наибольшим весом rendezvous-хеширования, поэтому при отключении
+    узла его аккаунты автоматически переходят к остальным. Перед запуском аккаунт
+    берётся в аренду (leases), чтобы во время перехода его не обработали два узла.
+    При освобождении аренды сохраняется время следующего запуска для нового владельца.
+    """
+
+    def __init__(self, db_path, node_id=None, heartbeat_interval=HEARTBEAT_INTERVAL,
+                 node_timeout=NODE_TIMEOUT, lease_duration=LEASE_DURATION, clock=time.time):
+        """
+        :param db_path: Путь к общей базе SQLite.
+        :param node_id: Имя узла (по умолчанию имя компьютера).
+        :param heartbeat_interval: Интервал отметки узла (сек).
+        :param node_timeout: Через сколько секунд без отметки узел считается отключённым.
+        :param lease_duration: Длительность аренды аккаунта (сек).
+        :param clock: Источник времени (общий для узлов, epoch).
+        """
+        self.db_path = db_path
+        self.node_id = node_id or socket.gethostname()
+        self.heartbeat_interval = heartbeat_interval
+        self.node_timeout = node_timeout
+        self.lease_duration = lease_duration
+        self.clock = clock
+        self.lock = Lock()
+        self.live_nodes = []
+        self.held = set()  # Аккаунты, арендованные этим узлом
+        self.on_change = None  # Вызывается при изменении состава узлов
+        self.thread = None
+
+    def _connect(self):
+        # Отдельное соединение на операцию: узлы работают с файлом из разных процессов
+        connection = sqlite3.connect(
+            self.db_path, timeout=DB_TIMEOUT, isolation_level=None)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _transaction(self, operation):
+        """
+        Выполняет operation(connection) в транзакции с блокировкой записи (BEGIN IMMEDIATE).
+        """
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = operation(connection)
+                connection.execute("COMMIT")
+                return result
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        finally:
+            connection.close()
+
+    def heartbeat(self):
+        """
+        Отмечает узел, продлевает аренды и обновляет список живых узлов.
+
+        :return: True, если состав узлов изменился.
+        """
+        now = self.clock()
+        with self.lock:
+            held = list(self.held)
+
+        def operation(connection):
+            connection.execute(
+                "INSERT INTO nodes (node_id, heartbeat, started_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(node_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (self.node_id, now, now))
+            connection.executemany(
+                "UPDATE leases SET expires_at = ? WHERE account = ? AND node_id = ?",
+                [(now + self.lease_duration, account, self.node_id) for account in held])
+            rows = connection.execute(
+                "SELECT node_id FROM nodes WHERE heartbeat >= ? ORDER BY node_id",
+                (now - self.node_timeout,)).fetchall()
+            return [row[0] for row in rows]
+
+        nodes = self._transaction(operation)
+        with self.lock:
+            changed = nodes != self.live_nodes
+            self.live_nodes = nodes
+        if changed:
+            logger.info(f"Cluster nodes: {', '.join(nodes)} (this node: {self.node_id}).")
+        return changed
+
+    def leave(self):
+        """
+        Убирает узел из кластера и освобождает аренды (при штатной остановке).
+        """
+        def operation(connection):
+            connection.execute("DELETE FROM nodes WHERE node_id = ?", (self.node_id,))
+            connection.execute(
+                "UPDATE leases SET node_id = NULL, expires_at = 0 WHERE node_id = ?",
+                (self.node_id,))
+
+        try:
+            self._transaction(operation)
+        except sqlite3.Error as e:
+            logger.debug(f"Failed to leave cluster: {e}")
+
+    def owns(self, account):
+        """
+        Проверяет, принадлежит ли аккаунт этому узлу.
+        """
+        with self.lock:
+            nodes = self.live_nodes or [self.node_id]
+        return rendezvous_owner(str(account), nodes) == self.node_id
+
+    def filter_owned(self, accounts):
+        """
+        :return: Аккаунты из списка, принадлежащие этому узлу.
+        """
+        return [account for account in accounts if self.owns(account)]
+
+    def acquire(self, account):
+        """
+        Берёт аккаунт в аренду перед запуском.
+
+        :return: None при успехе или время окончания чужой аренды (epoch).
+        """
+        now = self.clock()
+
+        def operation(connection):
+            row = connection.execute(
+                "SELECT node_id, expires_at FROM leases WHERE account = ?",
+                (str(account),)).fetchone()
+            if row and row[0] not in (None, self.node_id) and row[1] > now:
+                return row[1]
+            connection.execute(
+                "INSERT INTO leases (account, node_id, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(account) DO UPDATE SET node_id = excluded.node_id, "
+                "expires_at = excluded.expires_at",
+                (str(account), self.node_id, now + self.lease_duration))
+            return None
+
+        held_until = self._transaction(operation)
+        if held_until is None:
+            with self.lock:
+                self.held.add(account)
+        return held_until
+
+    def release(self, account, next_schedule=None):
+        """
+        Освобождает аренду и сохраняет время следующего запуска (epoch) для любого узла.
+        """
+        with self.lock:
+            self.held.discard(account)
+
+        def operation(connection):
+            connection.execute(
+                "UPDATE leases SET node_id = NULL, expires_at = 0, "
+                "next_schedule = COALESCE(?, next_schedule) WHERE account = ? AND node_id = ?",
+                (next_schedule, str(account), self.node_id))
+
+        try:
+            self._transaction(operation)
+        except sqlite3.Error as e:
+            logger.debug(f"#{account}: Failed to release cluster lease: {e}")
+
+    def next_schedule(self, account):
+        """
+        :return: Время следующего запуска, сохранённое любым узлом (epoch), или None.
+        """
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT next_schedule FROM leases WHERE account = ?", (str(account),)).fetchone()
+        finally:
+            connection.close()
+        return row[0] if row else None
+
+    def status(self):
+        with self.lock:
+            return {"node_id": self.node_id, "nodes": list(self.live_nodes),
+                    "leases": sorted(str(account) for account in self.held)}
+
+    def start(self, stop_event):
+        """
+        Регистрирует узел и запускает фоновые отметки до установки stop_event.
+        """
+        self.heartbeat()
+
+        def heartbeat_loop():
+            while not stop_event.wait(self.heartbeat_interval):
+                try:
+                    if self.heartbeat() and self.on_change:
+                        self.on_change()
+                except Exception as e:
+                    logger.error(f"Cluster heartbeat failed: {e}")
+            self.leave()
+
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = Thread(target=heartbeat_loop, daemon=True)
+            self.thread.start()
@@ -0,0 +1,293 @@
+import os
+from collections import deque
+from threading import Condition, Lock, Thread
+import logging
+from colorama import Fore
+
+try:
+    import psutil  # Необязательная зависимость: загрузка CPU, память и процессы браузера
+except ImportError:
+    psutil = None
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+ADJUST_INTERVAL = 30  # Интервал пересчёта числа одновременных сессий (сек)
+OUTCOME_WINDOW = 20  # Сколько последних сессий учитывать в доле сбоев
+MIN_OUTCOMES = 5  # Минимум сессий в окне для оценки доли сбоев
+MAX_FAILURE_RATE = 0.3  # Доля сбоев, при которой число сессий уменьшается
+MAX_TIMEOUT_RATE = 0.15  # Доля сессий, завершившихся по таймауту
+MAX_CPU_PERCENT = 85  # Загрузка CPU, при которой число сессий уменьшается
+INCREASE_CPU_PERCENT = 70  # Число сессий увеличивается только при загрузке ниже этой
+MIN_FREE_MEMORY = 1024 * 1024 * 1024  # Минимум свободной памяти (байт)
+BROWSER_PROCESSES_PER_SESSION = 25  # Ожидаемое число процессов браузера на одну сессию
+BROWSER_PROCESS_NAMES = ("chrome", "sunbrowser")  # Chrome и ядро SunBrowser AdsPower
+DECREASE_FACTOR = 0.5  # Множитель при уменьшении (AIMD)
+
+
+class ConcurrencyLimiter:
+    """
+    Семафор с изменяемым пределом: ограничивает число одновременных сессий аккаунтов.
+    При уменьшении предела текущие сессии дорабатывают, новые не запускаются.
+    """
+
+    def __init__(self, limit=1):
+        self.condition = Condition()
+        self.limit = limit
+        self.active = 0
+
+    def wait_available(self, timeout=None):
+        """
+        Ожидает свободное место, не занимая его.
+
+        :return: True, если место есть.
+        """
+        with self.condition:
+            if self.active >= self.limit:
+                self.condition.wait(timeout)
+            return self.active < self.limit
+
+    def try_acquire(self, timeout=None):
+        """
+        Занимает место для сессии, ожидая не дольше timeout.
+
+        :return: True, если место занято.
+        """
+        with self.condition:
+            if self.active >= self.limit:
+                self.condition.wait(timeout)
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.active = max(0, self.active - 1)
+            self.condition.notify_all()
+
+    def set_limit(self, limit):
+        with self.condition:
+            self.limit = limit
+            self.condition.notify_all()
+
+    def saturated(self):
+        """
+        :return: True, если заняты все места (есть спрос на увеличение предела).
+        """
+        with self.condition:
+            return self.active >= self.limit
+
+
+def count_browser_processes():
+    """
+    Число запущенных процессов браузера (psutil или /proc на Linux).
+
+    :return: Число процессов или None, если определить не удалось.
+    """
+    try:
+        if psutil is not None:
+            names = [process.info["name"] or "" for process in psutil.process_iter(["name"])]
+        else:
+            names = []
+            for pid in os.listdir("/proc"):
+                if pid.isdigit():
+                    try:
+                        with open(f"/proc/{pid}/comm") as f:
+                            names.append(f.read().strip())
+                    except OSError:
+                        continue
+    except Exception:
+        return None
+    return sum(1 for name in names
+               if any(browser in name.lower() for browser in BROWSER_PROCESS_NAMES))
+
+
+def free_memory():
+    """
+    Доступная память (байт) через psutil или /proc/meminfo.
+
+    :return: Объём памяти или None, если определить не удалось.
+    """
+    try:
+        if psutil is not None:
+            return psutil.virtual_memory().available
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    return None
+
+
+def cpu_percent():
+    """
+    Загрузка CPU в процентах: psutil (с прошлого вызова) или средняя загрузка за минуту.
+
+    :return: Процент загрузки или None, если определить не удалось.
+    """
+    try:
+        if psutil is not None:
+            return psutil.cpu_percent(interval=None)
+        return os.getloadavg()[0] / (os.cpu_count() or 1) * 100
+    except (AttributeError, OSError):
+        return None
+
+
+def sample_host():
+    """
+    Замер состояния компьютера для регулятора.
+    """
+    return {"cpu": cpu_percent(), "free_memory": free_memory(),
+            "browser_processes": count_browser_processes()}
+
+
+class ConcurrencyController:
+    """
+    Регулятор числа одновременных сессий TelegramBotAutomation (AIMD).
+
+    Раз в ADJUST_INTERVAL замеряются загрузка CPU, свободная память, число процессов
+    браузера и доля сбоев и таймаутов последних сессий. При перегрузке предел
+    уменьшается вдвое (не ниже минимума), иначе при полной занятости и свободном CPU
+    увеличивается на единицу (не выше максимума).
+    """
+
+    def __init__(self, limiter, min_limit=1, max_limit=1, sampler=sample_host,
+                 interval=ADJUST_INTERVAL, on_change=None):
+        """
+        :param limiter: ConcurrencyLimiter.
+        :param min_limit: Минимальное число одновременных сессий.
+        :param max_limit: Максимальное число одновременных сессий.
+        :param sampler: Функция замера состояния компьютера (см. sample_host).
+        :param interval: Интервал пересчёта (сек).
+        :param on_change: Вызывается с новым пределом при его изменении.
+        """
+        self.limiter = limiter
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.sampler = sampler
+        self.interval = interval
+        self.on_change = on_change
+        self.lock = Lock()
+        self.outcomes = deque(maxlen=OUTCOME_WINDOW)
+        self.last_sample = {}
+        self.last_reason = None
+        self.thread = None
+        self._set_limit(min(max(limiter.limit, self.min_limit), self.max_limit), "initial")
+
+    def apply_settings(self, settings):
+        """
+        Применяет CONCURRENCY_MIN и CONCURRENCY_MAX (при перечитывании настроек).
+        """
+        with self.lock:
+            self.min_limit = settings.value("CONCURRENCY_MIN")
+            self.max_limit = max(self.min_limit, settings.value("CONCURRENCY_MAX"))
+        self.set_limit(self.limiter.limit)
+
+    def record(self, failed, timed_out=False):
+        """
+        Учитывает завершённую сессию.
+
+        :param failed: Сессия завершилась сбоем.
+        :param timed_out: Сбой вызван таймаутом.
+        """
+        with self.lock:
+            self.outcomes.append((failed, timed_out))
+
+    def _rates(self):
+        with self.lock:
+            outcomes = list(self.outcomes)
+        if len(outcomes) < MIN_OUTCOMES:
+            return None, None
+        failures = sum(1 for failed, _ in outcomes if failed)
+        timeouts = sum(1 for _, timed_out in outcomes if timed_out)
+        return failures / len(outcomes), timeouts / len(outcomes)
+
+    def overload_reason(self, sample, limit):
+        """
+        :return: Причина перегрузки или None.
+        """
+        failure_rate, timeout_rate = self._rates()
+        if sample.get("cpu") is not None and sample["cpu"] >= MAX_CPU_PERCENT:
+            return f"CPU {sample['cpu']:.0f}%"
+        if sample.get("free_memory") is not None and sample["free_memory"] < MIN_FREE_MEMORY:
+            return f"free memory {sample['free_memory'] / 1024 / 1024:.0f} MB"
+        browsers = sample.get("browser_processes")
+        if browsers is not None and browsers > BROWSER_PROCESSES_PER_SESSION * (limit + 1):
+            return f"{browsers} browser processes"
+        if timeout_rate is not None and timeout_rate >= MAX_TIMEOUT_RATE:
+            return f"timeout rate {timeout_rate:.0%}"
+        if failure_rate is not None and failure_rate >= MAX_FAILURE_RATE:
+            return f"failure rate {failure_rate:.0%}"
+        return None
+
+    def adjust(self):
+        """
+        Пересчитывает предел по замеру.
+
+        :return: Новый предел.
+        """
+        sample = self.sampler()
+        limit = self.limiter.limit
+        reason = self.overload_reason(sample, limit)
+        with self.lock:
+            self.last_sample = sample
+            min_limit, max_limit = self.min_limit, self.max_limit
+        if reason:
+            new_limit = max(min_limit, int(limit * DECREASE_FACTOR))
+            if new_limit < limit:
+                with self.lock:
+                    # Сбои при прежнем пределе не должны снова уменьшить новый
+                    self.outcomes.clear()
+                self._set_limit(new_limit, reason)
+        elif (limit < max_limit and self.limiter.saturated()
+              and (sample.get("cpu") is None or sample["cpu"] < INCREASE_CPU_PERCENT)):
+            self._set_limit(limit + 1, "spare capacity")
+        return self.limiter.limit
+
+    def set_limit(self, limit):
+        """
+        Устанавливает предел вручную (в пределах минимума и максимума).
+
+        :return: Установленный предел.
+        """
+        with self.lock:
+            limit = min(max(limit, self.min_limit), self.max_limit)
+        self._set_limit(limit, "manual")
+        return limit
+
+    def _set_limit(self, limit, reason):
+        previous = self.limiter.limit
+        self.limiter.set_limit(limit)
+        with self.lock:
+            self.last_reason = reason
+        if limit != previous:
+            logger.info(f"Concurrent sessions: {previous} -> {limit} ({reason}).",
+                        extra={'color': Fore.YELLOW if limit < previous else Fore.GREEN})
+            if self.on_change:
+                self.on_change(limit)
+
+    def status(self):
+        failure_rate, timeout_rate = self._rates()
+        with self.lock:
+            return {"limit": self.limiter.limit, "active": self.limiter.active,
+                    "min": self.min_limit, "max": self.max_limit,
+                    "failure_rate": failure_rate, "timeout_rate": timeout_rate,
+                    "host": dict(self.last_sample), "last_change": self.last_reason}
+
+    def start(self, stop_event):
+        """
+        Запускает фоновый пересчёт до установки stop_event.
+        """
+        def adjust_loop():
+            cpu_percent()  # Первый вызов psutil.cpu_percent задаёт точку отсчёта
+            while not stop_event.wait(self.interval):
+                try:
+                    self.adjust()
+                except Exception as e:
+                    logger.error(f"Concurrency adjustment failed: {e}")
+
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = Thread(target=adjust_loop, daemon=True)
+            self.thread.start()
@@ -0,0 +1,169 @@
+import json
+from threading import Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_HOST = "127.0.0.1"
+TOKEN_HEADER = "X-Control-Token"
+
+
+class ControlError(Exception):
+    """
+    Ошибка управляющего действия (возвращается клиенту с указанным HTTP-кодом).
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ControlServer:
+    """
+    Локальный HTTP-сервер состояния и управления.
+
+    GET-запросы возвращают JSON из views, POST-запросы вызывают actions:
+        GET  /status, /accounts, /accounts/<id>, /failures
+        POST /accounts/<id>/run, /pause, /resume, /drain, /concurrency?value=N
+
+    Обработчики передаются из main.py, сервер сам ничего не знает об очереди.
+    Параметры POST берутся из строки запроса и из JSON-тела.
+
+    Запросы с заголовком Origin отклоняются: его передают только браузеры, а сервер
+    предназначен для скриптов и curl. Иначе любая открытая страница (в том числе в
+    профилях AdsPower) могла бы отправить POST /drain или /pause на localhost.
+    """
+
+    def __init__(self, views, actions, host=DEFAULT_HOST, port=0, token=""):
+        """
+        :param views: Словарь {имя: функция(параметры) -> данные для JSON}.
+        :param actions: Словарь {имя: функция(параметры) -> данные для JSON}.
+        :param host: Адрес (по умолчанию только локальный).
+        :param port: Порт.
+        :param token: Если задан, запросы должны передавать его в заголовке X-Control-Token.
+        """
+        self.views = views
+        self.actions = actions
+        self.host = host
+        self.port = port
+        self.token = token
+        self.httpd = None
+        self.thread = None
+
+    def route(self, method, path):
+        """
+        Определяет обработчик и параметры по пути запроса.
+
+        :return: Кортеж (функция, параметры) или (None, None).
+        """
+        parts = [part for part in path.split("/") if part]
+        handlers = self.views if method == "GET" else self.actions
+        if len(parts) >= 2 and parts[0] == "accounts":
+            # /accounts/<id> и /accounts/<id>/<действие>
+            name = "account" if len(parts) == 2 else parts[2]
+            return handlers.get(name), {"account": parts[1]}
+        if len(parts) == 1:
+            return handlers.get(parts[0]), {}
+        return None, None
+
+    def handle(self, method, path, query, body):
+        """
+        Выполняет запрос.
+
+        :return: Кортеж (HTTP-код, данные для JSON).
+        """
+        handler, params = self.route(method, path)
+        if handler is None:
+            return 404, {"ok": False, "error": f"Unknown endpoint: {method} {path}"}
+        params.update({key: values[-1] for key, values in query.items()})
+        if isinstance(body, dict):
+            params.update(body)
+        try:
+            result = handler(params)
+        except ControlError as e:
+            return e.status, {"ok": False, "error": str(e)}
+        except Exception as e:
+            logger.error(f"Control server: {method} {path} failed: {e}")
+            return 500, {"ok": False, "error": str(e)}
+        return 200, {"ok": True, "result": result}
+
+    def _make_handler(self):
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def _respond(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False,
+                                  indent=2).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _process(self, method):
+                if self.headers.get("Origin") is not None:
+                    self._respond(403, {"ok": False, "error": "Browser requests are not allowed"})
+                    return
+                if server.token and self.headers.get(TOKEN_HEADER) != server.token:
+                    self._respond(403, {"ok": False, "error": "Invalid control token"})
+                    return
+                url = urlparse(self.path)
+                body = None
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self._respond(400, {"ok": False, "error": "Invalid Content-Length"})
+                    return
+                if length:
+                    try:
+                        body = json.loads(self.rfile.read(length).decode("utf-8"))
+                    except ValueError:
+                        self._respond(400, {"ok": False, "error": "Invalid JSON body"})
+                        return
+                status, payload = server.handle(
+                    method, url.path, parse_qs(url.query), body)
+                self._respond(status, payload)
+
+            def do_GET(self):
+                self._process("GET")
+
+            def do_POST(self):
+                self._process("POST")
+
+            def log_message(self, format, *args):
+                # Запросы пишутся только в отладочный лог
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Control server: {format % args}")
+
+        return RequestHandler
+
+    def start(self, stop_event):
+        """
+        Запускает сервер в фоновом потоке и останавливает его по stop_event.
+
+        :return: True, если сервер запущен.
+        """
+        try:
+            self.httpd = ThreadingHTTPServer(
+                (self.host, self.port), self._make_handler())
+        except OSError as e:
+            logger.error(f"Failed to start control server on {self.host}:{self.port}: {e}")
+            return False
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+        def shutdown_on_stop():
+            stop_event.wait()
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+        Thread(target=shutdown_on_stop, daemon=True).start()
+        logger.info(f"Control server listening on http://{self.host}:{self.port}")
+        return True
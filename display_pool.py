@@ -0,0 +1,118 @@
+import os
+import sys
+import select
+import shutil
+import subprocess
+from threading import Lock
+import logging
+from settings_manager import settings_manager
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+XVFB_START_TIMEOUT = 10  # Ожидание номера дисплея от Xvfb (сек)
+XVFB_STOP_TIMEOUT = 5
+
+
+class DisplayPool:
+    """
+    Виртуальные дисплеи Xvfb для браузеров в видимом режиме на Linux-серверах без экрана.
+
+    Каждой видимой сессии выделяется свой дисплей: Xvfb сам выбирает свободный номер
+    (-displayfd), поэтому дисплеи не пересекаются и между дочерними процессами
+    (ISOLATED_WORKERS). Браузер AdsPower получает дисплей через launch_args (--display).
+    Xvfb запускается с -terminate и завершается сам после закрытия браузера, даже если
+    процесс бота был прерван; release() завершает его явно.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.lock = Lock()
+        self.displays = {}  # {":номер": subprocess.Popen}
+        self.warned = False
+
+    def enabled(self):
+        """
+        :return: True, если виртуальные дисплеи включены и доступны.
+        """
+        if not self.settings.value("VIRTUAL_DISPLAY") or not sys.platform.startswith("linux"):
+            return False
+        if shutil.which("Xvfb") is None:
+            if not self.warned:
+                self.warned = True
+                logger.warning("VIRTUAL_DISPLAY is enabled but Xvfb is not installed. "
+                               "Install it with 'apt install xvfb'.")
+            return False
+        return True
+
+    def acquire(self):
+        """
+        Запускает Xvfb на свободном дисплее.
+
+        :return: Имя дисплея (":99") или None при ошибке.
+        """
+        read_fd, write_fd = os.pipe()
+        try:
+            process = subprocess.Popen(
+                ["Xvfb", "-displayfd", str(write_fd), "-screen", "0",
+                 self.settings.value("VIRTUAL_DISPLAY_SCREEN"), "-nolisten", "tcp", "-terminate"],
+                pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            os.close(write_fd)
+            write_fd = None
+            number = b""
+            while not number.endswith(b"\n"):
+                ready, _, _ = select.select([read_fd], [], [], XVFB_START_TIMEOUT)
+                chunk = os.read(read_fd, 16) if ready else b""
+                if not chunk:
+                    process.kill()
+                    logger.error("Xvfb did not report a display number.")
+                    return None
+                number += chunk
+        except OSError as e:
+            logger.error(f"Failed to start Xvfb: {e}")
+            return None
+        finally:
+            os.close(read_fd)
+            if write_fd is not None:
+                os.close(write_fd)
+        display = f":{number.decode().strip()}"
+        with self.lock:
+            self.displays[display] = process
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Virtual display {display} started (Xvfb pid {process.pid}).")
+        return display
+
+    def release(self, display):
+        """
+        Завершает Xvfb дисплея.
+        """
+        with self.lock:
+            process = self.displays.pop(display, None)
+        if process is None:
+            return
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(XVFB_STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Virtual display {display} released.")
+
+    def shutdown(self):
+        """
+        Завершает все дисплеи (при остановке бота).
+        """
+        with self.lock:
+            displays = list(self.displays)
+        for display in displays:
+            self.release(display)
+
+    def status(self):
+        with self.lock:
+            return sorted(display for display, process in self.displays.items()
+                          if process.poll() is None)
+
+
+# Общий набор дисплеев процесса
+display_pool = DisplayPool(settings_manager)
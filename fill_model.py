@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import statistics
+from threading import Lock
+import logging
+from scheduler import FILL_CHECK_TOLERANCE
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+FILL_MODEL_FILE = os.path.join("temp", "fill_model.json")
+MAX_SAMPLES = 5  # Сколько последних оценок длительности заполнения хранить на аккаунт
+MIN_ELAPSED = 60  # Минимальный интервал между замерами для оценки скорости (сек)
+MIN_PERCENT_DELTA = 1.0  # Минимальный прирост процента между замерами
+MIN_FILL_DURATION = 10 * 60  # Оценки вне диапазона считаются ошибкой замера (сек)
+MAX_FILL_DURATION = 7 * 24 * 60 * 60
+
+
+class FillModel:
+    """
+    Модель заполнения хранилища по аккаунтам.
+
+    Для каждого аккаунта хранятся начало текущего цикла заполнения (момент клейма),
+    последний замер процента заполнения и несколько последних оценок длительности
+    заполнения от 0 до 100%. Оценки получаются из:
+        - процента, прочитанного через известное время после клейма;
+        - двух процентов в одном цикле;
+        - оставшегося времени с экрана, если известно начало цикла.
+
+    По модели прогнозируется момент заполнения, когда текст с оставшимся временем
+    не найден. Если время с экрана расходится с прогнозом больше FILL_CHECK_TOLERANCE,
+    скорость заполнения изменилась: прежние оценки сбрасываются.
+    """
+
+    def __init__(self, model_file=FILL_MODEL_FILE):
+        """
+        :param model_file: Путь к файлу модели; None — хранить только в памяти.
+        """
+        self.model_file = model_file
+        self.lock = Lock()
+        self.data = self._load()
+
+    def _load(self):
+        if not self.model_file or not os.path.exists(self.model_file):
+            return {}
+        try:
+            with open(self.model_file, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.debug(f"Failed to load fill model '{self.model_file}': {e}")
+            return {}
+
+    def _save(self):
+        if not self.model_file:
+            return
+        try:
+            directory = os.path.dirname(self.model_file)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.model_file, "w") as f:
+                json.dump(self.data, f)
+        except Exception as e:
+            logger.debug(f"Failed to save fill model '{self.model_file}': {e}")
+
+    def _entry(self, account):
+        return self.data.setdefault(
+            str(account), {"cycle_start": None, "claimed": False,
+                           "last_reading": None, "durations": []})
+
+    def _add_sample(self, entry, duration):
+        if not MIN_FILL_DURATION <= duration <= MAX_FILL_DURATION:
+            return
+        entry["durations"].append(round(duration))
+        entry["durations"] = entry["durations"][-MAX_SAMPLES:]
+
+    def _duration(self, account):
+        durations = self.data.get(str(account), {}).get("durations", [])
+        return statistics.median(durations) if durations else None
+
+    def record_reading(self, account, percent, at=None):
+        """
+        Сохраняет замер процента заполнения хранилища.
+
+        :param account: Аккаунт.
+        :param percent: Процент заполнения (0-100).
+        :param at: Время замера (epoch).
+        """
+        at = at or time.time()
+        with self.lock:
+            entry = self._entry(account)
+            previous = entry["last_reading"]
+            if previous and percent < previous[1]:
+                # Процент уменьшился: после прошлого замера был клейм, начало цикла неизвестно
+                entry["cycle_start"] = None
+                entry["claimed"] = False
+                previous = None
+            if percent < 100:
+                start = entry["cycle_start"] if entry.get("claimed") else None
+                if start is not None and percent >= MIN_PERCENT_DELTA and at - start >= MIN_ELAPSED:
+                    self._add_sample(entry, (at - start) * 100 / percent)
+                elif (previous and percent - previous[1] >= MIN_PERCENT_DELTA
+                      and at - previous[0] >= MIN_ELAPSED):
+                    self._add_sample(
+                        entry, (at - previous[0]) * 100 / (percent - previous[1]))
+                if not entry.get("claimed") and self._duration(account):
+                    # Начало цикла без клейма восстанавливается по скорости заполнения
+                    entry["cycle_start"] = at - percent / 100 * self._duration(account)
+            entry["last_reading"] = [at, percent]
+            self._save()
+
+    def record_claim(self, account, at=None):
+        """
+        Отмечает клейм: хранилище опустошено, начинается новый цикл заполнения.
+        """
+        at = at or time.time()
+        with self.lock:
+            entry = self._entry(account)
+            entry["cycle_start"] = at
+            entry["claimed"] = True
+            entry["last_reading"] = [at, 0.0]
+            self._save()
+
+    def record_remaining(self, account, fill_at):
+        """
+        Сохраняет момент заполнения, рассчитанный по оставшемуся времени с экрана.
+
+        :param fill_at: Момент заполнения (epoch).
+        """
+        with self.lock:
+            entry = self._entry(account)
+            predicted = self._predict(account)
+            if predicted is not None and abs(fill_at - predicted) > FILL_CHECK_TOLERANCE:
+                logger.info(
+                    f"#{account}: Fill prediction is off by {abs(fill_at - predicted) / 60:.0f} minutes. "
+                    f"Resetting fill duration samples.")
+                entry["durations"] = []
+                if not entry.get("claimed"):
+                    # Начало цикла было восстановлено по устаревшей скорости
+                    entry["cycle_start"] = None
+            if entry.get("claimed"):
+                self._add_sample(entry, fill_at - entry["cycle_start"])
+            self._save()
+
+    def fill_duration(self, account):
+        """
+        :return: Оценка длительности заполнения хранилища (сек) или None.
+        """
+        with self.lock:
+            return self._duration(account)
+
+    def last_claim(self, account):
+        """
+        :return: Время последнего клейма (epoch) или None.
+        """
+        with self.lock:
+            entry = self.data.get(str(account), {})
+            return entry.get("cycle_start") if entry.get("claimed") else None
+
+    def predict_fill_time(self, account):
+        """
+        Прогноз момента заполнения хранилища.
+
+        :return: Момент заполнения (epoch) или None, если данных недостаточно.
+        """
+        with self.lock:
+            return self._predict(account)
+
+    def _predict(self, account):
+        entry = self.data.get(str(account))
+        duration = self._duration(account)
+        if not entry or not duration:
+            return None
+        if entry["cycle_start"] is not None:
+            return entry["cycle_start"] + duration
+        reading = entry["last_reading"]
+        if reading:
+            return reading[0] + max(0.0, 100 - reading[1]) / 100 * duration
+        return None
+
+
+# Общий экземпляр модели
+fill_model = FillModel()
@@ -1,108 +1,141 @@
-import glob
-import shutil
 import signal
 import sys
 import argparse
 import os
 import json
+import time
 import traceback
 from queue import Queue, Empty
-from threading import Timer, Lock, Thread
+from threading import Lock, Thread, Event
+from collections import deque
 from datetime import datetime, timedelta
-from prettytable import PrettyTable
+from update_recovery import recover_interrupted_update, restart
+# Прерванное обновление восстанавливается до импорта остальных модулей проекта:
+# после сбоя посреди замены файлов они могут оказаться несовместимы друг с другом
+if __name__ == "__main__" and recover_interrupted_update():
+    restart()
 from colorama import Fore, Style
 from update_manager import check_and_update, restart_script, ignore_files_in_git
-from telegram_bot_automation import TelegramBotAutomation
-import random
-from utils import get_accounts, reset_balances, setup_logger, load_settings, is_debug_enabled, GlobalFlags, stop_event, get_color, visible, check_requirements
+from scheduler import PriorityTaskQueue, calculate_next_schedule
+from account_stats import account_stats
+from fill_model import fill_model
+from run_history import run_history, SUCCESS, FAILURE, INTERRUPTED
+from retry_policy import RetryPolicy, classify_failure
+from circuit_breaker import create_circuit_breakers
+from time_base import DeadlineScheduler, epoch_now, to_epoch, format_epoch
+from settings_manager import settings_manager
+from profile_inventory import profile_inventory
+from account_reconciler import AccountReconciler
+from migrations import run_migrations, TIMERS_FILE
+from account_state import AccountState, AccountStatus
+from status_view import StatusView
+from control_server import ControlServer, ControlError
+from cluster import ClusterCoordinator
+from account_session import run_session, close_active_sessions, close_profile
+from browser_watchdog import browser_watchdog
+from display_pool import display_pool
+from process_pool import ProcessPool
+from concurrency_controller import ConcurrencyLimiter, ConcurrencyController
+from utils import get_accounts, reset_balances, setup_logger, is_debug_enabled, GlobalFlags, stop_event, drain_event, get_color, visible, check_requirements
 import logging
 # Настройка логирования
 logger = logging.getLogger("application_logger")
-# Проверка установленных зависимостей
-check_requirements()
 
 
 ###################################################################################################################
 ###################################################################################################################
-# Загрузка настроек
+# Загрузка настроек (общий объект, перечитывается при изменении settings.txt)
 
-settings = load_settings()
+settings = settings_manager
 
 
 # Глобальные переменные
-bot = None
+session_pool = None  # Пул дочерних процессов для сессий (ISOLATED_WORKERS), None — сессии в этом процессе
 active_timers = []
-balance_dict = {}
+timers_lock = Lock()  # Защищает active_timers: таймеры добавляют и снимают разные потоки
+balance_dict = {}  # {аккаунт: AccountState}
 balance_lock = Lock()
 update_lock = Lock()
 task_lock = Lock()
-account_lock = Lock()
-active_profile_lock = Lock()
-task_queue = Queue()
+# Очередь с приоритетом по потерянному фарму (см. scheduler.PriorityTaskQueue)
+task_queue = PriorityTaskQueue(account_stats, settings)
+retry_policy = RetryPolicy()
+# Предохранители для API AdsPower и web.telegram.org
+circuit_breakers = create_circuit_breakers(settings)
+# Отложенные запуски по монотонным часам (устойчиво к переводу часов и сну системы)
+deadline_scheduler = DeadlineScheduler(
+    stop_event, on_reconcile=lambda tasks: save_reconciled_timers(tasks))
+# Вывод таблицы балансов не чаще STATUS_TABLE_INTERVAL секунд (только изменённые аккаунты)
+status_view = StatusView(balance_dict, balance_lock,
+                         interval=settings.value("STATUS_TABLE_INTERVAL"))
+# Число одновременных сессий: от CONCURRENCY_MIN до CONCURRENCY_MAX по загрузке компьютера и доле сбоев
+session_limiter = ConcurrencyLimiter(settings.value("CONCURRENCY_MIN"))
+concurrency_controller = ConcurrencyController(
+    session_limiter, settings.value("CONCURRENCY_MIN"), settings.value("CONCURRENCY_MAX"),
+    on_change=lambda limit: session_pool.resize(limit) if session_pool is not None else None)
 has_logged_queue_empty = False
-DEFAULT_UPDATE_INTERVAL = 3 * 60 * 60  # 3 часа по умолчанию
+has_logged_dispatch_paused = False
+active_accounts = set()  # Аккаунты, которые сейчас обрабатываются
+active_lock = Lock()  # Защищает active_accounts (потоки аккаунтов и сервер управления)
+dispatch_paused = Event()  # Запуск новых аккаунтов приостановлен вручную (сервер управления)
+cluster = None  # Распределение аккаунтов между узлами (CLUSTER_DB), None — один узел
+forced_accounts = set()  # Аккаунты, запущенные вручную: проверка готовности к клейму не применяется
+SKIP_LAUNCH_MARGIN = 10 * 60  # Запуск откладывается, только если до заполнения больше этого (сек)
+DEFAULT_READY_DURATION = 90  # Время от запуска браузера до мини-приложения без истории (сек)
+PRELAUNCH_MARGIN = 30  # Запас к времени подготовки при раннем запуске (сек)
+RECENT_FAILURES_LIMIT = 50  # Сколько последних сбоев хранить для сервера управления
+recent_failures = deque(maxlen=RECENT_FAILURES_LIMIT)
+failures_lock = Lock()  # Защищает recent_failures (потоки аккаунтов и сервер управления)
+restored_queue = {}  # Очередь, сохранённая перед перезапуском: {аккаунт: момент готовности}
+CIRCUIT_BREAKER_WAIT = 5  # Пауза обработчика очереди, пока цепь разомкнута (сек)
+UPDATE_CHECK_POLL_INTERVAL = 10  # Пауза перед проверкой обновлений, пока очередь занята (сек)
 temp_dir = "temp"
-TIMERS_FILE = os.path.join(temp_dir, "timers.json")  # Полный путь к файлу
-ROOT_TIMERS_FILE = "timers.json"  # Путь к файлу в корневой директории
-BACKUP_FILES_PATTERN = "*.backup"
-if not os.path.exists(temp_dir):
-    os.makedirs(temp_dir)
-    logger.debug(f"Temporary folder created: {temp_dir}")
-if os.path.exists(ROOT_TIMERS_FILE) and not os.path.exists(TIMERS_FILE):
-    try:
-        shutil.move(ROOT_TIMERS_FILE, TIMERS_FILE)
-        logger.debug(f"Timers file copied from root to temp: {TIMERS_FILE}")
-    except Exception as e:
-        logger.error(f"Failed to copy timers file to temp: {e}")
-backup_files = glob.glob(BACKUP_FILES_PATTERN)
-for backup_file in backup_files:
-    try:
-        target_path = os.path.join(temp_dir, os.path.basename(backup_file))
-        shutil.move(backup_file, target_path)
-        logger.debug(f"Backup file moved: {backup_file} -> {target_path}")
-    except Exception as e:
-        logger.error(f"Failed to move backup file {backup_file} to temp: {e}")
-# Проверка и создание файла TIMERS_FILE, если он отсутствует
-if not os.path.exists(TIMERS_FILE):
-    with open(TIMERS_FILE, "w") as f:
-        json.dump({}, f)  # Создаём пустой JSON-файл
-    logger.debug(f"Timers file created: {TIMERS_FILE}")
-else:
-    logger.debug(f"Timers file already exists: {TIMERS_FILE}")
-
-
-def schedule_periodic_update_check(task_queue: Queue, interval: int = DEFAULT_UPDATE_INTERVAL):
+QUEUE_STATE_FILE = os.path.join(temp_dir, "queue_state.json")  # Очередь, сохранённая перед перезапуском
+
+# Применение изменённых настроек без перезапуска
+settings.subscribe(lambda changed: task_queue.apply_settings(settings),
+                   keys=["PRIORITY_OVERDUE_WEIGHT", "PRIORITY_YIELD_WEIGHT"])
+settings.subscribe(lambda changed: circuit_breakers.apply_settings(settings),
+                   keys=["CIRCUIT_BREAKER_THRESHOLD", "CIRCUIT_BREAKER_PROBE_INTERVAL"])
+settings.subscribe(lambda changed: account_reconciler.request(),
+                   keys=["ACCOUNTS", "ACCOUNT_GROUP", "ACCOUNT_TAGS"])
+settings.subscribe(lambda changed: status_view.apply_settings(settings),
+                   keys=["STATUS_TABLE_INTERVAL"])
+settings.subscribe(lambda changed: concurrency_controller.apply_settings(settings),
+                   keys=["CONCURRENCY_MIN", "CONCURRENCY_MAX"])
+profile_inventory.on_change = lambda: account_reconciler.request()
+
+
+def schedule_periodic_update_check(task_queue: Queue):
     """
-    Планирует периодическую проверку обновлений, добавляя задачу в очередь с учётом stop_event.
+    Планирует периодическую проверку обновлений в отдельном потоке, вне очереди аккаунтов.
+    Проверка откладывается, пока в очереди есть аккаунты, ожидающие запуска.
+    Интервал UPDATE_INTERVAL читается из настроек перед каждым ожиданием.
     """
     def periodic_task():
         while not stop_event.is_set():  # Цикл, пока не установлен stop_event
-            # time.sleep(interval)  # Пауза на указанный интервал
-            if stop_event.wait(interval):  # Проверка перед выполнением задачи
+            if stop_event.wait(settings.value("UPDATE_INTERVAL")):  # Проверка перед выполнением задачи
                 logger.debug(
                     "Stop event set. Cancelling periodic update scheduling.")
                 break
 
+            # Не проверяем обновления, пока есть просроченные аккаунты
+            while task_queue.has_pending_accounts():
+                if stop_event.wait(UPDATE_CHECK_POLL_INTERVAL):
+                    return
+
             try:
-                # Проверка на наличие задачи в очереди
-                found = any(
-                    isinstance(task, tuple) and len(
-                        task) >= 1 and task[0] == "check_updates"
-                    for task in list(task_queue.queue)
+                logger.debug("Running scheduled update check.")
+                check_and_update(
+                    priority_task_queue=task_queue,
+                    is_task_active=lambda: not task_queue.empty()
                 )
-                if not found:
-                    logger.debug("Adding scheduled update check to queue...")
-                    task_queue.put(("check_updates", None))
-                    logger.debug("Successfully added update check to queue.")
-                else:
-                    logger.debug(
-                        "Scheduled update check already exists in queue.")
             except Exception as e:
-                logger.error(f"Error in scheduling update check: {e}")
+                logger.error(f"Error in scheduled update check: {e}")
 
     # Запуск задачи в отдельном потоке
     logger.debug(
-        f"Starting periodic update check thread with interval {interval} seconds.")
+        f"Starting periodic update check thread with interval {settings.value('UPDATE_INTERVAL')} seconds.")
     Thread(target=periodic_task, daemon=True).start()
 
 
@@ -122,14 +155,14 @@ def load_timers():
         with open(TIMERS_FILE, "r") as f:
             timers = json.load(f)
 
-        current_time = datetime.now()
+        current_time = epoch_now()
 
-        # Фильтруем устаревшие таймеры
-        filtered_timers = {
-            account: data
-            for account, data in timers.items()
-            if datetime.strptime(data["next_schedule"], "%Y-%m-%d %H:%M:%S") > current_time
-        }
+        # Фильтруем устаревшие таймеры (старый формат со строкой времени переводится в epoch)
+        filtered_timers = {}
+        for account, data in timers.items():
+            next_schedule = to_epoch(data["next_schedule"])
+            if next_schedule is not None and next_schedule > current_time:
+                filtered_timers[account] = dict(data, next_schedule=next_schedule)
 
         if is_debug_enabled():
             logger.debug(
@@ -188,254 +221,162 @@ def save_timers(timers):
 def process_account(account, balance_dict, active_timers):
     """
     Обрабатывает указанный аккаунт, выполняя задания и обновляя данные балансов.
-    Если другой аккаунт уже обрабатывается, ждёт его завершения.
+    Число одновременно обрабатываемых аккаунтов ограничивает обработчик очереди (session_limiter).
     """
 
     logger.info(f"Processing account: {account}", extra={'color': Fore.CYAN})
-    retry_count = 0
-    success = False
-    message_logged = False
-    global bot
-
-    while not stop_event.is_set():
-        # Пытаемся захватить блокировку
-        if active_profile_lock.acquire(blocking=False):
-            try:
-                logger.debug(
-                    f"#{account}: Starting processing for account: {account}")
-                with account_lock:
-                    while retry_count < 3 and not success and not stop_event.is_set():
-                        try:
-                            if stop_event.is_set():
-                                logger.debug(
-                                    f"#{account}: Stop event detected. Exiting.")
-                                return
-
-                            # Инициализация объекта TelegramBotAutomation
-                            bot = TelegramBotAutomation(account, settings)
-
-                            # Выполнение действий
-                            navigate_and_perform_actions(bot, account)
-
-                            # Получение данных аккаунта
-                            username = bot.get_username()
-                            if not username or username == "N/A":
-                                raise ValueError(
-                                    f"#{account}: Invalid username")
-
-                            balance = parse_balance(
-                                balance=bot.get_update_balance())
-                            if balance <= 0:
-                                raise ValueError(
-                                    f"#{account}: Invalid balance")
-
-                            next_schedule = calculate_next_schedule(
-                                bot.get_remaining_time())
-
-                            # Обновление баланса
-                            update_balance_info(
-                                account, username, balance, next_schedule, "Success", balance_dict
-                            )
-                            success = True
-                            logger.info(
-                                f"#{account}: Next schedule: {next_schedule.strftime('%Y-%m-%d %H:%M:%S')}"
-                            )
-
-                            # Установка таймера
-                            if next_schedule:
-                                schedule_next_run(
-                                    account, next_schedule, balance_dict, active_timers
-                                )
-
-                        except Exception as e:
-                            retry_count += 1
-                            logger.debug(
-                                f"#{account}: Error on attempt {retry_count}: {e}"
-                            )
-                            update_balance_info(
-                                account, "N/A", 0.0, datetime.now(), "ERROR", balance_dict
-                            )
-                            if retry_count >= 3:
-                                retry_delay = random.randint(
-                                    1800, 4200)  # 30–70 минут
-                                next_retry_time = datetime.now() + timedelta(seconds=retry_delay)
-                                schedule_retry(
-                                    account, next_retry_time, balance_dict, active_timers, retry_delay
-                                )
-
-                        finally:
-                            if not stop_event.is_set():
-                                if bot:
-                                    try:
-                                        bot.browser_manager.close_browser()
-                                    except Exception:
-                                        logger.debug(
-                                            f"#{account}: Failed to close browser.")
-
-                if success:
-                    generate_and_display_table(
-                        balance_dict, table_type="balance", show_total=True)
-
-            finally:
-                active_profile_lock.release()
-                logger.debug(f"#{account}: Completed processing for account.")
-            break  # Выходим из цикла ожидания
+    if stop_event.is_set():
+        logger.debug(f"#{account}: Stop event detected. Exiting.")
+        return
 
+    logger.debug(f"#{account}: Starting processing for account: {account}")
+    session_started_at = time.time()
+    # Запись в историю запусков (длительности этапов, результат, баланс)
+    run = run_history.start_run(account, previous_balance(account))
+    try:
+        # Сессия браузера (в этом процессе или в дочернем, ISOLATED_WORKERS)
+        def on_event(kind, data):
+            if kind == "phase":
+                run.phase(data)
+            elif kind == "success":
+                circuit_breakers.record_success(data)
+
+        options = {"wait_for_full": claim_wait(account)}
+        if session_pool is not None:
+            result = session_pool.run(
+                account, options, on_event, stop_event)
         else:
-            if not message_logged:
-                logger.debug(f"#{account}: Waiting for active profile lock.")
-                message_logged = True
-            # Используем `wait` вместо `time.sleep` для быстрого выхода
-            stop_event.wait(1)
+            result = run_session(account, options, on_event)
+        if stop_event.is_set():
+            run.finish(INTERRUPTED)
+            return
+        username = result["username"]
+        balance = result["balance"]
+        schedule_time = result["schedule_time"]
+        record_fill_observations(account, result)
+        next_schedule = calculate_next_schedule(
+            schedule_time, account=account,
+            predicted_fill=fill_model.predict_fill_time(account))
+        screen_fill_at = None  # Момент заполнения по оставшемуся времени с экрана
+        if result["remaining_seconds"] is not None:
+            screen_fill_at = result["finished_at"] + result["remaining_seconds"]
+            fill_model.record_remaining(account, screen_fill_at)
+        next_schedule = prelaunch_time(account, next_schedule, screen_fill_at)
+
+        # Обновление баланса
+        update_balance_info(
+            account, username, balance, next_schedule, AccountStatus.SUCCESS, balance_dict
+        )
+        retry_policy.record_success(account)
+        account_stats.record_run(
+            account, session_started_at, time.time(), balance)
+        run.finish(SUCCESS, balance_after=balance)
+        concurrency_controller.record(failed=False)
+        logger.info(
+            f"#{account}: Next schedule: {format_epoch(to_epoch(next_schedule))}"
+        )
+
+        # Установка таймера
+        if next_schedule:
+            schedule_next_run(
+                account, next_schedule, balance_dict, active_timers
+            )
 
+    except Exception as e:
         if stop_event.is_set():
-            logger.debug(
-                f"#{account}: Stop event detected in outer loop. Exiting.")
+            run.finish(INTERRUPTED)
             return
+        # Повтор с задержкой в зависимости от класса сбоя
+        failure_class = classify_failure(e)
+        run.finish(FAILURE, failure_class=failure_class)
+        concurrency_controller.record(failed=True, timed_out=failure_class == "timeout")
+        circuit_breakers.record_failure(failure_class)
+        with failures_lock:
+            recent_failures.append({
+                "account": account, "failure_class": failure_class,
+                "error": str(e), "time": epoch_now(),
+            })
+        retry_delay = retry_policy.next_delay(
+            account, failure_class)
+        logger.warning(
+            f"#{account}: Processing failed ({failure_class}): {e}. "
+            f"Retrying in {retry_delay} seconds."
+        )
+        next_retry_time = datetime.now() + timedelta(seconds=retry_delay)
+        schedule_retry(
+            account, next_retry_time, balance_dict, active_timers, retry_delay
+        )
 
+    finally:
+        circuit_breakers.finish_dispatch(account)
+        logger.debug(f"#{account}: Completed processing for account.")
 
-# Навигация и выполнение действий с ботом
 
+def prelaunch_time(account, next_schedule, fill_at=None):
+    """
+    Момент запуска аккаунта с упреждением: браузер открывается раньше заполнения
+    хранилища на время подготовки (медиана по истории запусков + запас),
+    чтобы мини-приложение было открыто к моменту заполнения.
 
-def navigate_and_perform_actions(bot, account):
+    :param next_schedule: Время запуска без упреждения (datetime).
+    :param fill_at: Момент заполнения по времени с экрана (epoch); без него — прогноз модели.
+    :return: Время запуска (epoch или исходное значение, если упреждение не применяется).
     """
-    Навигация и выполнение всех задач с ботом.
+    if not settings.value("PRELAUNCH_ENABLED"):
+        return next_schedule
+    if fill_at is None:
+        # Прогноз только при отсутствии времени с экрана: устаревшая модель ошибается сильнее
+        fill_at = fill_model.predict_fill_time(account)
+    if fill_at is None:
+        return next_schedule
+    lead = (run_history.ready_duration(account) or DEFAULT_READY_DURATION) + PRELAUNCH_MARGIN
+    launch_at = max(epoch_now(), int(fill_at - lead))
+    logger.info(
+        f"#{account}: Storage full at {format_epoch(fill_at)}. Prelaunch at {format_epoch(launch_at)}.")
+    return launch_at
+
+
+def claim_wait(account):
     """
-    if stop_event.is_set():
-        logger.info("Stop event detected. Aborting navigation and actions.")
-        return
-
-    if not bot.navigate_to_bot():
-        raise Exception("Failed to navigate to bot")
-
-    if stop_event.is_set():
-        logger.debug("Stop event detected. Aborting after navigation.")
-        return
-
-    if not bot.send_message():
-        raise Exception("Failed to send message")
-
-    if stop_event.is_set():
-        logger.debug("Stop event detected. Aborting after sending message.")
-        return
-
-    if not bot.click_link():
-        raise Exception("Failed to start app")
-
-    if stop_event.is_set():
-        logger.debug("Stop event detected. Aborting after starting app.")
-        return
-
-    # if bot.is_new_account_page():
-    #     if bot.run_account_registration_process():
-    #         logger.info("New account created successfully.")
-    #     else:
-    #         logger.warning("Failed to create new account.")
-    # bot.process_claim_block()
-
-    # if not is_account_completed(account):
-    #     try:
-    #         bot.process_mission_quests()
-    #     except Exception as e:
-    #         logger.error(f"Error occurred during mission quests: {e}")
-    #         bot.open_section(1, "Home")
-    # else:
-    #     logger.info(f"Account {account}: Quests already completed, skipping.")
-
-    if stop_event.is_set():
-        logger.debug("Stop event detected. Aborting before run courses.")
-        return
-
-    logger.debug("Starting farming...")
-    bot.farming()
-    if stop_event.is_set():
-        logger.debug("Stop event detected. Aborting before performing quests.")
-        return
-
-    bot.farming()
-
-# Парсинг баланса
+    Сколько секунд ждать заполнения хранилища в открытом приложении: до прогнозируемого
+    момента заполнения, но не дольше PRELAUNCH_MAX_WAIT.
+    """
+    if not settings.value("PRELAUNCH_ENABLED"):
+        return 0
+    fill_at = fill_model.predict_fill_time(account)
+    if fill_at is None:
+        return 0
+    wait = fill_at - epoch_now() + PRELAUNCH_MARGIN
+    return wait if 0 < wait <= settings.value("PRELAUNCH_MAX_WAIT") else 0
 
 
-def parse_balance(balance):
+def record_fill_observations(account, result):
     """
-    Парсинг баланса из строки в число.
+    Передаёт в модель заполнения замеры процента и клейм за сессию (по времени).
 
-    :param balance: Строка с балансом.
-    :return: Баланс в формате float или 0.0 при ошибке.
+    :param result: Результат сессии (account_session.run_session).
     """
-    try:
-        if balance is None:
-            if is_debug_enabled():
-                logger.debug(
-                    f"#{account}: Received None for balance. Returning 0.0.")
-            return 0.0
-
-        if isinstance(balance, (int, float)):
-            if is_debug_enabled():
-                logger.debug(
-                    f"#{account}: Balance is already numeric: {balance}")
-            return float(balance)
-
-        if isinstance(balance, str) and balance.replace('.', '', 1).isdigit():
-            parsed_balance = float(balance)
-            if is_debug_enabled():
-                logger.debug(
-                    f"#{account}: Parsed balance successfully: {parsed_balance}")
-            return parsed_balance
-
-        if is_debug_enabled():
-            logger.debug(
-                f"#{account}: Invalid balance format: {balance}. Returning 0.0.")
-        return 0.0
-    except Exception as e:
-        logger.error(f"#{account}: Error parsing balance: {e}")
-        if is_debug_enabled():
-            logger.debug(
-                f"#{account}: Error traceback:", exc_info=True)
-        return 0.0
+    events = [(at, percent) for at, percent in result["storage_readings"]]
+    if result["claimed_at"] is not None:
+        events.append((result["claimed_at"], None))
+    for at, percent in sorted(events, key=lambda event: event[0]):
+        if percent is None:
+            fill_model.record_claim(account, at)
+        else:
+            fill_model.record_reading(account, percent, at)
 
 
-# Расчет следующего выполнения
-def calculate_next_schedule(schedule_time):
+def previous_balance(account):
     """
-    Расчёт времени следующего выполнения.
-
-    :param schedule_time: Время в формате "HH:MM:SS" или None.
-    :return: Объект datetime с рассчитанным временем.
+    Баланс аккаунта после последнего успешного запуска (None, если неизвестен).
     """
-    try:
-        if schedule_time and ":" in schedule_time:
-            hours, minutes, seconds = map(int, schedule_time.split(":"))
-            next_schedule = datetime.now() + timedelta(hours=hours, minutes=minutes,
-                                                       seconds=seconds) + timedelta(minutes=random.randint(5, 30))
-            if is_debug_enabled():
-                logger.debug(
-                    f"#{account}: Next schedule calculated from provided time '{schedule_time}': {next_schedule.strftime('%Y-%m-%d %H:%M:%S')}")
-            return next_schedule
-
-        # Если schedule_time недоступно или некорректно
-        default_schedule = datetime.now() + timedelta(hours=8)
-        if is_debug_enabled():
-            logger.debug(
-                f"#{account}: Default schedule time applied: {default_schedule.strftime('%Y-%m-%d %H:%M:%S')}")
-        return default_schedule
-
-    except Exception as e:
-        logger.error(
-            f"#{account}: Error calculating next schedule from time '{schedule_time}': {e}")
-        if is_debug_enabled():
-            logger.debug(
-                f"#{account}: Error traceback:", exc_info=True)
-        # Возвращаем стандартное значение при ошибке
-        fallback_schedule = datetime.now() + timedelta(hours=8)
-        if is_debug_enabled():
-            logger.debug(
-                f"#{account}: Fallback schedule time applied: {fallback_schedule.strftime('%Y-%m-%d %H:%M:%S')}")
-        return fallback_schedule
+    with balance_lock:
+        state = balance_dict.get(account)
+        if state is None or state.status is not AccountStatus.SUCCESS:
+            return None
+        return state.balance
 
 
-# Обновление информации о балансе
 def update_balance_info(account, username, balance, next_schedule, status, balance_dict):
     """
     Обновление информации о балансе и таймерах.
@@ -443,30 +384,26 @@ def update_balance_info(account, username, balance, next_schedule, status, balan
     :param account: Аккаунт.
     :param username: Имя пользователя.
     :param balance: Текущий баланс.
-    :param next_schedule: Время следующего запуска.
-    :param status: Статус выполнения.
-    :param balance_dict: Словарь с балансами.
+    :param next_schedule: Время следующего запуска (datetime или epoch).
+    :param status: Статус выполнения (AccountStatus).
+    :param balance_dict: Словарь {аккаунт: AccountState}.
     """
     try:
         with balance_lock:
-            # Обновление баланса в словаре
-            balance_dict[account] = {
-                "username": username,
-                "balance": balance,
-                "next_schedule": next_schedule.strftime("%Y-%m-%d %H:%M:%S"),
-                "status": status,
-            }
+            # Обновление состояния аккаунта (время в epoch)
+            state = AccountState(username, balance, to_epoch(next_schedule), status)
+            balance_dict[account] = state
+            status_view.mark_changed(account)
 
             # Загрузка и обновление таймеров
             timers_data = load_timers()
-            # Синхронизация данных
-            timers_data[account] = balance_dict[account]
+            timers_data[account] = state.to_record()
             save_timers(timers_data)
 
             if is_debug_enabled():
                 logger.debug(
                     f"#{account}: updated: "
-                    f"Username: {username}, Balance: {balance}, Next Schedule: {next_schedule.strftime('%Y-%m-%d %H:%M:%S')}, Status: {status}"
+                    f"Username: {username}, Balance: {balance}, Next Schedule: {format_epoch(state.next_schedule)}, Status: {status.value}"
                 )
     except Exception as e:
         logger.error(
@@ -480,16 +417,18 @@ def update_balance_info(account, username, balance, next_schedule, status, balan
 def schedule_next_run(account, next_schedule, balance_dict, active_timers):
     """
     Планирует следующий запуск для указанного аккаунта.
+    Ожидание идёт по монотонным часам (см. time_base.DeadlineScheduler),
+    просроченный аккаунт сразу ставится в очередь.
 
     :param account: Аккаунт для запуска.
-    :param next_schedule: Время следующего запуска.
+    :param next_schedule: Время следующего запуска (datetime или epoch).
     :param balance_dict: Словарь с балансами аккаунтов.
     :param active_timers: Список активных таймеров.
     """
     try:
-        delay = (next_schedule - datetime.now()).total_seconds()
+        next_schedule = to_epoch(next_schedule)
 
-        if delay > 0:
+        if next_schedule > epoch_now():
             with balance_lock:
                 if stop_event.is_set():
                     logger.info(
@@ -497,17 +436,11 @@ def schedule_next_run(account, next_schedule, balance_dict, active_timers):
                     return
 
                 timers_data = load_timers()
-                account_data = balance_dict.get(account, {})
-                username = account_data.get("username", "N/A")
-                balance = account_data.get("balance", 0.0)
+                state = balance_dict.get(account) or AccountState()
 
                 # Обновляем информацию о таймере
-                timers_data[account] = {
-                    "username": username,
-                    "next_schedule": next_schedule.strftime("%Y-%m-%d %H:%M:%S"),
-                    "status": "Active",
-                    "balance": balance,
-                }
+                timers_data[account] = AccountState(
+                    state.username, state.balance, next_schedule, AccountStatus.ACTIVE).to_record()
                 save_timers(timers_data)
 
             def run_after_delay():
@@ -529,20 +462,23 @@ def schedule_next_run(account, next_schedule, balance_dict, active_timers):
                     f"#{account}: Adding account to task queue after delay.")
                 task_queue.put((account, balance_dict, active_timers))
 
-            # Создаём таймер и запускаем его
-            timer = Timer(delay, run_after_delay)
-            active_timers.append(timer)
-            timer.start()
+            # Создаём отложенную задачу
+            timer = deadline_scheduler.schedule(
+                account, next_schedule, run_after_delay)
+            with timers_lock:
+                active_timers.append(timer)
 
             if is_debug_enabled():
                 logger.debug(
-                    f"#{account}: Timer set for {next_schedule.strftime('%Y-%m-%d %H:%M:%S')} "
-                    f"with a delay of {delay:.2f} seconds."
+                    f"#{account}: Timer set for {format_epoch(next_schedule)} "
+                    f"with a delay of {next_schedule - epoch_now():.2f} seconds."
                 )
         else:
-            logger.warning(
-                f"#{account}: Next schedule for account {account} is in the past ({next_schedule}). Skipping scheduling..."
+            # Окно клейма уже наступило: ставим аккаунт в очередь сразу
+            logger.info(
+                f"#{account}: Next schedule ({format_epoch(next_schedule)}) is overdue. Queuing immediately."
             )
+            task_queue.put((account, balance_dict, active_timers))
     except Exception as e:
         logger.error(
             f"#{account}: Error scheduling next run for account {account}: {e}"
@@ -553,14 +489,154 @@ def schedule_next_run(account, next_schedule, balance_dict, active_timers):
             )
 
 
+def save_reconciled_timers(tasks):
+    """
+    Сохраняет сроки таймеров, пересчитанные после скачка часов или сна системы.
+
+    :param tasks: Список задач time_base.ScheduledTask.
+    """
+    with balance_lock:
+        timers_data = load_timers()
+        for task in tasks:
+            if task.key in timers_data:
+                timers_data[task.key]["next_schedule"] = task.epoch_deadline
+            if task.key in balance_dict:
+                balance_dict[task.key].next_schedule = task.epoch_deadline
+        save_timers(timers_data)
+
+
+def defer_if_not_claimable(account):
+    """
+    Проверка перед запуском: если по времени последнего клейма и скорости заполнения
+    хранилище заведомо не заполнено, запуск браузера ничего не даст. Такой аккаунт
+    не запускается, а планируется на прогнозируемый момент заполнения.
+
+    Проверка применяется только при известном времени клейма (fill_model.last_claim)
+    и не применяется к аккаунтам, запущенным вручную.
+
+    :return: True, если запуск отложен.
+    """
+    if not settings.value("SKIP_LAUNCH_GUARD") or account in forced_accounts:
+        return False
+    last_claim = fill_model.last_claim(account)
+    fill_at = fill_model.predict_fill_time(account)
+    if last_claim is None or fill_at is None or fill_at - epoch_now() <= SKIP_LAUNCH_MARGIN:
+        return False
+
+    logger.info(
+        f"#{account}: Storage is not full yet (claimed at {format_epoch(last_claim)}, "
+        f"full at {format_epoch(fill_at)}). Deferring launch.")
+    with balance_lock:
+        state = balance_dict.get(account)
+        if state is not None:
+            state.next_schedule = int(fill_at)
+            status_view.mark_changed(account)
+    schedule_next_run(account, fill_at, balance_dict, active_timers)
+    return True
+
+
+def acquire_cluster_lease(account):
+    """
+    Берёт аккаунт в аренду в кластере. Если аккаунт арендован другим узлом
+    (переход между узлами), запуск откладывается до окончания чужой аренды.
+
+    :return: True, если аккаунт можно запускать.
+    """
+    if cluster is None:
+        return True
+    try:
+        held_until = cluster.acquire(account)
+    except Exception as e:
+        logger.warning(f"#{account}: Cluster lease failed: {e}. Retrying later.")
+        held_until = epoch_now() + cluster.heartbeat_interval
+    if held_until is None:
+        return True
+    logger.info(
+        f"#{account}: Account is being processed by another node. Retrying at {format_epoch(held_until)}.")
+    schedule_next_run(account, held_until, balance_dict, active_timers)
+    return False
+
+
+def release_cluster_lease(account):
+    """
+    Освобождает аренду и передаёт в кластер время следующего запуска.
+    """
+    if cluster is None:
+        return
+    with balance_lock:
+        state = balance_dict.get(account)
+        next_schedule = state.next_schedule if state is not None else None
+    cluster.release(account, next_schedule)
+
+
+def desired_accounts():
+    """
+    Аккаунты этого узла: все аккаунты из настроек, а в кластере — только принадлежащие узлу.
+    """
+    accounts = get_accounts()
+    if cluster is None:
+        return accounts
+    return cluster.filter_owned(accounts)
+
+
+def start_cluster(settings):
+    """
+    Подключает узел к кластеру, если задан CLUSTER_DB.
+    """
+    global cluster
+    db_path = settings.value("CLUSTER_DB").strip()
+    if not db_path:
+        return
+    cluster = ClusterCoordinator(
+        db_path, node_id=settings.value("CLUSTER_NODE_ID").strip() or None)
+    # При изменении состава узлов аккаунты перераспределяются сверкой
+    cluster.on_change = account_reconciler.request
+    cluster.start(stop_event)
+    logger.info(f"Cluster mode: node '{cluster.node_id}', database {db_path}.")
+
+
+def start_session_pool(settings):
+    """
+    Создаёт пул дочерних процессов для сессий аккаунтов, если включён ISOLATED_WORKERS.
+    """
+    global session_pool
+    if not settings.value("ISOLATED_WORKERS"):
+        return
+    session_pool = ProcessPool(
+        run_session,
+        size=session_limiter.limit,
+        max_sessions=settings.value("WORKER_MAX_SESSIONS"),
+        session_timeout=settings.value("WORKER_SESSION_TIMEOUT"),
+        on_abandon=close_profile,
+        visible_mode=visible.is_set(),
+    )
+    settings.subscribe(lambda changed: session_pool.apply_settings(settings),
+                       keys=["WORKER_MAX_SESSIONS", "WORKER_SESSION_TIMEOUT"])
+    logger.info(
+        f"Isolated workers enabled: worker process is recycled after "
+        f"{session_pool.max_sessions} sessions.")
+
+
 def task_queue_processor(task_queue, active_timers):
     global has_logged_queue_empty
     """
-    Основной обработчик задач из очереди. Выполняет задачи последовательно.
+    Основной обработчик задач из очереди. Аккаунты обрабатываются в отдельных потоках,
+    не больше session_limiter.limit одновременно. Задача берётся из очереди только при
+    свободном месте, поэтому приоритет определяется в момент запуска.
     """
     logger.debug("Task queue processor started.")
     while not stop_event.is_set():
         try:
+            # Перед перезапуском новые задачи не берутся, они останутся в сохранённой очереди.
+            # При ручной паузе задачи остаются в очереди до возобновления.
+            if drain_event.is_set() or dispatch_paused.is_set():
+                stop_event.wait(1)
+                continue
+
+            # Ждём свободное место для сессии
+            if not session_limiter.wait_available(timeout=1):
+                continue
+
             # Получаем задачу из очереди с таймаутом
             try:
                 task = task_queue.get(timeout=1)  # Ждём задачу с таймаутом
@@ -583,28 +659,12 @@ def task_queue_processor(task_queue, active_timers):
                 break
 
             if isinstance(task, tuple):
-                if len(task) == 2:  # Task: check_updates
-                    task_type, task_data = task
-                    if task_type == "check_updates":
-                        logger.debug("Running scheduled update check.")
-                        try:
-                            check_and_update(
-                                priority_task_queue=task_queue,
-                                is_task_active=lambda: not task_queue.empty()
-                            )
-                        except Exception as e:
-                            logger.debug(f"Error during update check: {e}")
-                elif len(task) == 3:  # Task: process_account
-                    account, balance_dict, active_timers = task
-                    logger.debug(f"Processing account {account} from queue.")
+                if len(task) == 3:  # Task: process_account
                     try:
-                        process_account(account, balance_dict, active_timers)
-                    except Exception as e:
-                        logger.debug(
-                            f"Error processing account {account}: {e}")
-                        update_balance_info(
-                            account, "N/A", 0.0, datetime.now(), "ERROR", balance_dict
-                        )
+                        dispatch_account(task)
+                    finally:
+                        # Аккаунт уже запущен, отложен или возвращён в очередь
+                        task_queue.release_reserved(task[0])
                 else:
                     logger.debug(f"Unknown task structure: {task}")
             else:
@@ -625,10 +685,88 @@ def task_queue_processor(task_queue, active_timers):
     logger.debug("Task queue processor stopped.")
 
 
+def dispatch_account(task):
+    """
+    Проверяет, можно ли запускать аккаунт, и запускает его обработку в отдельном потоке.
+
+    :param task: Задача (аккаунт, balance_dict, active_timers).
+    :return: True, если обработка запущена.
+    """
+    global has_logged_dispatch_paused
+    account, balance_dict, active_timers = task
+    if not circuit_breakers.allow_dispatch(account):
+        # Зависимость недоступна: возвращаем аккаунт в очередь и ждём
+        if not has_logged_dispatch_paused:
+            logger.info(
+                "Dispatch paused by circuit breaker. Waiting for probe.")
+            has_logged_dispatch_paused = True
+        task_queue.put(task)
+        stop_event.wait(CIRCUIT_BREAKER_WAIT)
+        return False
+    has_logged_dispatch_paused = False
+    if account in active_accounts:
+        # Аккаунт уже обрабатывается, следующий запуск запланирует текущая обработка
+        logger.debug(f"#{account}: Account is already being processed. Skipping.")
+        circuit_breakers.finish_dispatch(account)
+        return False
+    if cluster is not None and not cluster.owns(account):
+        # Аккаунт перешёл к другому узлу
+        logger.debug(f"#{account}: Account belongs to another node. Skipping.")
+        circuit_breakers.finish_dispatch(account)
+        return False
+    if defer_if_not_claimable(account) or not acquire_cluster_lease(account):
+        circuit_breakers.finish_dispatch(account)
+        return False
+    if not session_limiter.try_acquire(timeout=0):
+        # Предел уменьшен, пока аккаунт проверялся: запуск при освобождении места
+        release_cluster_lease(account)
+        circuit_breakers.finish_dispatch(account)
+        task_queue.put(task)
+        return False
+    forced_accounts.discard(account)
+    logger.debug(f"Processing account {account} from queue.")
+    with active_lock:
+        active_accounts.add(account)
+    Thread(target=run_account_task, args=(account, balance_dict, active_timers),
+           daemon=True).start()
+    return True
+
+
+def in_flight_accounts():
+    """
+    Снимок обрабатываемых аккаунтов: перебирать сам active_accounts из других
+    потоков нельзя, потоки аккаунтов меняют его в это время.
+    """
+    with active_lock:
+        return set(active_accounts)
+
+
+def run_account_task(account, balance_dict, active_timers):
+    """
+    Обработка аккаунта в потоке, запущенном dispatch_account.
+    """
+    try:
+        process_account(account, balance_dict, active_timers)
+    except Exception as e:
+        logger.debug(
+            f"Error processing account {account}: {e}")
+        update_balance_info(
+            account, "N/A", 0.0, datetime.now(), AccountStatus.ERROR, balance_dict
+        )
+    finally:
+        release_cluster_lease(account)
+        # Прерванный остановкой аккаунт остаётся отмеченным для сохранения очереди
+        if not stop_event.is_set():
+            with active_lock:
+                active_accounts.discard(account)
+        session_limiter.release()
+
+
 # Планирование повторной попытки
 def schedule_retry(account, next_retry_time, balance_dict, active_timers, retry_delay):
     """
     Планирование повторной попытки выполнения.
+    По истечении задержки аккаунт возвращается в общую очередь задач.
 
     :param account: Аккаунт для повторной попытки.
     :param next_retry_time: Время следующей попытки.
@@ -645,12 +783,12 @@ def schedule_retry(account, next_retry_time, balance_dict, active_timers, retry_
 
         # Обновляем информацию о следующем запуске
         update_balance_info(
-            account, "N/A", 0.0, next_retry_time, "ERROR", balance_dict
+            account, "N/A", 0.0, next_retry_time, AccountStatus.ERROR, balance_dict
         )
 
         def retry_task():
             """
-            Запускает повторную попытку process_account после задержки.
+            Возвращает аккаунт в очередь задач после задержки.
             """
             try:
                 if stop_event.is_set():
@@ -659,20 +797,23 @@ def schedule_retry(account, next_retry_time, balance_dict, active_timers, retry_
                     return  # Прерываем выполнение задачи
 
                 logger.debug(
-                    f"#{account}: Retrying process_account after delay.")
-                process_account(account, balance_dict, active_timers)
+                    f"#{account}: Adding account to task queue for retry.")
+                task_queue.put((account, balance_dict, active_timers))
             except Exception as retry_error:
                 logger.debug(
                     f"#{account}: Exception during retry execution: {retry_error}", exc_info=True
                 )
             finally:
                 # Удаляем таймер из active_timers после завершения
-                active_timers.remove(timer)
-
-        # Создаём таймер и добавляем в список активных таймеров
-        timer = Timer(retry_delay, retry_task)
-        active_timers.append(timer)
-        timer.start()
+                with timers_lock:
+                    if timer in active_timers:
+                        active_timers.remove(timer)
+
+        # Создаём отложенную задачу и добавляем в список активных таймеров
+        timer = deadline_scheduler.schedule(
+            account, to_epoch(next_retry_time), retry_task)
+        with timers_lock:
+            active_timers.append(timer)
 
         # Логирование для отладки
         logger.debug(
@@ -685,75 +826,35 @@ def schedule_retry(account, next_retry_time, balance_dict, active_timers, retry_
         )
 
 
-def generate_and_display_table(data, table_type="balance", show_total=True):
+def generate_and_display_table(data, table_type="balance"):
     """
     Универсальная функция для генерации и вывода таблиц.
+    Таблица балансов выводится через status_view (полная таблица по всем аккаунтам).
     """
     try:
-        table = PrettyTable()
-        total_balance = 0
-
         if table_type == "balance":
-            table.field_names = ["ID", "Username",
-                                 "Balance", "Next Scheduled Time", "Status"]
-            with balance_lock:
-                sorted_data = sorted(
-                    data.items(),
-                    key=lambda item: datetime.strptime(
-                        item[1]["next_schedule"], "%Y-%m-%d %H:%M:%S"
-                    ) if item[1]["next_schedule"] != "N/A" else datetime.max
-                )
+            status_view.render(full=True)
+            return
 
-                for account, details in sorted_data:
-                    balance = (
-                        int(details["balance"])
-                        if details["balance"] == int(details["balance"])
-                        else round(details["balance"], 2)
-                    )
-                    next_schedule = (
-                        datetime.strptime(
-                            details["next_schedule"], "%Y-%m-%d %H:%M:%S"
-                        ).strftime("%Y-%m-%d %H:%M:%S")
-                        if details["next_schedule"] != "N/A" else "N/A"
-                    )
-                    # Цвета с приоритетом: ANSI -> Windows API -> Без цвета
-                    color = get_color(
-                        Fore.RED) if details["status"] == "ERROR" else get_color(Fore.CYAN)
-                    reset = get_color(Style.RESET_ALL)
-
-                    table.add_row([
-                        f"{color}{account}{reset}",
-                        f"{color}{details['username']}{reset}",
-                        f"{color}{balance}{reset}",
-                        f"{color}{next_schedule}{reset}",
-                        f"{color}{details['status']}{reset}",
-                    ])
-                    if details["status"] != "ERROR":
-                        total_balance += balance
-
-            logger.info("\nCurrent Balance Table:\n" + str(table))
-            if show_total:
-                total_color = get_color(Fore.MAGENTA)
-                reset = get_color(Style.RESET_ALL)
-                logger.info(
-                    f"Total Balance: {total_color}{str(total_balance).rstrip('0').rstrip('.')}{reset}"
-                )
+        from prettytable import PrettyTable
 
-        elif table_type == "timers":
+        table = PrettyTable()
+
+        if table_type == "timers":
             table.field_names = ["Account ID", "Username",
                                  "Next Scheduled Time", "Status"]
+            # Время в таймерах уже в epoch (см. load_timers)
             sorted_data = sorted(
                 data.items(),
-                key=lambda item: datetime.strptime(
-                    item[1]["next_schedule"], "%Y-%m-%d %H:%M:%S"),
+                key=lambda item: item[1]["next_schedule"] or 0,
             )
 
             for account, details in sorted_data:
                 username = details.get("username", "N/A")
-                next_schedule = details["next_schedule"]
+                next_schedule = format_epoch(details["next_schedule"])
                 status = details["status"]
                 color = get_color(
-                    Fore.GREEN) if status == "Active" else get_color(Fore.RED)
+                    Fore.GREEN) if status == AccountStatus.ACTIVE.value else get_color(Fore.RED)
                 reset = get_color(Style.RESET_ALL)
 
                 table.add_row([
@@ -779,12 +880,11 @@ def sync_timers_with_balance(balance_dict):
     """
     try:
         timers_data = load_timers()
-        current_time = datetime.now()
+        current_time = epoch_now()
 
         with balance_lock:
             for account, timer_info in list(timers_data.items()):
-                next_schedule = datetime.strptime(
-                    timer_info["next_schedule"], "%Y-%m-%d %H:%M:%S")
+                next_schedule = timer_info["next_schedule"]
 
                 # Удаляем устаревшие таймеры
                 if next_schedule <= current_time:
@@ -795,14 +895,9 @@ def sync_timers_with_balance(balance_dict):
                     continue
 
                 # Если аккаунт отсутствует в balance_dict или его данные устарели, добавляем/обновляем его
-                if account not in balance_dict or balance_dict[account]["next_schedule"] != timer_info["next_schedule"]:
-                    balance_dict[account] = {
-                        "username": timer_info.get("username", "N/A"),
-                        # Загружаем баланс из таймеров
-                        "balance": timer_info.get("balance", 0.0),
-                        "next_schedule": timer_info["next_schedule"],
-                        "status": timer_info["status"]
-                    }
+                if account not in balance_dict or balance_dict[account].next_schedule != next_schedule:
+                    # Загружаем баланс и статус из таймеров
+                    balance_dict[account] = AccountState.from_record(timer_info)
                     if is_debug_enabled():
                         logger.debug(
                             f"Timer data synced with balance.")
@@ -822,8 +917,363 @@ def sync_timers_with_balance(balance_dict):
                 f"Error traceback:", exc_info=True)
 
 
+def drain_for_restart(settings):
+    """
+    Ожидает запрос перезапуска (drain_event) и плавно останавливает обработку:
+    новые аккаунты не запускаются, текущие дорабатывают не дольше RESTART_DRAIN_TIMEOUT,
+    после чего устанавливается stop_event.
+    """
+    while not stop_event.is_set():
+        if not drain_event.wait(1):
+            continue
+
+        timeout = settings.value("RESTART_DRAIN_TIMEOUT")
+        reason = "Restart" if getattr(stop_event, "restart_mode", False) else "Drain"
+        logger.info(f"{reason} requested. Waiting for active accounts to finish...",
+                    extra={'color': Fore.YELLOW})
+
+        deadline = time.monotonic() + timeout
+        while in_flight_accounts() and time.monotonic() < deadline:
+            if stop_event.wait(1):
+                return
+        remaining = in_flight_accounts()
+        if remaining:
+            logger.warning(
+                f"Accounts {', '.join(map(str, sorted(remaining)))} did not finish "
+                f"within {timeout} seconds. Restarting anyway.")
+        stop_event.set()
+        return
+
+
+def save_queue_state(task_queue):
+    """
+    Сохраняет очередь аккаунтов и счётчики повторов перед перезапуском.
+    Таймеры уже сохранены в timers.json, поэтому новый процесс не запустит
+    отработавшие аккаунты повторно, а ожидающие получат прежний приоритет.
+    """
+    pending = task_queue.pending_accounts()
+    # Аккаунты, прерванные по таймауту, нужно обработать заново
+    pending[:0] = [(account, epoch_now()) for account in in_flight_accounts()]
+    state = {
+        "saved_at": epoch_now(),
+        "accounts": [{"account": account, "due": due} for account, due in pending],
+        "retry_attempts": retry_policy.export_state(),
+    }
+    try:
+        with open(QUEUE_STATE_FILE, "w") as f:
+            json.dump(state, f, indent=4)
+        logger.debug(
+            f"Queue state saved: {len(pending)} pending accounts.")
+    except Exception as e:
+        logger.error(f"Failed to save queue state: {e}")
+
+
+def load_queue_state():
+    """
+    Загружает очередь, сохранённую перед перезапуском, и удаляет файл.
+
+    :return: Словарь {аккаунт: момент готовности в epoch}.
+    """
+    if not os.path.exists(QUEUE_STATE_FILE):
+        return {}
+    try:
+        with open(QUEUE_STATE_FILE, "r") as f:
+            state = json.load(f)
+        retry_policy.restore_state(state.get("retry_attempts", []))
+        pending = {entry["account"]: entry["due"]
+                   for entry in state.get("accounts", [])}
+        logger.info(f"Resuming queue after restart: {len(pending)} pending accounts.",
+                    extra={'color': Fore.CYAN})
+        return pending
+    except Exception as e:
+        logger.error(f"Failed to load queue state: {e}")
+        return {}
+    finally:
+        try:
+            os.remove(QUEUE_STATE_FILE)
+        except OSError:
+            pass
+
+
+def tracked_accounts():
+    """
+    Аккаунты, которые уже запланированы: с активным таймером, в очереди, выданные
+    из очереди или в обработке.
+    Завершённые таймеры удаляются из active_timers.
+    """
+    tracked = {timer.key for timer in live_timers()}
+    tracked.update(account for account, _ in task_queue.pending_accounts())
+    tracked.update(task_queue.reserved_accounts())
+    tracked.update(in_flight_accounts())
+    # Отложенный при выдаче аккаунт получает таймер до снятия резерва: читаем таймеры ещё раз
+    tracked.update(timer.key for timer in live_timers())
+    return tracked
+
+
+def live_timers():
+    """
+    Снимок активных таймеров. Завершённые таймеры удаляются из active_timers.
+    """
+    with timers_lock:
+        active_timers[:] = [timer for timer in active_timers if timer.is_alive()]
+        return list(active_timers)
+
+
+def take_timers(accounts):
+    """
+    Убирает из active_timers таймеры аккаунтов и возвращает их (для отмены).
+
+    :param accounts: Множество аккаунтов.
+    """
+    with timers_lock:
+        taken = [timer for timer in active_timers if timer.key in accounts]
+        active_timers[:] = [timer for timer in active_timers if timer.key not in accounts]
+    return taken
+
+
+def schedule_accounts(accounts):
+    """
+    Планирует аккаунты: по сохранённому таймеру или сразу в очередь.
+
+    :param accounts: Список аккаунтов.
+    """
+    timers_data = load_timers()
+    now = epoch_now()
+    for account in accounts:
+        if stop_event.is_set():
+            logger.info("Stop event detected. Stopping account processing.")
+            break
+        try:
+            # Проверяем таймеры и планируем выполнение
+            timer_info = timers_data.get(account) or timers_data.get(str(account))
+            if cluster is not None:
+                # В кластере общее время следующего запуска важнее локального timers.json:
+                # пока аккаунт был у другого узла, локальная запись могла устареть
+                shared_schedule = cluster.next_schedule(account)
+                if shared_schedule:
+                    timer_info = {"next_schedule": shared_schedule}
+            if timer_info and timer_info["next_schedule"] > now:
+                next_schedule = timer_info["next_schedule"]
+                logger.debug(
+                    f"#{account}: Account scheduled for {format_epoch(next_schedule)}. Skipping immediate processing."
+                )
+                schedule_next_run(
+                    account, next_schedule, balance_dict, active_timers)
+                continue
+            logger.debug(
+                f"#{account}: Adding account to task queue for processing.")
+            if account in restored_queue:
+                task_queue.restore_due_time(
+                    account, restored_queue.pop(account))
+            task_queue.put((account, balance_dict, active_timers))
+        except Exception as e:
+            logger.error(f"Error while scheduling account {account}: {e}")
+
+
+def unschedule_accounts(accounts):
+    """
+    Снимает аккаунты, удалённые из настроек или перешедшие к другому узлу кластера:
+    отменяет таймеры и убирает из очереди.
+    Обрабатываемый сейчас аккаунт дорабатывает, но следующий запуск не планируется.
+
+    :param accounts: Список аккаунтов.
+    """
+    accounts = set(accounts)
+    moved = accounts & set(get_accounts()) if cluster is not None else set()
+    for timer in take_timers(accounts):
+        if timer.key in moved:
+            logger.info(
+                f"#{timer.key}: Account moved to another node. Cancelling its timer.")
+        else:
+            logger.info(
+                f"#{timer.key}: Account removed from settings. Cancelling its timer.")
+        timer.cancel()
+    task_queue.discard_accounts(accounts)
+    if moved:
+        # Время следующего запуска теперь ведёт другой узел, локальная запись только помешает
+        with balance_lock:
+            timers_data = load_timers()
+            for account in moved:
+                timers_data.pop(account, None)
+                timers_data.pop(str(account), None)
+            save_timers(timers_data)
+
+
+# Сверка набора аккаунтов по событиям (см. account_reconciler.AccountReconciler)
+account_reconciler = AccountReconciler(
+    get_desired=desired_accounts,
+    get_tracked=tracked_accounts,
+    add_accounts=schedule_accounts,
+    remove_accounts=unschedule_accounts,
+    stop_event=stop_event,
+)
+
+
+def control_status(params):
+    """
+    Общее состояние для сервера управления: очередь, обрабатываемые аккаунты,
+    ближайшие запуски и режим работы.
+    """
+    pending = task_queue.pending_accounts()
+    with balance_lock:
+        upcoming = sorted((state.next_schedule, account) for account, state in balance_dict.items()
+                          if state.next_schedule is not None and state.next_schedule > epoch_now())
+    return {
+        "queue_depth": len(pending),
+        "queue": [{"account": account, "due": due} for account, due in pending],
+        "in_flight": sorted(in_flight_accounts()),
+        "concurrency": concurrency_controller.status(),
+        "dispatch_paused": dispatch_paused.is_set(),
+        "draining": drain_event.is_set(),
+        "circuit_open": circuit_breakers.is_open(),
+        "cluster": cluster.status() if cluster is not None else None,
+        "workers": session_pool.stats() if session_pool is not None else None,
+        # В дочерних процессах сторож браузеров работает отдельно и здесь не виден
+        "browsers": browser_watchdog.status() if session_pool is None else None,
+        "accounts": len(balance_dict),
+        "next_due": [{"account": account, "next_schedule": next_schedule,
+                      "time": format_epoch(next_schedule)}
+                     for next_schedule, account in upcoming[:10]],
+        "recent_failures": len(recent_failures),
+    }
+
+
+def control_accounts(params):
+    """
+    Состояние всех аккаунтов для сервера управления.
+    """
+    with balance_lock:
+        return {account: state.to_record() for account, state in balance_dict.items()}
+
+
+def resolve_account(value):
+    """
+    Находит аккаунт по номеру из запроса (аккаунты из ACCOUNTS хранятся как int,
+    из accounts.txt и AdsPower — как строки).
+
+    :return: Аккаунт в том виде, в котором он хранится.
+    """
+    for account in account_reconciler.known:
+        if str(account) == str(value):
+            return account
+    raise ControlError(f"Unknown account: {value}", status=404)
+
+
+def control_account(params):
+    """
+    Состояние одного аккаунта для сервера управления.
+    """
+    account = resolve_account(params["account"])
+    with balance_lock:
+        state = balance_dict.get(account)
+        record = state.to_record() if state is not None else None
+    timers = {timer.key: timer.epoch_deadline for timer in live_timers()}
+    queued = dict(task_queue.pending_accounts())
+    return {
+        "account": account,
+        "state": record,
+        "timer": timers.get(account),
+        "queued_due": queued.get(account),
+        "in_flight": account in in_flight_accounts(),
+        "failures": [failure for failure in failures_snapshot() if failure["account"] == account],
+    }
+
+
+def control_failures(params):
+    """
+    Последние сбои (не более RECENT_FAILURES_LIMIT).
+    """
+    return failures_snapshot()
+
+
+def failures_snapshot():
+    with failures_lock:
+        return list(recent_failures)
+
+
+def run_account_now(params):
+    """
+    Запускает аккаунт вне расписания: отменяет его таймер и ставит первым в очередь.
+    """
+    account = resolve_account(params["account"])
+    if account in in_flight_accounts():
+        raise ControlError(f"#{account}: Account is already being processed.", status=409)
+    for timer in take_timers({account}):
+        timer.cancel()
+    task_queue.prioritize(account)
+    forced_accounts.add(account)
+    if account not in dict(task_queue.pending_accounts()):
+        task_queue.put((account, balance_dict, active_timers))
+    logger.info(f"#{account}: Manual run requested.", extra={'color': Fore.CYAN})
+    return {"account": account, "queued": True}
+
+
+def pause_dispatch(params):
+    dispatch_paused.set()
+    logger.info("Dispatch paused by control request.", extra={'color': Fore.YELLOW})
+    return {"dispatch_paused": True}
+
+
+def resume_dispatch(params):
+    dispatch_paused.clear()
+    logger.info("Dispatch resumed by control request.", extra={'color': Fore.GREEN})
+    return {"dispatch_paused": False}
+
+
+def request_drain(params):
+    """
+    Плавная остановка: текущий аккаунт дорабатывает, очередь сохраняется
+    и будет восстановлена при следующем запуске.
+    """
+    drain_event.set()
+    return {"draining": True}
+
+
+def set_concurrency(params):
+    """
+    Изменение числа одновременно обрабатываемых аккаунтов (в пределах CONCURRENCY_MIN..CONCURRENCY_MAX,
+    дальше регулятор продолжает подстройку от этого значения).
+    """
+    try:
+        value = int(params.get("value"))
+    except (TypeError, ValueError):
+        raise ControlError("Parameter 'value' must be an integer.")
+    if not concurrency_controller.min_limit <= value <= concurrency_controller.max_limit:
+        raise ControlError(
+            f"Concurrency must be between {concurrency_controller.min_limit} and "
+            f"{concurrency_controller.max_limit} (CONCURRENCY_MIN/CONCURRENCY_MAX).", status=409)
+    return {"concurrency": concurrency_controller.set_limit(value)}
+
+
+def start_control_server(settings):
+    """
+    Запускает сервер состояния и управления, если задан CONTROL_SERVER_PORT.
+    """
+    port = settings.value("CONTROL_SERVER_PORT")
+    if not port:
+        return None
+    server = ControlServer(
+        views={
+            "status": control_status,
+            "accounts": control_accounts,
+            "account": control_account,
+            "failures": control_failures,
+        },
+        actions={
+            "run": run_account_now,
+            "pause": pause_dispatch,
+            "resume": resume_dispatch,
+            "drain": request_drain,
+            "concurrency": set_concurrency,
+        },
+        host=settings.value("CONTROL_SERVER_HOST"),
+        port=port,
+        token=settings.value("CONTROL_SERVER_TOKEN"),
+    )
+    return server if server.start(stop_event) else None
+
+
 def cleanup_resources(active_timers, task_queue):
-    global bot
     """
     Останавливает все активные таймеры, выполняет очистку ресурсов и очищает очередь.
     """
@@ -832,11 +1282,13 @@ def cleanup_resources(active_timers, task_queue):
     # Завершаем все таймеры
     try:
         # Создаём копию списка для безопасного перебора
-        for timer in list(active_timers):
+        with timers_lock:
+            timers = list(active_timers)
+            active_timers.clear()
+        for timer in timers:
             if timer.is_alive():
                 logger.debug("Cancelling active timer during cleanup.")
                 timer.cancel()
-        active_timers.clear()
         logger.debug("All active timers have been cleared.")
     except Exception as timer_error:
         logger.debug(
@@ -853,16 +1305,11 @@ def cleanup_resources(active_timers, task_queue):
         logger.debug(
             f"Exception during task queue cleanup: {queue_error}", exc_info=True)
 
-    # Закрываем браузер, если он существует
-    if bot:
-        try:
-            logger.info("Closing browser during cleanup...",
-                        extra={'color': Fore.CYAN})
-            bot.browser_manager.close_browser()
-        except Exception as browser_error:
-            logger.warning(f"Failed to close browser: {browser_error}")
-        finally:
-            bot = None  # Очищаем глобальный объект `bot` для предотвращения утечек
+    # Закрываем браузеры открытых сессий и дочерние процессы
+    close_active_sessions()
+    if session_pool is not None:
+        session_pool.shutdown()
+    display_pool.shutdown()
 
     logger.info("All resources cleaned up. Exiting gracefully.",
                 extra={'color': Fore.MAGENTA})
@@ -907,6 +1354,11 @@ if __name__ == "__main__":
 
         # Настройка логирования
         logger = setup_logger(debug_mode=args.debug, log_dir="./log")
+
+        # Проверка установленных зависимостей и однократные миграции файлов
+        check_requirements()
+        run_migrations()
+        start_session_pool(settings)
         # enable_quests = settings.get("ENABLE_QUESTS", "false").strip().lower() == "true"
 
         # if enable_quests:
@@ -932,73 +1384,35 @@ if __name__ == "__main__":
                 cleanup_resources(active_timers, task_queue)
                 sys.exit(0)  # Завершаем выполнение после обработки аккаунта
 
-        # Загрузка настроек и таймеров
-        timers_data = load_timers()
-        update_interval = int(settings.get(
-            "UPDATE_INTERVAL", DEFAULT_UPDATE_INTERVAL))
+        # Загрузка таймеров и очереди, сохранённой перед перезапуском
+        restored_queue.update(load_queue_state())
+        reset_balances()
+        sync_timers_with_balance(balance_dict)
+        generate_and_display_table(load_timers(), table_type="timers")
+
+        Thread(target=drain_for_restart, args=(settings,), daemon=True).start()
+        status_view.start(stop_event)
+        concurrency_controller.start(stop_event)
+        start_control_server(settings)
+        settings.start_watching(stop_event)
+        profile_inventory.start_background_refresh(stop_event)
         logger.debug("Performing initial update check...")
         check_and_update(priority_task_queue=task_queue,
                          is_task_active=lambda: not task_queue.empty())
-        schedule_periodic_update_check(task_queue, update_interval)
-        while not stop_event.is_set():
-            try:
-                reset_balances()
-                accounts = get_accounts()
-                sync_timers_with_balance(balance_dict)
-                generate_and_display_table(timers_data, table_type="timers")
-                logger.info("Starting account processing cycle.")
-
-                # Запуск обработчика очереди задач
-                task_processor_thread = Thread(
-                    target=task_queue_processor,
-                    args=(task_queue, active_timers),
-                    daemon=True
-                )
-                task_processor_thread.start()
+        schedule_periodic_update_check(task_queue)
 
-                # Обработка аккаунтов
-                for account in accounts:
-                    if stop_event.is_set():
-                        logger.info(
-                            "Stop event detected. Stopping account processing.")
-                        break
+        # Запуск обработчика очереди задач
+        task_processor_thread = Thread(
+            target=task_queue_processor,
+            args=(task_queue, active_timers),
+            daemon=True
+        )
+        task_processor_thread.start()
 
-                    try:
-                        # Проверяем таймеры и планируем выполнение
-                        if account in timers_data:
-                            timer_info = timers_data[account]
-                            next_schedule = datetime.strptime(
-                                timer_info["next_schedule"], "%Y-%m-%d %H:%M:%S"
-                            )
-                            if next_schedule > datetime.now():
-                                logger.debug(
-                                    f"#{account}: Account scheduled for {next_schedule}. Skipping immediate processing."
-                                )
-                                schedule_next_run(
-                                    account, next_schedule, balance_dict, active_timers)
-                                continue
-                        if stop_event.is_set():  # Дополнительная проверка перед добавлением в очередь
-                            break
-                        logger.debug(
-                            f"#{account}: Adding account to task queue for processing.")
-                        task_queue.put((account, balance_dict, active_timers))
-                    except Exception as e:
-                        logger.error(
-                            f"Error while scheduling account {account}: {e}")
-
-                # Ожидание завершения таймеров
-                while not stop_event.is_set() and any(timer.is_alive() for timer in active_timers):
-                    # Используем stop_event для быстрой проверки и выхода
-                    stop_event.wait(1)
-
-                # Повторное ожидание цикла
-                if not stop_event.is_set():
-                    logger.info("Restarting the cycle in 5 minutes...")
-                    # Заменяем time.sleep на stop_event.wait
-                    stop_event.wait(300)
-            except Exception as e:
-                logger.error(f"Unhandled exception in main loop: {e}")
-                logger.info("Continuing execution despite the error.")
+        # Сверка аккаунтов по событиям вместо полного цикла раз в 5 минут
+        start_cluster(settings)
+        logger.info("Starting account processing.")
+        account_reconciler.run()
     except KeyboardInterrupt:
         if not GlobalFlags.interrupted:
             logger.info("KeyboardInterrupt detected. Exiting...",
@@ -1020,7 +1434,13 @@ if __name__ == "__main__":
                 logger.error(
                     f"Error during task processor thread shutdown: {e}")
 
+        # Перед перезапуском или после drain сохраняем очередь, пока cleanup_resources её не очистил
+        if drain_event.is_set():
+            save_queue_state(task_queue)
+
         cleanup_resources(active_timers, task_queue)
+        if cluster is not None:
+            cluster.leave()
 
         # Завершение или перезапуск
         if getattr(stop_event, "restart_mode", False):
@@ -0,0 +1,94 @@
+import os
+import glob
+import json
+import shutil
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+TEMP_DIR = "temp"
+TIMERS_FILE = os.path.join(TEMP_DIR, "timers.json")
+ROOT_TIMERS_FILE = "timers.json"  # Расположение таймеров в старых версиях
+BACKUP_FILES_PATTERN = "*.backup"  # Резервные копии старого механизма обновления
+MARKER_FILE = os.path.join(TEMP_DIR, "migrations_version")
+
+
+def move_root_timers():
+    """Переносит timers.json из корня в temp."""
+    if os.path.exists(ROOT_TIMERS_FILE) and not os.path.exists(TIMERS_FILE):
+        shutil.move(ROOT_TIMERS_FILE, TIMERS_FILE)
+        logger.debug(f"Timers file copied from root to temp: {TIMERS_FILE}")
+
+
+def move_backup_files():
+    """Переносит файлы *.backup из корня в temp."""
+    for backup_file in glob.glob(BACKUP_FILES_PATTERN):
+        target_path = os.path.join(TEMP_DIR, os.path.basename(backup_file))
+        shutil.move(backup_file, target_path)
+        logger.debug(f"Backup file moved: {backup_file} -> {target_path}")
+
+
+def convert_timers_to_epoch():
+    """Переводит next_schedule в timers.json из строки в epoch."""
+    from time_base import to_epoch
+
+    if not os.path.exists(TIMERS_FILE):
+        return
+    with open(TIMERS_FILE, "r") as f:
+        timers = json.load(f)
+    for data in timers.values():
+        data["next_schedule"] = to_epoch(data.get("next_schedule"))
+    with open(TIMERS_FILE, "w") as f:
+        json.dump(timers, f, indent=4)
+
+
+# Миграции выполняются по порядку один раз, номер последней хранится в MARKER_FILE.
+# Новые миграции добавляются в конец списка.
+MIGRATIONS = [
+    (1, move_root_timers),
+    (2, move_backup_files),
+    (3, convert_timers_to_epoch),
+]
+
+
+def read_marker():
+    try:
+        with open(MARKER_FILE, "r") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def run_migrations():
+    """
+    Создаёт каталог temp и выполняет миграции файлов, которые ещё не применялись.
+    При актуальной версии стоит одного чтения файла.
+
+    :return: Список номеров выполненных миграций.
+    """
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    current = read_marker()
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            migration()
+        except Exception as e:
+            # Неудачная миграция повторится при следующем запуске
+            logger.error(f"Migration {version} ({migration.__name__}) failed: {e}")
+            break
+        applied.append(version)
+        with open(MARKER_FILE, "w") as f:
+            f.write(str(version))
+
+    # Проверка и создание файла TIMERS_FILE, если он отсутствует
+    if not os.path.exists(TIMERS_FILE):
+        with open(TIMERS_FILE, "w") as f:
+            json.dump({}, f)  # Создаём пустой JSON-файл
+        logger.debug(f"Timers file created: {TIMERS_FILE}")
+
+    if applied:
+        logger.debug(f"Migrations applied: {applied}")
+    return applied
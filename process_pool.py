@@ -0,0 +1,356 @@
+import os
+import time
+import signal
+import multiprocessing
+from threading import Condition
+import logging
+from retry_policy import AutomationError, classify_failure
+
+try:
+    import psutil  # Необязательная зависимость: учёт памяти и завершение дерева процессов
+except ImportError:
+    psutil = None
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+POLL_INTERVAL = 1  # Интервал проверки ответа и состояния дочернего процесса (сек)
+JOIN_TIMEOUT = 10  # Ожидание штатного завершения дочернего процесса (сек)
+
+
+class WorkerSessionError(AutomationError):
+    """
+    Сбой сессии в дочернем процессе. Класс сбоя передаётся из дочернего процесса
+    или определяется по причине (процесс упал, превышено время сессии).
+    """
+
+    def __init__(self, message, failure_class="unknown"):
+        super().__init__(message)
+        self.failure_class = failure_class
+
+
+class PipeLogHandler(logging.Handler):
+    """
+    Передаёт записи лога дочернего процесса в основной процесс, где они выводятся
+    обычными обработчиками (консоль, файл).
+    """
+
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+
+    def emit(self, record):
+        try:
+            self.conn.send(("log", record.levelno, record.getMessage(),
+                            getattr(record, "color", None)))
+        except Exception:
+            pass
+
+
+def worker_main(conn, target, log_level, visible_mode):
+    """
+    Цикл дочернего процесса: получает задания ("run", аккаунт, параметры), выполняет
+    target(аккаунт, параметры, emit) и отправляет события, результат или ошибку.
+    None вместо задания завершает процесс.
+    """
+    # Остановку по Ctrl+C выполняет основной процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from utils import visible
+    if visible_mode:
+        visible.set()
+
+    worker_logger = logging.getLogger("application_logger")
+    worker_logger.handlers = [PipeLogHandler(conn)]
+    worker_logger.setLevel(log_level)
+    worker_logger.propagate = False
+
+    def emit(kind, data):
+        conn.send(("event", kind, data))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+        _, account, options = message
+        try:
+            conn.send(("result", target(account, options, emit)))
+        except Exception as e:
+            conn.send(("error", {"type": type(e).__name__, "message": str(e),
+                                 "failure_class": classify_failure(e)}))
+
+
+def process_rss(pid):
+    """
+    Резидентная память процесса (байт) через psutil или /proc (Linux).
+
+    :return: Объём памяти или None, если определить не удалось.
+    """
+    try:
+        if psutil is not None:
+            return psutil.Process(pid).memory_info().rss
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def rss_megabytes(worker):
+    rss = process_rss(worker.pid) if worker.is_alive() else worker.rss
+    return round(rss / 1024 / 1024, 1) if rss else None
+
+
+class SessionWorker:
+    """
+    Дочерний процесс, выполняющий сессии аккаунтов по одной.
+    """
+
+    def __init__(self, context, target, log_level, visible_mode):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main, args=(child_conn, target, log_level, visible_mode),
+            daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.sessions = 0
+        self.rss = None
+        self.account = None  # Аккаунт текущей сессии
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def run(self, account, options, on_event, stop_event, timeout):
+        """
+        Выполняет сессию аккаунта в дочернем процессе.
+
+        :param on_event: Функция on_event(вид, данные) для событий сессии.
+        :param timeout: Максимальная длительность сессии (сек).
+        :return: Результат target (словарь).
+        """
+        self.account = account
+        self.sessions += 1
+        self.conn.send(("run", account, options))
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                if stop_event.is_set():
+                    self.kill()
+                    raise WorkerSessionError(
+                        f"#{account}: Session interrupted by stop event")
+                if time.monotonic() > deadline:
+                    self.kill()
+                    raise WorkerSessionError(
+                        f"#{account}: Session exceeded {timeout} seconds, worker killed", "timeout")
+                try:
+                    if not self.conn.poll(POLL_INTERVAL):
+                        if not self.is_alive():
+                            raise EOFError
+                        continue
+                    message = self.conn.recv()
+                except (EOFError, OSError):
+                    self.process.join(JOIN_TIMEOUT)
+                    raise WorkerSessionError(
+                        f"#{account}: Worker process exited unexpectedly "
+                        f"(exit code {self.process.exitcode})")
+
+                kind = message[0]
+                if kind == "log":
+                    _, level, text, color = message
+                    logger.log(level, text, extra={'color': color})
+                elif kind == "event":
+                    on_event(message[1], message[2])
+                elif kind == "result":
+                    return message[1]
+                elif kind == "error":
+                    error = message[1]
+                    raise WorkerSessionError(error["message"], error["failure_class"])
+        finally:
+            self.account = None
+            self.rss = process_rss(self.pid)
+
+    def stop(self):
+        """
+        Штатно завершает процесс (после текущей сессии), при зависании — принудительно.
+        """
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(JOIN_TIMEOUT)
+        if self.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        """
+        Принудительно завершает процесс вместе с дочерними (chromedriver), если доступен psutil.
+        """
+        children = []
+        if psutil is not None:
+            try:
+                children = psutil.Process(self.pid).children(recursive=True)
+            except psutil.Error:
+                pass
+        self.process.terminate()
+        self.process.join(JOIN_TIMEOUT)
+        if self.is_alive():
+            self.process.kill()
+            self.process.join(JOIN_TIMEOUT)
+        for child in children:
+            try:
+                child.kill()
+            except psutil.Error:
+                pass
+
+
+class ProcessPool:
+    """
+    Пул дочерних процессов для сессий аккаунтов.
+
+    Сессия выполняется в отдельном процессе, результат возвращается через Pipe, записи
+    лога и события сессии передаются в основной процесс. Процесс пересоздаётся после
+    max_sessions сессий, при падении и при превышении времени сессии, поэтому утечки
+    Selenium/chromedriver не накапливаются, а сбой затрагивает только один аккаунт.
+    """
+
+    def __init__(self, target, size=1, max_sessions=20, session_timeout=30 * 60,
+                 on_abandon=None, visible_mode=False):
+        """
+        :param target: Функция сессии target(аккаунт, параметры, emit) -> словарь.
+                       Должна быть функцией уровня модуля (передаётся в процесс по имени).
+        :param size: Максимальное число процессов.
+        :param max_sessions: После скольких сессий процесс пересоздаётся.
+        :param session_timeout: Максимальная длительность сессии (сек).
+        :param on_abandon: Функция on_abandon(аккаунт), вызываемая после принудительного
+                           завершения процесса посреди сессии (например, закрыть профиль).
+        :param visible_mode: Запускать браузер в видимом режиме.
+        """
+        # spawn — одинаковое поведение на Windows и Linux, без копирования потоков родителя
+        self.context = multiprocessing.get_context("spawn")
+        self.target = target
+        self.size = size
+        self.max_sessions = max_sessions
+        self.session_timeout = session_timeout
+        self.on_abandon = on_abandon
+        self.visible_mode = visible_mode
+        self.condition = Condition()
+        self.idle = []
+        self.workers = set()
+        self.recycled = 0
+        self.closed = False
+
+    def apply_settings(self, settings):
+        """
+        Применяет WORKER_MAX_SESSIONS и WORKER_SESSION_TIMEOUT (при перечитывании настроек).
+        """
+        with self.condition:
+            self.max_sessions = settings.value("WORKER_MAX_SESSIONS")
+            self.session_timeout = settings.value("WORKER_SESSION_TIMEOUT")
+
+    def resize(self, size):
+        """
+        Меняет максимальное число процессов (лишние завершаются после текущих сессий).
+        """
+        with self.condition:
+            self.size = max(1, size)
+            surplus = []
+            while self.idle and len(self.workers) > self.size:
+                worker = self.idle.pop()
+                self.workers.discard(worker)
+                surplus.append(worker)
+            self.condition.notify_all()
+        for worker in surplus:
+            worker.stop()
+
+    def _acquire(self, stop_event):
+        while True:
+            with self.condition:
+                if self.closed:
+                    raise WorkerSessionError("Worker pool is shut down")
+                if self.idle:
+                    return self.idle.pop()
+                if len(self.workers) < self.size:
+                    worker = SessionWorker(
+                        self.context, self.target, logger.getEffectiveLevel(), self.visible_mode)
+                    self.workers.add(worker)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Started worker process {worker.pid}.")
+                    return worker
+                if stop_event.is_set():
+                    raise WorkerSessionError("Interrupted by stop event")
+                self.condition.wait(POLL_INTERVAL)
+
+    def _release(self, worker):
+        retire = (not worker.is_alive() or worker.sessions >= self.max_sessions
+                  or self.closed or len(self.workers) > self.size)
+        with self.condition:
+            if retire:
+                self.workers.discard(worker)
+                self.recycled += 1
+            else:
+                self.idle.append(worker)
+            self.condition.notify()
+        if retire:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"Recycling worker process {worker.pid} after {worker.sessions} sessions.")
+            worker.stop()
+
+    def run(self, account, options, on_event, stop_event):
+        """
+        Выполняет сессию аккаунта в свободном процессе пула (ждёт освобождения процесса).
+
+        :return: Результат target (словарь).
+        :raises WorkerSessionError: при сбое сессии или процесса.
+        """
+        worker = self._acquire(stop_event)
+        try:
+            return worker.run(account, options, on_event, stop_event, self.session_timeout)
+        finally:
+            if not worker.is_alive() and self.on_abandon:
+                try:
+                    self.on_abandon(account)
+                except Exception as e:
+                    logger.debug(f"#{account}: Cleanup after worker exit failed: {e}")
+            if worker.rss is not None and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"#{account}: Worker {worker.pid} RSS: {worker.rss / 1024 / 1024:.0f} MB.")
+            self._release(worker)
+
+    def stats(self):
+        """
+        Состояние пула для сервера управления.
+        """
+        with self.condition:
+            workers = list(self.workers)
+            size, recycled = self.size, self.recycled
+        return {
+            "size": size,
+            "recycled": recycled,
+            "workers": [{"pid": worker.pid, "account": worker.account,
+                         "sessions": worker.sessions,
+                         "rss_mb": rss_megabytes(worker)}
+                        for worker in workers],
+        }
+
+    def shutdown(self):
+        """
+        Завершает все процессы пула.
+        """
+        with self.condition:
+            self.closed = True
+            workers = list(self.workers)
+            self.workers.clear()
+            self.idle.clear()
+            self.condition.notify_all()
+        for worker in workers:
+            if worker.account is not None:
+                worker.kill()
+            else:
+                worker.stop()
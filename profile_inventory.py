@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import requests
+from threading import Lock, Thread
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+PROFILE_LIST_URL = "http://localhost:50325/api/v1/user/list"
+INVENTORY_FILE = os.path.join("temp", "profile_inventory.json")
+PAGE_SIZE = 100  # Максимальный размер страницы API AdsPower
+PAGE_DELAY = 1  # Пауза между страницами (ограничение частоты запросов API, сек)
+INCREMENTAL_INTERVAL = 5 * 60  # Интервал поиска новых профилей (сек)
+FULL_REFRESH_INTERVAL = 6 * 60 * 60  # Интервал полного обновления (удалённые и изменённые профили, сек)
+
+
+def profile_record(profile):
+    """
+    Сокращённая запись профиля из ответа /api/v1/user/list.
+    """
+    proxy = profile.get("user_proxy_config") or {}
+    tags = []
+    for tag in profile.get("tags") or []:
+        name = tag.get("name") if isinstance(tag, dict) else tag
+        if name:
+            tags.append(str(name))
+    return {
+        "serial_number": str(profile.get("serial_number")),
+        "user_id": profile.get("user_id"),
+        "name": profile.get("name", ""),
+        "group_id": str(profile.get("group_id", "")),
+        "group_name": profile.get("group_name", ""),
+        "tags": tags,
+        "proxy": {
+            "type": proxy.get("proxy_type", ""),
+            "host": proxy.get("proxy_host", ""),
+            "port": proxy.get("proxy_port", ""),
+        } if proxy else {},
+        "ip": profile.get("ip", ""),
+        "created_time": profile.get("created_time"),
+        "last_open_time": profile.get("last_open_time"),
+    }
+
+
+class ProfileInventory:
+    """
+    Кэш профилей AdsPower (номер, группа, теги, прокси) в temp/profile_inventory.json.
+
+    При запуске используется сохранённый кэш. Фоновый поток раз в INCREMENTAL_INTERVAL
+    запрашивает профили от новых к старым и останавливается на первой странице без новых
+    номеров, раз в FULL_REFRESH_INTERVAL перечитывает весь список (удалённые и изменённые
+    профили). Фильтрация по группе и тегам выполняется по кэшу без запросов к API.
+    """
+
+    def __init__(self, inventory_file=INVENTORY_FILE):
+        self.inventory_file = inventory_file
+        self.lock = Lock()
+        self.refresh_lock = Lock()
+        self.profiles = {}
+        self.last_full_refresh = 0
+        self.thread = None
+        self.stop_event = None
+        self.on_change = None  # Вызывается при появлении или удалении профилей
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.inventory_file):
+            return
+        try:
+            with open(self.inventory_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.profiles = {profile["serial_number"]: profile
+                             for profile in data.get("profiles", [])}
+            self.last_full_refresh = data.get("last_full_refresh", 0)
+            logger.debug(
+                f"Profile inventory loaded: {len(self.profiles)} profiles.")
+        except Exception as e:
+            logger.debug(f"Failed to load profile inventory: {e}")
+
+    def _save(self):
+        try:
+            directory = os.path.dirname(self.inventory_file)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with self.lock:
+                data = {
+                    "last_full_refresh": self.last_full_refresh,
+                    "profiles": list(self.profiles.values()),
+                }
+            tmp_path = f"{self.inventory_file}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.inventory_file)
+        except Exception as e:
+            logger.debug(f"Failed to save profile inventory: {e}")
+
+    def _wait(self, seconds):
+        """
+        Пауза, прерываемая stop_event. :return: True, если нужно остановиться.
+        """
+        if self.stop_event is not None:
+            return self.stop_event.wait(seconds)
+        time.sleep(seconds)
+        return False
+
+    def _fetch_pages(self, stop_on_known=False):
+        """
+        Постранично запрашивает профили, новые (с большим номером) первыми.
+
+        :param stop_on_known: Остановиться на первой странице, где все профили уже известны.
+        :return: Список записей или None при ошибке API.
+        """
+        page = 1
+        records = []
+        known = set(self.profiles)
+        while True:
+            params = {"page": page, "page_size": PAGE_SIZE,
+                      "user_sort": json.dumps({"serial_number": "desc"})}
+            try:
+                response = requests.get(
+                    PROFILE_LIST_URL, params=params, timeout=10)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                logger.debug(f"An error occurred while accessing the API: {e}")
+                return None
+            if data.get("code") != 0:
+                logger.debug(f"API error: {data.get('msg')}")
+                return None
+
+            current = [profile_record(profile)
+                       for profile in data["data"]["list"]]
+            records.extend(current)
+            if len(current) < PAGE_SIZE:
+                break
+            if stop_on_known and all(record["serial_number"] in known for record in current):
+                break
+            page += 1
+            if self._wait(PAGE_DELAY):
+                return None
+        return records
+
+    def refresh_full(self):
+        """
+        Перечитывает весь список профилей: добавляет новые, обновляет изменённые
+        и удаляет отсутствующие.
+
+        :return: True, если список получен.
+        """
+        with self.refresh_lock:
+            records = self._fetch_pages()
+            if records is None:
+                return False
+            with self.lock:
+                removed = len(set(self.profiles) - {record["serial_number"] for record in records})
+                self.profiles = {record["serial_number"]: record for record in records}
+                self.last_full_refresh = time.time()
+            self._save()
+            logger.debug(
+                f"Profile inventory refreshed: {len(records)} profiles, {removed} removed.")
+            self._notify_change()
+            return True
+
+    def refresh_incremental(self):
+        """
+        Добавляет профили, созданные после последнего обновления.
+
+        :return: Количество новых профилей или None при ошибке API.
+        """
+        with self.refresh_lock:
+            records = self._fetch_pages(stop_on_known=True)
+            if records is None:
+                return None
+            with self.lock:
+                added = [record for record in records
+                         if record["serial_number"] not in self.profiles]
+                for record in records:
+                    self.profiles[record["serial_number"]] = record
+            if added:
+                self._save()
+                logger.info(f"Profile inventory: {len(added)} new profiles found.")
+                self._notify_change()
+            return len(added)
+
+    def _notify_change(self):
+        if self.on_change:
+            try:
+                self.on_change()
+            except Exception as e:
+                logger.debug(f"Profile inventory change handler failed: {e}")
+
+    def ensure_loaded(self):
+        """
+        При пустом кэше (первый запуск) выполняет полное обновление синхронно.
+        """
+        if not self.profiles:
+            self.refresh_full()
+
+    def start_background_refresh(self, stop_event):
+        """
+        Запускает фоновое обновление кэша.
+        """
+        self.stop_event = stop_event
+
+        def refresh_loop():
+            while not stop_event.wait(INCREMENTAL_INTERVAL):
+                try:
+                    if time.time() - self.last_full_refresh >= FULL_REFRESH_INTERVAL:
+                        self.refresh_full()
+                    else:
+                        self.refresh_incremental()
+                except Exception as e:
+                    logger.debug(f"Profile inventory refresh failed: {e}")
+
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = Thread(target=refresh_loop, daemon=True)
+            self.thread.start()
+
+    def all_profiles(self):
+        with self.lock:
+            return list(self.profiles.values())
+
+    def serial_numbers(self, group=None, tags=None):
+        """
+        Номера профилей с фильтрацией по группе и тегам.
+
+        :param group: Название или ID группы AdsPower (None — все группы).
+        :param tags: Список тегов, профиль должен иметь хотя бы один из них (None — без фильтра).
+        :return: Список номеров профилей по возрастанию.
+        """
+        wanted_tags = {tag.lower() for tag in tags or []}
+        result = []
+        with self.lock:
+            for record in self.profiles.values():
+                if group and group not in (record["group_name"], record["group_id"]):
+                    continue
+                if wanted_tags and not wanted_tags & {tag.lower() for tag in record["tags"]}:
+                    continue
+                result.append(record["serial_number"])
+        return sorted(result, key=lambda serial: (len(serial), serial))
+
+
+# Общий экземпляр для всех модулей
+profile_inventory = ProfileInventory()
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+from threading import Lock
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+QUEST_CACHE_FILE = os.path.join("temp", "quest_cache.json")
+# Прежний файл с аккаунтами, у которых выполнены все квесты (или квесты отключены вручную)
+LEGACY_COMPLETE_FILE = "all_quest_complete.txt"
+ALL_QUESTS = "*"  # Отметка «все квесты аккаунта выполнены или не нужны»
+
+
+class QuestCache:
+    """
+    Индекс выполненных квестов по аккаунтам: {аккаунт: {id квеста: {title, completed_at}}}.
+    Id квеста строится по его названию, а не по позиции в списке: при добавлении или
+    перестановке квестов в приложении отметки не переходят на другие квесты.
+
+    Загружается в память как множества id, поэтому обработчик квестов открывает только
+    невыполненные квесты и не проверяет каждый раз все квесты на странице.
+    Аккаунты из all_quest_complete.txt считаются полностью выполненными.
+    Файл перечитывается перед записью, чтобы не терять отметки дочерних процессов.
+    """
+
+    def __init__(self, cache_file=QUEST_CACHE_FILE, legacy_file=LEGACY_COMPLETE_FILE):
+        """
+        :param cache_file: Путь к файлу индекса; None — хранить только в памяти.
+        :param legacy_file: Файл all_quest_complete.txt (только чтение).
+        """
+        self.cache_file = cache_file
+        self.legacy_file = legacy_file
+        self.lock = Lock()
+        self.data = self._load()
+        self.completed = {account: set(quests) for account, quests in self.data.items()}
+        self.legacy = self._load_legacy()
+
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.debug(f"Failed to load quest cache '{self.cache_file}': {e}")
+            return {}
+
+    def _load_legacy(self):
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return set()
+        try:
+            with open(self.legacy_file, "r", encoding="utf-8") as f:
+                return {line.strip() for line in f if line.strip()}
+        except Exception as e:
+            logger.debug(f"Failed to read '{self.legacy_file}': {e}")
+            return set()
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        try:
+            directory = os.path.dirname(self.cache_file)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            # Отметки других процессов, сделанные после загрузки
+            for account, quests in self._load().items():
+                for quest_id, record in quests.items():
+                    self.data.setdefault(account, {}).setdefault(quest_id, record)
+                    self.completed.setdefault(account, set()).add(quest_id)
+            temp_file = f"{self.cache_file}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=4)
+            os.replace(temp_file, self.cache_file)
+        except Exception as e:
+            logger.debug(f"Failed to save quest cache '{self.cache_file}': {e}")
+
+    def is_completed(self, account, quest_id):
+        """
+        Проверяет, выполнен ли квест аккаунта.
+        """
+        account = str(account)
+        with self.lock:
+            completed = self.completed.get(account, ())
+            return quest_id in completed or ALL_QUESTS in completed or account in self.legacy
+
+    def is_account_completed(self, account):
+        """
+        Проверяет, выполнены ли все квесты аккаунта (или квесты отключены в all_quest_complete.txt).
+        """
+        return self.is_completed(account, ALL_QUESTS)
+
+    def mark_completed(self, account, quest_id, title=None):
+        """
+        Отмечает квест аккаунта выполненным.
+
+        :param quest_id: Id квеста (ALL_QUESTS — все квесты аккаунта).
+        :param title: Название квеста.
+        """
+        account = str(account)
+        with self.lock:
+            if quest_id in self.completed.get(account, ()):
+                return
+            self.data.setdefault(account, {})[quest_id] = {
+                "title": title, "completed_at": int(time.time())}
+            self.completed.setdefault(account, set()).add(quest_id)
+            self._save()
+        logger.debug(f"#{account}: Quest '{title or quest_id}' marked as completed.")
+
+
+# Общий индекс выполненных квестов
+quest_cache = QuestCache()
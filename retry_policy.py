@@ -0,0 +1,145 @@
+import random
+from threading import Lock
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+
+# ========================= Классы ошибок ==========================
+
+class AutomationError(Exception):
+    """
+    Базовая ошибка обработки аккаунта с указанием класса сбоя.
+    """
+    failure_class = "unknown"
+
+
+class AdsPowerUnavailableError(AutomationError):
+    """Локальный API AdsPower недоступен."""
+    failure_class = "api_unreachable"
+
+
+class BrowserLaunchError(AutomationError):
+    """AdsPower ответил, но браузер профиля не запустился."""
+    failure_class = "launch_failure"
+
+
+class NavigationError(AutomationError):
+    """Не удалось открыть web.telegram.org или мини-приложение."""
+    failure_class = "navigation"
+
+
+class SelectorMissingError(AutomationError):
+    """Нужный элемент интерфейса не найден на странице."""
+    failure_class = "selector_missing"
+
+
+class InvalidBalanceError(AutomationError):
+    """Баланс не прочитан или некорректен."""
+    failure_class = "invalid_balance"
+
+
+class ResourceLimitError(AutomationError):
+    """Браузер профиля превысил лимит памяти или CPU и был закрыт (browser_watchdog)."""
+    failure_class = "resource_limit"
+
+
+def classify_failure(error):
+    """
+    Определяет класс сбоя по исключению.
+
+    :param error: Исключение, возникшее при обработке аккаунта.
+    :return: Строка с классом сбоя.
+    """
+    if isinstance(error, AutomationError):
+        return error.failure_class
+    # selenium.common.exceptions.TimeoutException (selenium здесь не импортируется)
+    if isinstance(error, TimeoutError) or type(error).__name__ == "TimeoutException":
+        return "timeout"
+    return "unknown"
+
+
+# ========================= Политика повторов ==========================
+
+# Параметры экспоненциальной задержки по классам сбоев (в секундах):
+# base — первая задержка, factor — множитель, max — верхняя граница.
+BACKOFF_SETTINGS = {
+    # AdsPower недоступен: проверяем часто, но не чаще раза в минуту
+    "api_unreachable": {"base": 60, "factor": 2, "max": 30 * 60},
+    # Профиль не запустился: чаще всего занят или завис
+    "launch_failure": {"base": 120, "factor": 2, "max": 60 * 60},
+    # Telegram не открылся: проблемы с прокси или сетью
+    "navigation": {"base": 300, "factor": 2, "max": 2 * 60 * 60},
+    # Элемент не найден: единичный сбой быстро проходит, смена интерфейса — нет
+    "selector_missing": {"base": 60, "factor": 3, "max": 4 * 60 * 60},
+    "invalid_balance": {"base": 120, "factor": 2, "max": 60 * 60},
+    # Таймаут: чаще всего компьютер перегружен одновременными сессиями
+    "timeout": {"base": 300, "factor": 2, "max": 60 * 60},
+    # Браузер закрыт сторожем ресурсов: повтор в новом браузере
+    "resource_limit": {"base": 120, "factor": 2, "max": 60 * 60},
+    # Неизвестная ошибка: как раньше, около 30–70 минут
+    "unknown": {"base": 1800, "factor": 2, "max": 4200},
+}
+DEFAULT_JITTER = 0.2  # Разброс задержки ±20%
+
+
+class RetryPolicy:
+    """
+    Экспоненциальная задержка повторов с учётом класса сбоя и случайным разбросом.
+    Счётчик попыток ведётся отдельно для каждого аккаунта и класса сбоя
+    и сбрасывается после успешного запуска.
+    """
+
+    def __init__(self, backoff_settings=None, jitter=DEFAULT_JITTER, rng=None):
+        self.backoff_settings = backoff_settings or BACKOFF_SETTINGS
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.attempts = {}
+        self.lock = Lock()
+
+    def next_delay(self, account, failure_class):
+        """
+        Регистрирует неудачную попытку и возвращает задержку до следующей.
+
+        :param account: Аккаунт.
+        :param failure_class: Класс сбоя (см. classify_failure).
+        :return: Задержка в секундах.
+        """
+        params = self.backoff_settings.get(
+            failure_class, self.backoff_settings["unknown"])
+        with self.lock:
+            key = (account, failure_class)
+            attempt = self.attempts.get(key, 0) + 1
+            self.attempts[key] = attempt
+
+        delay = min(params["max"], params["base"] * params["factor"] ** (attempt - 1))
+        delay *= self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        logger.debug(
+            f"#{account}: Retry delay for '{failure_class}' (attempt {attempt}): {delay:.0f} seconds.")
+        return int(delay)
+
+    def attempt_count(self, account, failure_class):
+        with self.lock:
+            return self.attempts.get((account, failure_class), 0)
+
+    def export_state(self):
+        """
+        Возвращает счётчики попыток для сохранения между перезапусками.
+        """
+        with self.lock:
+            return [[account, failure_class, attempt]
+                    for (account, failure_class), attempt in self.attempts.items()]
+
+    def restore_state(self, state):
+        with self.lock:
+            for account, failure_class, attempt in state:
+                self.attempts[(account, failure_class)] = attempt
+
+    def record_success(self, account):
+        """
+        Сбрасывает счётчики попыток аккаунта после успешного запуска.
+        """
+        with self.lock:
+            for key in [key for key in self.attempts if key[0] == account]:
+                del self.attempts[key]
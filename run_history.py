@@ -0,0 +1,346 @@
+"""
+История запусков аккаунтов (только добавление) в temp/run_history.sqlite3.
+
+Отчёт по истории:
+    python run_history.py --days 7
+    python run_history.py --account 12 --top 20
+"""
+import os
+import json
+import math
+import time
+import statistics
+import sqlite3
+import argparse
+from threading import Lock
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+HISTORY_FILE = os.path.join("temp", "run_history.sqlite3")
+
+SUCCESS = "success"
+FAILURE = "failure"
+INTERRUPTED = "interrupted"
+# Этапы от запуска браузера до открытого мини-приложения
+READY_PHASES = ("launch", "navigate", "send_message", "open_app")
+READY_SAMPLES = 10  # Сколько последних успешных запусков учитывать
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    failure_class TEXT,
+    failed_phase TEXT,
+    balance_before REAL,
+    balance_after REAL,
+    claimed REAL,
+    phases TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_account_started ON runs (account, started_at);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at);
+"""
+
+
+class RunRecord:
+    """
+    Замер одного запуска аккаунта: время начала, длительности этапов и результат.
+    Этап длится от вызова phase() до следующего вызова phase() или finish().
+    """
+
+    def __init__(self, history, account, balance_before=None):
+        self.history = history
+        self.account = account
+        self.balance_before = balance_before
+        self.started_at = time.time()
+        self.phases = {}
+        self.current_phase = None
+        self.phase_started = None
+        self.finished = False
+
+    def phase(self, name):
+        """
+        Начинает этап name (предыдущий этап завершается).
+        """
+        self._close_phase()
+        self.current_phase = name
+        self.phase_started = time.perf_counter()
+
+    def _close_phase(self):
+        if self.current_phase is not None:
+            elapsed = time.perf_counter() - self.phase_started
+            self.phases[self.current_phase] = round(
+                self.phases.get(self.current_phase, 0.0) + elapsed, 3)
+
+    def finish(self, outcome, balance_after=None, failure_class=None):
+        """
+        Завершает запуск и добавляет запись в историю (повторный вызов игнорируется).
+
+        :param outcome: SUCCESS, FAILURE или INTERRUPTED.
+        :param balance_after: Баланс после запуска.
+        :param failure_class: Класс сбоя (retry_policy.classify_failure).
+        """
+        if self.finished:
+            return
+        self.finished = True
+        self._close_phase()
+        claimed = None
+        if balance_after is not None and self.balance_before is not None:
+            claimed = max(0.0, balance_after - self.balance_before)
+        self.history.append({
+            "account": str(self.account),
+            "started_at": self.started_at,
+            "finished_at": time.time(),
+            "outcome": outcome,
+            "failure_class": failure_class,
+            "failed_phase": self.current_phase if outcome != SUCCESS else None,
+            "balance_before": self.balance_before,
+            "balance_after": balance_after,
+            "claimed": claimed,
+            "phases": self.phases,
+        })
+
+
+class RunHistory:
+    """
+    Хранилище истории запусков в SQLite с индексами по аккаунту и времени.
+    Ошибки записи не прерывают обработку аккаунта.
+    """
+
+    def __init__(self, history_file=HISTORY_FILE):
+        self.history_file = history_file
+        self.lock = Lock()
+        self.connection = None
+
+    def _connect(self):
+        if self.connection is None:
+            directory = os.path.dirname(self.history_file)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self.connection = sqlite3.connect(
+                self.history_file, check_same_thread=False)
+            self.connection.executescript(SCHEMA)
+        return self.connection
+
+    def start_run(self, account, balance_before=None):
+        """
+        :return: RunRecord нового запуска.
+        """
+        return RunRecord(self, account, balance_before)
+
+    def append(self, run):
+        """
+        Добавляет запись о запуске.
+
+        :param run: Словарь с полями таблицы runs (phases — словарь {этап: секунды}).
+        """
+        try:
+            with self.lock:
+                connection = self._connect()
+                with connection:
+                    connection.execute(
+                        "INSERT INTO runs (account, started_at, finished_at, duration, outcome, "
+                        "failure_class, failed_phase, balance_before, balance_after, claimed, phases) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (run["account"], run["started_at"], run["finished_at"],
+                         max(0.0, run["finished_at"] - run["started_at"]), run["outcome"],
+                         run["failure_class"], run["failed_phase"], run["balance_before"],
+                         run["balance_after"], run["claimed"], json.dumps(run["phases"])))
+        except Exception as e:
+            logger.debug(f"Failed to save run history: {e}")
+
+    def ready_duration(self, account, limit=READY_SAMPLES):
+        """
+        Медианная длительность от запуска браузера до открытого мини-приложения
+        по последним успешным запускам аккаунта.
+
+        :return: Длительность (сек) или None, если истории нет.
+        """
+        try:
+            with self.lock:
+                rows = self._connect().execute(
+                    "SELECT phases FROM runs WHERE account = ? AND outcome = ? "
+                    "ORDER BY started_at DESC LIMIT ?",
+                    (str(account), SUCCESS, limit)).fetchall()
+        except Exception as e:
+            logger.debug(f"Failed to read run history: {e}")
+            return None
+        durations = []
+        for (phases,) in rows:
+            phases = json.loads(phases or "{}")
+            if all(phase in phases for phase in READY_PHASES):
+                durations.append(sum(phases[phase] for phase in READY_PHASES))
+        return statistics.median(durations) if durations else None
+
+    def runs(self, since=None, account=None):
+        """
+        Записи истории по возрастанию времени начала.
+
+        :param since: Только запуски, начатые после этого момента (epoch).
+        :param account: Только указанный аккаунт.
+        :return: Список словарей.
+        """
+        query = "SELECT * FROM runs WHERE started_at >= ?"
+        params = [since or 0]
+        if account is not None:
+            query += " AND account = ?"
+            params.append(str(account))
+        query += " ORDER BY started_at"
+        with self.lock:
+            connection = self._connect()
+            cursor = connection.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            row["phases"] = json.loads(row["phases"] or "{}")
+        return rows
+
+
+def percentile(values, fraction):
+    """
+    Перцентиль по ближайшему рангу.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(runs):
+    """
+    Сводка по запускам одного или всех аккаунтов.
+
+    :return: Словарь: запуски, сбои, доля сбоев, p50/p95 длительности успешных запусков,
+             получено HOT, HOT в час.
+    """
+    durations = [run["duration"] for run in runs if run["outcome"] == SUCCESS]
+    failures = sum(1 for run in runs if run["outcome"] == FAILURE)
+    claimed = sum(run["claimed"] or 0.0 for run in runs)
+    span_hours = (runs[-1]["finished_at"] - runs[0]["started_at"]) / 3600 if runs else 0
+    return {
+        "runs": len(runs),
+        "failures": failures,
+        "failure_rate": failures / len(runs) if runs else 0.0,
+        "p50": percentile(durations, 0.5),
+        "p95": percentile(durations, 0.95),
+        "claimed": claimed,
+        "hot_per_hour": claimed / span_hours if span_hours > 0 else 0.0,
+    }
+
+
+def build_report(runs, top=10):
+    """
+    Отчёт по истории: общий итог, аккаунты, сбои по этапам и самые медленные аккаунты.
+    """
+    by_account = {}
+    for run in runs:
+        by_account.setdefault(run["account"], []).append(run)
+    accounts = {account: summarize(account_runs)
+                for account, account_runs in by_account.items()}
+
+    phase_failures = {}
+    phase_durations = {}
+    for run in runs:
+        if run["outcome"] == FAILURE:
+            key = (run["failed_phase"] or "unknown", run["failure_class"] or "unknown")
+            phase_failures[key] = phase_failures.get(key, 0) + 1
+        for phase, seconds in run["phases"].items():
+            phase_durations.setdefault(phase, []).append(seconds)
+
+    slowest = sorted((item for item in accounts.items() if item[1]["p50"] is not None),
+                     key=lambda item: item[1]["p50"], reverse=True)[:top]
+    return {
+        "total": summarize(runs),
+        "accounts": accounts,
+        "phase_failures": phase_failures,
+        "phase_p50": {phase: percentile(values, 0.5) for phase, values in phase_durations.items()},
+        "slowest": slowest,
+    }
+
+
+def format_number(value, digits=1):
+    return "N/A" if value is None else f"{value:.{digits}f}"
+
+
+def print_report(report):
+    from prettytable import PrettyTable
+
+    total = report["total"]
+    print(f"Runs: {total['runs']}, failures: {total['failures']} "
+          f"({total['failure_rate']:.1%}), session p50 {format_number(total['p50'])} s, "
+          f"p95 {format_number(total['p95'])} s, earned {format_number(total['claimed'], 2)} HOT "
+          f"({format_number(total['hot_per_hour'], 3)} HOT/h)")
+
+    table = PrettyTable()
+    table.field_names = ["Account", "Runs", "Failures", "Failure rate",
+                         "p50, s", "p95, s", "HOT/h"]
+    for account, stats in sorted(report["accounts"].items(),
+                                 key=lambda item: (len(item[0]), item[0])):
+        table.add_row([account, stats["runs"], stats["failures"], f"{stats['failure_rate']:.1%}",
+                       format_number(stats["p50"]), format_number(stats["p95"]),
+                       format_number(stats["hot_per_hour"], 3)])
+    print("\nAccounts:\n" + str(table))
+
+    table = PrettyTable()
+    table.field_names = ["Phase", "Failure class", "Failures"]
+    for (phase, failure_class), count in sorted(report["phase_failures"].items(),
+                                                key=lambda item: item[1], reverse=True):
+        table.add_row([phase, failure_class, count])
+    print("\nFailures by phase:\n" + str(table))
+
+    table = PrettyTable()
+    table.field_names = ["Phase", "p50, s"]
+    for phase, value in report["phase_p50"].items():
+        table.add_row([phase, format_number(value)])
+    print("\nPhase durations:\n" + str(table))
+
+    table = PrettyTable()
+    table.field_names = ["Account", "p50, s", "p95, s", "Runs"]
+    for account, stats in report["slowest"]:
+        table.add_row([account, format_number(stats["p50"]),
+                       format_number(stats["p95"]), stats["runs"]])
+    print("\nSlowest accounts:\n" + str(table))
+
+
+# Общий экземпляр истории
+run_history = RunHistory()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report on account run history.")
+    parser.add_argument("--days", type=float, default=7,
+                        help="Only runs from the last N days (0 - all)")
+    parser.add_argument("--account",
+                        help="Only the specified account")
+    parser.add_argument("--top", type=int, default=10,
+                        help="Number of slowest accounts to show")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(run_history.history_file):
+        print(f"Run history not found: {run_history.history_file}")
+        return
+    since = time.time() - args.days * 86400 if args.days else None
+    runs = run_history.runs(since=since, account=args.account)
+    if not runs:
+        print("No runs in the selected period.")
+        return
+    report = build_report(runs, top=args.top)
+    if args.json:
+        report["phase_failures"] = [
+            {"phase": phase, "failure_class": failure_class, "failures": count}
+            for (phase, failure_class), count in report["phase_failures"].items()]
+        print(json.dumps(report, indent=4))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
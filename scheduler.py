@@ -0,0 +1,265 @@
+import time
+import random
+import itertools
+from queue import Queue
+from datetime import datetime, timedelta
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_OVERDUE_WEIGHT = 1.0  # Вес просрочки (за каждый час после заполнения)
+DEFAULT_YIELD_WEIGHT = 1.0  # Вес потерянного фарма (за каждый недополученный HOT)
+DEFAULT_SCHEDULE_HOURS = 8  # Интервал запуска, если оставшееся время неизвестно и прогноза нет
+FILL_CHECK_TOLERANCE = 30 * 60  # Допустимое расхождение времени с экрана и прогноза (сек)
+
+
+# Расчет следующего выполнения
+def calculate_next_schedule(schedule_time, account=None, now=None, rng=random,
+                            predicted_fill=None):
+    """
+    Расчёт времени следующего выполнения.
+
+    Время с экрана точнее прогноза модели заполнения (fill_model) и используется всегда,
+    когда его удалось прочитать; расхождение больше FILL_CHECK_TOLERANCE только
+    записывается в лог (оценки модели при этом сбрасываются, см. FillModel.record_remaining).
+    Если время с экрана не найдено, используется прогноз, и только без прогноза —
+    DEFAULT_SCHEDULE_HOURS.
+
+    :param schedule_time: Время в формате "HH:MM:SS" или None.
+    :param account: Аккаунт (для логирования).
+    :param now: Текущее время (по умолчанию datetime.now(), задаётся в симуляторе).
+    :param rng: Генератор случайных чисел.
+    :param predicted_fill: Прогноз момента заполнения хранилища (epoch) или None.
+    :return: Объект datetime с рассчитанным временем.
+    """
+    now = now or datetime.now()
+    debug = logger.isEnabledFor(logging.DEBUG)
+    try:
+        predicted = datetime.fromtimestamp(predicted_fill) if predicted_fill else None
+        if schedule_time and ":" in schedule_time:
+            hours, minutes, seconds = map(int, schedule_time.split(":"))
+            scraped = now + timedelta(hours=hours, minutes=minutes, seconds=seconds)
+            if predicted and abs((scraped - predicted).total_seconds()) > FILL_CHECK_TOLERANCE:
+                logger.warning(
+                    f"#{account}: Remaining time on screen ({scraped.strftime('%Y-%m-%d %H:%M:%S')}) "
+                    f"differs from the fill prediction ({predicted.strftime('%Y-%m-%d %H:%M:%S')}). "
+                    f"Using the on-screen time.")
+            next_schedule = scraped + timedelta(minutes=rng.randint(5, 30))
+            if debug:
+                logger.debug(
+                    f"#{account}: Next schedule calculated from provided time '{schedule_time}': {next_schedule.strftime('%Y-%m-%d %H:%M:%S')}")
+            return next_schedule
+
+        if predicted:
+            # Оставшееся время не найдено: момент заполнения по модели
+            next_schedule = max(predicted, now) + timedelta(minutes=rng.randint(5, 30))
+            logger.info(
+                f"#{account}: Remaining time not found. Using fill prediction: {next_schedule.strftime('%Y-%m-%d %H:%M:%S')}")
+            return next_schedule
+
+        # Если schedule_time недоступно или некорректно и прогноза нет
+        default_schedule = now + timedelta(hours=DEFAULT_SCHEDULE_HOURS)
+        if debug:
+            logger.debug(
+                f"#{account}: Default schedule time applied: {default_schedule.strftime('%Y-%m-%d %H:%M:%S')}")
+        return default_schedule
+
+    except Exception as e:
+        logger.error(
+            f"#{account}: Error calculating next schedule from time '{schedule_time}': {e}")
+        if debug:
+            logger.debug(
+                f"#{account}: Error traceback:", exc_info=True)
+        # Возвращаем стандартное значение при ошибке
+        fallback_schedule = now + timedelta(hours=DEFAULT_SCHEDULE_HOURS)
+        if debug:
+            logger.debug(
+                f"#{account}: Fallback schedule time applied: {fallback_schedule.strftime('%Y-%m-%d %H:%M:%S')}")
+        return fallback_schedule
+
+
+def parse_weight(settings, key, default):
+    """
+    Читает вес приоритета из настроек, при ошибке возвращает значение по умолчанию.
+    """
+    value = settings.get(key, "")
+    try:
+        return float(value) if str(value).strip() else default
+    except ValueError:
+        logger.warning(f"Invalid value for '{key}': {value}. Using {default}.")
+        return default
+
+
+class PriorityTaskQueue(Queue):
+    """
+    Очередь задач с приоритетом по оценке потерянного фарма.
+
+    Аккаунты упорядочиваются по убыванию оценки:
+        overdue_weight * часы_просрочки + yield_weight * часы_просрочки * скорость_фарма,
+    при равенстве первым идёт аккаунт с меньшей ожидаемой длительностью сессии.
+    Проверки обновлений выдаются только когда в очереди нет аккаунтов,
+    сигнал завершения (None) — всегда первым. Аккаунты, запущенные вручную
+    (prioritize), выдаются раньше остальных.
+
+    Выданный аккаунт остаётся зарезервированным (reserved_accounts) до вызова
+    release_reserved(): резерв ставится под той же блокировкой, что и выдача, поэтому
+    аккаунт между очередью и запуском не выглядит потерянным для сверки аккаунтов.
+    """
+
+    def __init__(self, stats, settings=None, maxsize=0, clock=time.time):
+        self.stats = stats
+        self.clock = clock  # Источник времени (в симуляторе — виртуальное время)
+        self.due_overrides = {}  # Моменты готовности, восстановленные после перезапуска
+        self.prioritized = set()  # Аккаунты, запущенные вручную вне очереди
+        self.reserved = set()  # Аккаунты, выданные из очереди и ещё не запущенные
+        super().__init__(maxsize)
+        self.apply_settings(settings or {})
+
+    def apply_settings(self, settings):
+        """
+        Применяет веса приоритета из настроек (в том числе при изменении settings.txt).
+        """
+        overdue_weight = parse_weight(
+            settings, "PRIORITY_OVERDUE_WEIGHT", DEFAULT_OVERDUE_WEIGHT)
+        yield_weight = parse_weight(
+            settings, "PRIORITY_YIELD_WEIGHT", DEFAULT_YIELD_WEIGHT)
+        with self.mutex:
+            self.overdue_weight = overdue_weight
+            self.yield_weight = yield_weight
+
+    # Переопределение внутреннего хранилища queue.Queue (как в PriorityQueue)
+    def _init(self, maxsize):
+        self.queue = []
+        self._meta = []  # (момент готовности, порядковый номер) для каждой задачи
+        self._counter = itertools.count()
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, item):
+        self.queue.append(item)
+        self._meta.append((self._task_due_time(item), next(self._counter)))
+
+    def _get(self):
+        # Оценка потерь растёт со временем, поэтому порядок вычисляется при выдаче
+        now = self.clock()
+        best_index = min(
+            range(len(self.queue)),
+            key=lambda i: self._sort_key(self.queue[i], self._meta[i], now))
+        self._meta.pop(best_index)
+        task = self.queue.pop(best_index)
+        if isinstance(task, tuple) and len(task) == 3:
+            self.prioritized.discard(task[0])
+            self.reserved.add(task[0])
+        return task
+
+    def _task_due_time(self, task):
+        """
+        Определяет момент, когда аккаунт стал готов к клейму (заполнение хранилища).
+        Берётся из next_schedule (epoch) в balance_dict, иначе — момент постановки в очередь.
+        """
+        now = self.clock()
+        if isinstance(task, tuple) and len(task) == 3:
+            account, balance_dict, _ = task
+            if account in self.due_overrides:
+                return min(self.due_overrides.pop(account), now)
+            state = balance_dict.get(account)
+            if state is not None and state.next_schedule is not None:
+                return min(state.next_schedule, now)
+        return now
+
+    def _sort_key(self, task, meta, now):
+        due_time, sequence = meta
+        if task is None:
+            return (0, 0.0, 0.0, sequence)
+        if isinstance(task, tuple) and len(task) == 3:
+            account = task[0]
+            if account in self.prioritized:
+                return (1, 0.0, 0.0, sequence)
+            return (2, -self.lost_yield_score(account, due_time, now),
+                    self.stats.expected_session_duration(account), sequence)
+        # Проверки обновлений и прочие задачи — после всех аккаунтов
+        return (3, 0.0, 0.0, sequence)
+
+    def lost_yield_score(self, account, due_time, now=None):
+        """
+        Оценка потерь от ожидания аккаунта в очереди.
+
+        :param account: Аккаунт.
+        :param due_time: Момент заполнения хранилища (epoch).
+        :param now: Текущее время (epoch).
+        :return: Чем больше значение, тем раньше аккаунт должен быть запущен.
+        """
+        now = now or self.clock()
+        overdue_hours = max(0.0, now - due_time) / 3600
+        lost_yield = overdue_hours * self.stats.farming_rate(account)
+        return self.overdue_weight * overdue_hours + self.yield_weight * lost_yield
+
+    def restore_due_time(self, account, due_time):
+        """
+        Задаёт момент готовности аккаунта для следующей постановки в очередь
+        (восстановление очереди после перезапуска).
+        """
+        with self.mutex:
+            self.due_overrides[account] = due_time
+
+    def prioritize(self, account):
+        """
+        Ставит аккаунт первым среди аккаунтов очереди (ручной запуск).
+        Действует до выдачи аккаунта из очереди.
+        """
+        with self.mutex:
+            self.prioritized.add(account)
+
+    def discard_accounts(self, accounts):
+        """
+        Убирает аккаунты из очереди.
+
+        :param accounts: Множество аккаунтов.
+        """
+        with self.mutex:
+            keep = [index for index, task in enumerate(self.queue)
+                    if not (isinstance(task, tuple) and len(task) == 3 and task[0] in accounts)]
+            removed = len(self.queue) - len(keep)
+            self.queue = [self.queue[index] for index in keep]
+            self._meta = [self._meta[index] for index in keep]
+            # Убранные задачи считаются выполненными для корректной работы join()
+            for _ in range(removed):
+                self.unfinished_tasks -= 1
+            if not self.unfinished_tasks:
+                self.all_tasks_done.notify_all()
+            self.not_full.notify_all()
+            return removed
+
+    def pending_accounts(self):
+        """
+        Возвращает аккаунты в очереди с моментами их готовности.
+
+        :return: Список кортежей (аккаунт, момент готовности в epoch).
+        """
+        with self.mutex:
+            return [(task[0], meta[0]) for task, meta in zip(self.queue, self._meta)
+                    if isinstance(task, tuple) and len(task) == 3]
+
+    def reserved_accounts(self):
+        """
+        Возвращает аккаунты, выданные из очереди, для которых ещё не вызван release_reserved().
+        """
+        with self.mutex:
+            return set(self.reserved)
+
+    def release_reserved(self, account):
+        """
+        Снимает резерв аккаунта после того, как он запущен, отложен или возвращён в очередь.
+        """
+        with self.mutex:
+            self.reserved.discard(account)
+
+    def has_pending_accounts(self):
+        """
+        Проверяет, есть ли в очереди аккаунты, ожидающие запуска.
+        """
+        with self.mutex:
+            return any(isinstance(task, tuple) and len(task) == 3
+                       for task in self.queue)
@@ -0,0 +1,230 @@
+import os
+from threading import Lock, Thread
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+SETTINGS_FILE = "settings.txt"
+WATCH_INTERVAL = 2  # Интервал проверки изменения settings.txt (сек)
+
+# Типы, значения по умолчанию и минимальные значения известных настроек.
+# Остальные ключи хранятся как строки без проверки.
+SETTINGS_SCHEMA = {
+    "TELEGRAM_GROUP_URL": (str, "", None),
+    "BOT_LINK": (str, "", None),
+    "ACCOUNTS": (str, "", None),
+    "ACCOUNT_GROUP": (str, "", None),
+    "ACCOUNT_TAGS": (str, "", None),
+    "REPOSITORY_URL": (str, "", None),
+    "UPDATE_INTERVAL": (int, 3 * 60 * 60, 60),
+    "AUTO_UPDATE": (bool, True, None),
+    "FILES_TO_UPDATE": (str, "", None),
+    "UPDATE_KEEP_VERSIONS": (int, 3, 1),
+    "RESTART_DRAIN_TIMEOUT": (int, 600, 0),
+    "PRIORITY_OVERDUE_WEIGHT": (float, 1.0, 0.0),
+    "PRIORITY_YIELD_WEIGHT": (float, 1.0, 0.0),
+    "CIRCUIT_BREAKER_THRESHOLD": (int, 5, 1),
+    "CIRCUIT_BREAKER_PROBE_INTERVAL": (int, 300, 1),
+    "STATUS_TABLE_INTERVAL": (int, 60, 5),
+    "SKIP_LAUNCH_GUARD": (bool, True, None),
+    "PRELAUNCH_ENABLED": (bool, True, None),
+    "PRELAUNCH_MAX_WAIT": (int, 300, 0),
+    "CONCURRENCY_MIN": (int, 1, 1),
+    "CONCURRENCY_MAX": (int, 1, 1),
+    "BROWSER_MAX_MEMORY_MB": (int, 0, 0),
+    "BROWSER_MAX_CPU_PERCENT": (int, 0, 0),
+    "BROWSER_NICE": (int, 0, 0),
+    "BROWSER_CGROUP": (str, "", None),
+    "VIRTUAL_DISPLAY": (bool, False, None),
+    "VIRTUAL_DISPLAY_SCREEN": (str, "1280x800x24", None),
+    "ISOLATED_WORKERS": (bool, False, None),
+    "WORKER_MAX_SESSIONS": (int, 20, 1),
+    "WORKER_SESSION_TIMEOUT": (int, 30 * 60, 60),
+    "CLUSTER_DB": (str, "", None),
+    "CLUSTER_NODE_ID": (str, "", None),
+    "CONTROL_SERVER_HOST": (str, "127.0.0.1", None),
+    "CONTROL_SERVER_PORT": (int, 0, 0),
+    "CONTROL_SERVER_TOKEN": (str, "", None),
+}
+
+
+def parse_settings_file(path=SETTINGS_FILE):
+    """
+    Читает файл настроек в формате KEY=VALUE (комментарии начинаются с #).
+
+    :param path: Путь к файлу настроек.
+    :return: Словарь строковых значений.
+    """
+    settings = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # Удаляем лишние пробелы и проверяем пустую строку или комментарий
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue  # Пропускаем пустые строки и комментарии
+
+                # Проверяем наличие символа '='
+                if '=' not in line:
+                    logging.warning(f"Ignoring invalid setting: {line}")
+                    continue
+
+                # Разделяем только по первому '='
+                key, value = line.split('=', 1)
+                # Удаляем комментарии из значения
+                value = value.split('#')[0].strip()
+                settings[key.strip()] = value
+    except FileNotFoundError:
+        logging.error(f"Settings file '{path}' not found.")
+    except Exception as e:
+        logging.error(f"Error reading settings file: {e}")
+    return settings
+
+
+def convert_value(key, raw):
+    """
+    Приводит строковое значение настройки к типу из SETTINGS_SCHEMA.
+    Пустое или некорректное значение заменяется значением по умолчанию.
+    """
+    if key not in SETTINGS_SCHEMA:
+        return raw
+    value_type, default, minimum = SETTINGS_SCHEMA[key]
+    if raw is None or str(raw).strip() == "":
+        return default
+    try:
+        if value_type is bool:
+            normalized = str(raw).strip().lower()
+            if normalized not in ("true", "false", "1", "0", "yes", "no"):
+                raise ValueError(raw)
+            return normalized in ("true", "1", "yes")
+        value = value_type(raw)
+    except ValueError:
+        logger.warning(f"Invalid value for '{key}': {raw}. Using {default}.")
+        return default
+    if minimum is not None and value < minimum:
+        logger.warning(
+            f"Value for '{key}' is below {minimum}: {raw}. Using {default}.")
+        return default
+    return value
+
+
+class SettingsManager:
+    """
+    Общие настройки из settings.txt: файл разбирается один раз и перечитывается
+    только при изменении (по времени модификации).
+
+    Поддерживает интерфейс словаря (get, [], in) для существующего кода,
+    типизированные значения через value() и подписку на изменения.
+    """
+
+    def __init__(self, path=SETTINGS_FILE):
+        self.path = path
+        self.lock = Lock()
+        self.raw = {}
+        self.typed = {}
+        self.mtime = None
+        self.subscribers = []
+        self.watch_thread = None
+        self.reload()
+
+    # ----- Интерфейс словаря -----
+    def get(self, key, default=None):
+        with self.lock:
+            return self.raw.get(key, default)
+
+    def __getitem__(self, key):
+        with self.lock:
+            return self.raw[key]
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.raw
+
+    def items(self):
+        return self.as_dict().items()
+
+    def as_dict(self):
+        """
+        Копия строковых значений (как возвращал load_settings).
+        """
+        with self.lock:
+            return dict(self.raw)
+
+    # ----- Типизированные значения -----
+    def value(self, key):
+        """
+        Возвращает значение, приведённое к типу из SETTINGS_SCHEMA.
+        """
+        with self.lock:
+            if key in self.typed:
+                return self.typed[key]
+            if key in SETTINGS_SCHEMA:
+                return SETTINGS_SCHEMA[key][1]
+            return self.raw.get(key)
+
+    # ----- Перечитывание и подписка -----
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self, force=False):
+        """
+        Перечитывает файл, если он изменился, и уведомляет подписчиков.
+
+        :return: Словарь изменённых ключей {ключ: новое типизированное значение}.
+        """
+        mtime = self._file_mtime()
+        if not force and self.mtime is not None and mtime == self.mtime:
+            return {}
+
+        raw = parse_settings_file(self.path)
+        typed = {key: convert_value(key, value) for key, value in raw.items()}
+
+        with self.lock:
+            first_load = self.mtime is None
+            keys = set(self.raw) | set(raw)
+            changed = {key: typed.get(key, SETTINGS_SCHEMA.get(key, (None, None))[1])
+                       for key in keys if self.raw.get(key) != raw.get(key)}
+            self.raw, self.typed, self.mtime = raw, typed, mtime
+            subscribers = list(self.subscribers)
+
+        if changed and not first_load:
+            logger.info(f"Settings reloaded. Changed: {', '.join(sorted(changed))}")
+            for callback, watched_keys in subscribers:
+                if watched_keys is not None and not watched_keys & changed.keys():
+                    continue
+                try:
+                    callback(changed)
+                except Exception as e:
+                    logger.error(f"Error applying settings change: {e}")
+        return changed
+
+    def subscribe(self, callback, keys=None):
+        """
+        Подписывает callback(changed) на изменения настроек.
+
+        :param callback: Функция, получающая словарь изменённых ключей.
+        :param keys: Ключи, изменение которых интересует подписчика (None — все).
+        """
+        with self.lock:
+            self.subscribers.append(
+                (callback, set(keys) if keys is not None else None))
+
+    def start_watching(self, stop_event, interval=WATCH_INTERVAL):
+        """
+        Запускает фоновый поток, перечитывающий файл при изменении.
+        """
+        def watch():
+            while not stop_event.wait(interval):
+                self.reload()
+
+        if self.watch_thread is None or not self.watch_thread.is_alive():
+            self.watch_thread = Thread(target=watch, daemon=True)
+            self.watch_thread.start()
+
+
+# Общий экземпляр для всех модулей
+settings_manager = SettingsManager()
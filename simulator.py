@@ -0,0 +1,268 @@
+"""
+Дискретно-событийный симулятор политики планирования.
+
+Использует тот же код, что и main.py (calculate_next_schedule, RetryPolicy,
+PriorityTaskQueue), но с виртуальным временем: недели работы парка
+аккаунтов просчитываются за секунды.
+
+Пример:
+    python simulator.py --accounts 300 --workers 1 --days 14 --failure-rate 0.05
+"""
+import argparse
+import heapq
+import itertools
+import json
+import math
+import random
+from datetime import datetime
+
+from scheduler import PriorityTaskQueue, calculate_next_schedule
+from retry_policy import RetryPolicy
+from account_stats import AccountStats
+from account_state import AccountState
+
+FAILURE_CLASSES = ["api_unreachable", "launch_failure",
+                   "navigation", "selector_missing", "invalid_balance"]
+SIMULATION_START = datetime(2024, 1, 1).timestamp()
+
+
+class SimulatedAccount:
+    """
+    Модель аккаунта: хранилище заполняется за fill_period секунд со скоростью rate HOT/час.
+    """
+
+    def __init__(self, name, fill_period, rate, fill_at):
+        self.name = name
+        self.fill_period = fill_period
+        self.rate = rate
+        self.fill_at = fill_at
+        self.balance = 0.0
+
+
+class Simulation:
+    """
+    Симуляция работы планировщика на заданном парке аккаунтов.
+    """
+
+    def __init__(self, accounts=100, workers=1, days=7, fill_hours=(2.0, 8.0),
+                 session_mean=60.0, session_sd=20.0, failure_rate=0.05,
+                 scrape_miss_rate=0.02, settings=None, seed=None):
+        self.rng = random.Random(seed)
+        self.workers = workers
+        self.end = SIMULATION_START + days * 86400
+        self.days = days
+        self.session_mean = session_mean
+        self.session_sd = session_sd
+        self.failure_rate = failure_rate
+        self.scrape_miss_rate = scrape_miss_rate
+        self.now = SIMULATION_START
+
+        # Реальные компоненты планировщика с виртуальным временем
+        self.stats = AccountStats(stats_file=None)
+        self.retry_policy = RetryPolicy(rng=self.rng)
+        self.queue = PriorityTaskQueue(
+            self.stats, settings or {}, clock=lambda: self.now)
+
+        self.accounts = {}
+        for index in range(1, accounts + 1):
+            fill_period = self.rng.uniform(*fill_hours) * 3600
+            self.accounts[index] = SimulatedAccount(
+                name=index,
+                fill_period=fill_period,
+                rate=self.rng.uniform(0.01, 0.05),
+                fill_at=SIMULATION_START + self.rng.uniform(-fill_period, fill_period),
+            )
+
+        self.balance_dict = {}
+        self.events = []
+        self.sequence = itertools.count()
+        self.due_at = {}
+        self.busy = 0
+
+        # Метрики
+        self.sessions = 0
+        self.claims = 0
+        self.failures = 0
+        self.queue_lags = []
+        self.lost_hours = 0.0
+        self.lost_hot = 0.0
+        self.peak_concurrency = 0
+        self.peak_queue_depth = 0
+
+    def _push(self, at, kind, account, payload=None):
+        heapq.heappush(self.events, (at, next(self.sequence), kind, account, payload))
+
+    def _sample_duration(self):
+        # Логнормальное распределение с заданными средним и отклонением
+        sigma2 = math.log(1 + (self.session_sd / self.session_mean) ** 2)
+        mu = math.log(self.session_mean) - sigma2 / 2
+        return self.rng.lognormvariate(mu, math.sqrt(sigma2))
+
+    def _set_schedule(self, account, at):
+        self.balance_dict[account] = AccountState(next_schedule=int(at))
+
+    def _enqueue(self, account):
+        self.due_at[account] = self.now
+        self.queue.put((account, self.balance_dict, None))
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue.qsize())
+
+    def _dispatch(self):
+        while self.busy < self.workers and not self.queue.empty():
+            account = self.queue.get_nowait()[0]
+            self.queue_lags.append(self.now - self.due_at.pop(account, self.now))
+            self.busy += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.busy)
+            self.sessions += 1
+            self._push(self.now + self._sample_duration(), "finish", account, self.now)
+
+    def _remaining_time_text(self, remaining):
+        """
+        Имитирует TelegramBotAutomation.get_remaining_time (строка "HH:MM:SS" или None).
+        """
+        if self.rng.random() < self.scrape_miss_rate:
+            return None
+        remaining = int(remaining) + self.rng.randint(5, 10) * 60
+        hours, remainder = divmod(remaining, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+    def _finish(self, account, started_at):
+        self.busy -= 1
+        model = self.accounts[account]
+
+        if self.rng.random() < self.failure_rate:
+            self.failures += 1
+            failure_class = self.rng.choice(FAILURE_CLASSES)
+            retry_at = self.now + self.retry_policy.next_delay(account, failure_class)
+            self._set_schedule(account, retry_at)
+            self._push(retry_at, "due", account)
+            return
+
+        if self.now >= model.fill_at:
+            overdue_hours = (self.now - model.fill_at) / 3600
+            self.lost_hours += overdue_hours
+            self.lost_hot += overdue_hours * model.rate
+            model.balance += model.fill_period / 3600 * model.rate
+            model.fill_at = self.now + model.fill_period
+            self.claims += 1
+
+        schedule_time = self._remaining_time_text(model.fill_at - self.now)
+        next_schedule = calculate_next_schedule(
+            schedule_time, account=account,
+            now=datetime.fromtimestamp(self.now), rng=self.rng).timestamp()
+
+        self.retry_policy.record_success(account)
+        self.stats.record_run(account, started_at, self.now, model.balance)
+        self._set_schedule(account, next_schedule)
+        self._push(next_schedule, "due", account)
+
+    def run(self):
+        """
+        Выполняет симуляцию и возвращает словарь с метриками.
+        """
+        # Как при старте main.py: все аккаунты ставятся в очередь сразу
+        for account in self.accounts:
+            self._enqueue(account)
+        self._dispatch()
+
+        while self.events and self.events[0][0] <= self.end:
+            at, _, kind, account, payload = heapq.heappop(self.events)
+            self.now = at
+            if kind == "due":
+                self._enqueue(account)
+            elif kind == "finish":
+                self._finish(account, payload)
+            self._dispatch()
+
+        # Аккаунты, хранилище которых заполнено к концу симуляции, тоже теряют фарм
+        for model in self.accounts.values():
+            if model.fill_at < self.end:
+                overdue_hours = (self.end - model.fill_at) / 3600
+                self.lost_hours += overdue_hours
+                self.lost_hot += overdue_hours * model.rate
+
+        return self.results()
+
+    def results(self):
+        lags = sorted(self.queue_lags) or [0.0]
+
+        def percentile(p):
+            return lags[min(len(lags) - 1, int(p * len(lags)))] / 60
+
+        return {
+            "accounts": len(self.accounts),
+            "workers": self.workers,
+            "days": self.days,
+            "sessions": self.sessions,
+            "claims": self.claims,
+            "failures": self.failures,
+            "sessions_per_day": round(self.sessions / self.days, 1),
+            "claims_per_day": round(self.claims / self.days, 1),
+            "queue_lag_mean_min": round(sum(lags) / len(lags) / 60, 2),
+            "queue_lag_p95_min": round(percentile(0.95), 2),
+            "queue_lag_max_min": round(lags[-1] / 60, 2),
+            "lost_farming_hours": round(self.lost_hours, 1),
+            "lost_farming_hours_per_account": round(self.lost_hours / max(1, len(self.accounts)), 2),
+            "lost_hot": round(self.lost_hot, 2),
+            "peak_concurrency": self.peak_concurrency,
+            "peak_queue_depth": self.peak_queue_depth,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulate the account scheduling policy with virtual time.")
+    parser.add_argument("--accounts", type=int, default=100,
+                        help="Number of simulated accounts")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of concurrent sessions")
+    parser.add_argument("--days", type=float, default=7,
+                        help="Simulated duration in days")
+    parser.add_argument("--fill-hours", type=float, nargs=2, default=[2.0, 8.0],
+                        metavar=("MIN", "MAX"), help="Storage fill time range in hours")
+    parser.add_argument("--session-mean", type=float, default=60.0,
+                        help="Mean session duration in seconds")
+    parser.add_argument("--session-sd", type=float, default=20.0,
+                        help="Session duration standard deviation in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.05,
+                        help="Probability that a session fails")
+    parser.add_argument("--scrape-miss-rate", type=float, default=0.02,
+                        help="Probability that the remaining time text is not found")
+    parser.add_argument("--overdue-weight", type=float,
+                        help="PRIORITY_OVERDUE_WEIGHT to evaluate")
+    parser.add_argument("--yield-weight", type=float,
+                        help="PRIORITY_YIELD_WEIGHT to evaluate")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--json", action="store_true",
+                        help="Print results as JSON")
+    args = parser.parse_args()
+
+    settings = {}
+    if args.overdue_weight is not None:
+        settings["PRIORITY_OVERDUE_WEIGHT"] = str(args.overdue_weight)
+    if args.yield_weight is not None:
+        settings["PRIORITY_YIELD_WEIGHT"] = str(args.yield_weight)
+
+    results = Simulation(
+        accounts=args.accounts,
+        workers=args.workers,
+        days=args.days,
+        fill_hours=tuple(args.fill_hours),
+        session_mean=args.session_mean,
+        session_sd=args.session_sd,
+        failure_rate=args.failure_rate,
+        scrape_miss_rate=args.scrape_miss_rate,
+        settings=settings,
+        seed=args.seed,
+    ).run()
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        width = max(len(key) for key in results)
+        for key, value in results.items():
+            print(f"{key:<{width}}  {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import os
+from threading import Lock, Thread, Event
+from colorama import Fore, Style
+import logging
+from account_state import AccountStatus
+from time_base import format_epoch, epoch_now
+from utils import get_color, is_debug_enabled
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_INTERVAL = 60  # Минимальный интервал между выводами таблицы (сек)
+FULL_TABLE_TRIGGER = os.path.join("temp", "show_table")  # Файл-запрос полной таблицы
+TRIGGER_POLL_INTERVAL = 1  # Интервал проверки файла-запроса (сек)
+
+
+def format_balance(balance):
+    """
+    Баланс без лишних нулей после запятой.
+    """
+    if balance == int(balance):
+        return int(balance)
+    return round(balance, 2)
+
+
+class StatusView:
+    """
+    Вывод состояния аккаунтов в лог не чаще одного раза в interval секунд.
+
+    Обработчики аккаунтов только отмечают изменённые аккаунты (mark_changed).
+    Фоновый поток копирует их состояние под balance_lock и строит таблицу уже
+    без блокировки: в таблицу попадают только изменённые строки и итоги
+    (общий баланс, количество по статусам, ближайший запуск). Полная таблица
+    выводится по запросу: request_full() или создание файла temp/show_table.
+    """
+
+    def __init__(self, balance_dict, balance_lock, interval=DEFAULT_INTERVAL,
+                 trigger_file=FULL_TABLE_TRIGGER):
+        """
+        :param balance_dict: Словарь {аккаунт: AccountState}.
+        :param balance_lock: Блокировка balance_dict.
+        :param interval: Минимальный интервал между выводами (сек).
+        :param trigger_file: Файл, появление которого запрашивает полную таблицу.
+        """
+        self.balance_dict = balance_dict
+        self.balance_lock = balance_lock
+        self.interval = interval
+        self.trigger_file = trigger_file
+        self.lock = Lock()
+        self.changed = set()
+        self.full_requested = Event()
+        self.last_render = 0
+        self.thread = None
+
+    def mark_changed(self, account):
+        """
+        Отмечает аккаунт для вывода в следующей таблице.
+        """
+        with self.lock:
+            self.changed.add(account)
+
+    def request_full(self):
+        """
+        Запрашивает вывод полной таблицы при ближайшей проверке.
+        """
+        self.full_requested.set()
+
+    def apply_settings(self, settings):
+        """
+        Применяет интервал вывода из настроек.
+        """
+        self.interval = settings.value("STATUS_TABLE_INTERVAL")
+
+    def _check_trigger(self):
+        if self.trigger_file and os.path.exists(self.trigger_file):
+            try:
+                os.remove(self.trigger_file)
+            except OSError:
+                pass
+            self.full_requested.set()
+
+    def _snapshot(self):
+        """
+        Копирует состояние аккаунтов (под блокировкой — только копирование).
+        """
+        with self.balance_lock:
+            return {account: (state.username, state.balance, state.next_schedule, state.status)
+                    for account, state in self.balance_dict.items()}
+
+    def render(self, full=False):
+        """
+        Выводит таблицу изменённых (или всех) аккаунтов и итоги.
+
+        :param full: Вывести все аккаунты.
+        :return: True, если что-то выведено.
+        """
+        with self.lock:
+            changed, self.changed = self.changed, set()
+        if not full and not changed:
+            return False
+        snapshot = self._snapshot()
+        self.last_render = epoch_now()
+
+        from prettytable import PrettyTable
+        table = PrettyTable()
+        table.field_names = ["ID", "Username",
+                             "Balance", "Next Scheduled Time", "Status"]
+        accounts = snapshot if full else [
+            account for account in changed if account in snapshot]
+        reset = get_color(Style.RESET_ALL)
+        # Сортировка по epoch, аккаунты без времени — в конце
+        for account in sorted(accounts, key=lambda account: snapshot[account][2]
+                              if snapshot[account][2] is not None else float("inf")):
+            username, balance, next_schedule, status = snapshot[account]
+            # Цвета с приоритетом: ANSI -> Windows API -> Без цвета
+            color = get_color(
+                Fore.RED) if status is AccountStatus.ERROR else get_color(Fore.CYAN)
+            table.add_row([
+                f"{color}{account}{reset}",
+                f"{color}{username}{reset}",
+                f"{color}{format_balance(balance)}{reset}",
+                f"{color}{format_epoch(next_schedule)}{reset}",
+                f"{color}{status.value}{reset}",
+            ])
+
+        title = "Current Balance Table" if full else f"Updated accounts ({len(accounts)})"
+        logger.info(f"\n{title}:\n" + str(table))
+        logger.info(self.summary(snapshot))
+        return True
+
+    def summary(self, snapshot):
+        """
+        Итоги: общий баланс, количество по статусам и ближайший запуск.
+        """
+        total_balance = 0
+        counts = {}
+        upcoming = [state[2] for state in snapshot.values()
+                    if state[2] is not None and state[2] > epoch_now()]
+        for _, balance, _, status in snapshot.values():
+            counts[status] = counts.get(status, 0) + 1
+            if status is not AccountStatus.ERROR:
+                total_balance += format_balance(balance)
+        statuses = ", ".join(f"{status.value}: {count}" for status, count in counts.items())
+        total_color = get_color(Fore.MAGENTA)
+        reset = get_color(Style.RESET_ALL)
+        return (
+            f"Total Balance: {total_color}{format_balance(round(total_balance, 2))}{reset} | "
+            f"Accounts: {len(snapshot)} ({statuses or 'none'}) | "
+            f"Next run: {format_epoch(min(upcoming)) if upcoming else 'N/A'}"
+        )
+
+    def start(self, stop_event):
+        """
+        Запускает фоновый вывод таблицы до установки stop_event.
+        """
+        def render_loop():
+            while not stop_event.wait(TRIGGER_POLL_INTERVAL):
+                try:
+                    self._check_trigger()
+                    if self.full_requested.is_set():
+                        self.full_requested.clear()
+                        self.render(full=True)
+                    elif epoch_now() - self.last_render >= self.interval:
+                        self.render()
+                except Exception as e:
+                    logger.error(f"Error generating table: {e}")
+                    if is_debug_enabled():
+                        logger.debug("Error traceback:", exc_info=True)
+
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = Thread(target=render_loop, daemon=True)
+            self.thread.start()
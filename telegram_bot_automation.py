@@ -8,7 +8,9 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, WebDriverException, TimeoutException, StaleElementReferenceException
 from browser_manager import BrowserManager
+from retry_policy import AdsPowerUnavailableError, BrowserLaunchError
 from utils import stop_event
+from quest_cache import quest_cache, ALL_QUESTS
 from colorama import Fore, Style
 from urllib.parse import unquote, parse_qs
 import traceback
@@ -18,6 +20,24 @@ import logging
 logger = logging.getLogger("application_logger")
 
 
+MAIN_QUEST_COUNT = 16  # Количество основных квестов в разделе "Explore crypto"
+# Дополнительные квесты: раздел и названия с учетом языковых вариаций
+ADDITIONAL_QUESTS = {
+    "TON": ["What is TON Blockchain", "что такое блокчейн TON"],
+    "BNB": ["What is BNB Chain", "что такое BNB сеть"],
+    "SOLANA": ["What is Solana Blockchain", "что такое блокчейн Solana"]
+}
+
+# Квесты в индексе выполненных определяются по названию: позиция в списке меняется,
+# когда в приложении добавляют, удаляют или переставляют квесты
+def main_quest_id(title):
+    return f"main:{title}"
+
+
+def additional_quest_id(quest_titles):
+    return f"additional:{quest_titles[0]}"
+
+
 def load_questions_answers(filename="questions_answers.json"):
     try:
         with open(filename, "r", encoding="utf-8") as file:
@@ -40,33 +60,39 @@ def dynamic_pause(min_seconds=1, max_seconds=3):
 
 class TelegramBotAutomation:
     MAX_RETRIES = 3
+    FILL_POLL_INTERVAL = 5  # Интервал проверки процента при ожидании заполнения (сек)
 
     def __init__(self, serial_number, settings):
         self.serial_number = serial_number
         self.username = None
         self.balance = 0.0
+        # Замеры для модели заполнения хранилища (fill_model)
+        self.storage_readings = []  # [(время, процент заполнения)]
+        self.claimed_at = None  # Время подтверждённого клейма
+        self.remaining_seconds = None  # Оставшееся время с экрана (без случайной добавки)
         self.browser_manager = BrowserManager(serial_number)
         self.settings = settings
         if not self.browser_manager.wait_browser_close():
             logger.error(
-                "Account {serial_number}: Failed to close previous browser session.")
-            return
+                f"Account {serial_number}: Failed to close previous browser session.")
+            raise BrowserLaunchError("Previous browser session is still active")
         if not self.browser_manager.start_browser():
             logger.error(f"Account {serial_number}: Failed to start browser.")
-            return
+            if self.browser_manager.api_unreachable:
+                raise AdsPowerUnavailableError("AdsPower local API is unreachable")
+            raise BrowserLaunchError("Failed to start browser")
         self.driver = self.browser_manager.driver
 
     def log_account_as_complete(self):
-        try:
-            with open("all_quest_complete.txt", "a", encoding="utf-8") as file:
-                file.write(f"{self.serial_number}\n")
-            logger.info(
-                f"Account {self.serial_number}: Logged as complete in 'all_quest_complete.txt'")
-        except Exception as e:
-            logger.error(
-                f"Account {self.serial_number}: Error writing to file 'all_quest_complete.txt'. Error: {e}")
+        quest_cache.mark_completed(self.serial_number, ALL_QUESTS, "All quests")
+        logger.info(
+            f"Account {self.serial_number}: All quests marked as completed.")
 
     def process_mission_quests(self):
+        if quest_cache.is_account_completed(self.serial_number):
+            logger.info(
+                f"Account {self.serial_number}: All quests already completed, skipping.")
+            return
         logger.info(f"Account {self.serial_number}: Starting mission quests.")
 
         try:
@@ -119,7 +145,7 @@ class TelegramBotAutomation:
 
             # Проверка, что все квесты завершены
             if main_quests_performed and additional_quests_completed:
-                # Запись номера аккаунта в файл all_quest_complete.txt
+                # Отметка аккаунта в индексе выполненных квестов
                 self.log_account_as_complete()
 
         except Exception as e:
@@ -222,10 +248,8 @@ class TelegramBotAutomation:
                     f"Account {self.serial_number}: Quest section not found.")
                 return False  # Если секция не найдена, завершаем выполнение
 
-            # Выполняем квесты
-            # Количество квестов (или используем динамическое определение)
-            quest_count = 16
-            for i in range(1, quest_count + 1):
+            # Выполняем квесты, не отмеченные в индексе выполненных
+            for i in range(1, MAIN_QUEST_COUNT + 1):
                 try:
                     # Ищем основной контейнер с квестами перед каждой итерацией
                     main_container = self.wait_for_element(
@@ -244,7 +268,15 @@ class TelegramBotAutomation:
                     # Проверяем, что текущий квест существует и не завершен
                     if i <= len(quests):
                         quest = quests[i - 1]
-                        if not self.is_quest_button_completed(quest):
+                        title = quest.text.strip().split("\n")[0]
+                        # Без названия квест нельзя опознать, он проверяется каждый раз
+                        quest_id = main_quest_id(title) if title else None
+                        if quest_id and quest_cache.is_completed(self.serial_number, quest_id):
+                            continue  # Квест уже выполнен, кнопка не проверяется
+                        if self.is_quest_button_completed(quest):
+                            if quest_id:
+                                quest_cache.mark_completed(self.serial_number, quest_id, title)
+                        else:
                             quest.click()
                             logger.info(
                                 f"Account {self.serial_number}: Main quest button {i} clicked.")
@@ -258,6 +290,8 @@ class TelegramBotAutomation:
                                     f"Account {self.serial_number}: Quest {i} failed to complete.")
                                 return False  # Прерываем выполнение и возвращаем False при ошибке
 
+                            if quest_id:
+                                quest_cache.mark_completed(self.serial_number, quest_id, title)
                             time.sleep(1)
                     else:
                         logger.warning(
@@ -343,16 +377,13 @@ class TelegramBotAutomation:
             f"Account {self.serial_number}: Starting additional quests from 'Missions'.")
 
         try:
-            # Список разделов и названий квестов с учетом языковых вариаций
-            additional_quests = {
-                "TON": ["What is TON Blockchain", "что такое блокчейн TON"],
-                "BNB": ["What is BNB Chain", "что такое BNB сеть"],
-                "SOLANA": ["What is Solana Blockchain", "что такое блокчейн Solana"]
-            }
-
             all_additional_quests_completed = True
 
-            for section_name, quest_titles in additional_quests.items():
+            for section_name, quest_titles in ADDITIONAL_QUESTS.items():
+                quest_id = additional_quest_id(quest_titles)
+                if quest_cache.is_completed(self.serial_number, quest_id):
+                    continue  # Раздел не открывается, квест уже выполнен
+
                 # Переход в нужный раздел
                 self.navigate_to_section_from_missions(section_name)
 
@@ -362,6 +393,7 @@ class TelegramBotAutomation:
                         f"Account {self.serial_number}: Quest in '{section_name}' section not found or already completed.")
                     all_additional_quests_completed = False
                     break  # Прерываем выполнение цикла при первой ошибке
+                quest_cache.mark_completed(self.serial_number, quest_id, quest_titles[0])
 
             return all_additional_quests_completed
 
@@ -1257,7 +1289,13 @@ class TelegramBotAutomation:
                 f"Account {self.serial_number}: Error retrieving progress percentage. Error: {e}.")
             return None
 
-    def farming(self):
+    def farming(self, wait_for_full=0):
+        """
+        Клейм HOT при заполненном хранилище.
+
+        :param wait_for_full: Сколько секунд ждать заполнения, если хранилище почти
+                              заполнено (аккаунт запущен заранее, см. prelaunch в main.py).
+        """
         if stop_event.is_set():  # Проверка на прерывание перед началом
             logger.debug(
                 f"Account {self.serial_number}: Farming process interrupted by stop_event.")
@@ -1270,6 +1308,19 @@ class TelegramBotAutomation:
             # Передаём stop_event для возможности прерывания
             percent = self.find_timer_element()
             if percent is not None:
+                self.storage_readings.append((time.time(), percent))
+                if percent < 100.0 and wait_for_full > 0:
+                    logger.info(
+                        f"Account {self.serial_number}: Storage at {percent}%. Waiting up to {int(wait_for_full)} seconds to claim.")
+                    deadline = time.time() + wait_for_full
+                    while percent is not None and percent < 100.0 and time.time() < deadline:
+                        if stop_event.wait(self.FILL_POLL_INTERVAL):
+                            logger.debug(
+                                f"Account {self.serial_number}: Farming process interrupted while waiting for full storage.")
+                            return
+                        percent = self.find_timer_element()
+                        if percent is not None:
+                            self.storage_readings.append((time.time(), percent))
                 if percent == 100.0:
                     logger.info(
                         f"Account {self.serial_number}: Timer is at 100%. Attempting to claim.")
@@ -1320,6 +1371,7 @@ class TelegramBotAutomation:
                     f"Account {self.serial_number}: 'Claim HOT' button clicked.")
 
                 # Ожидаем обновления баланса, проверяя каждые 5 секунд, пока не истекут 3 минуты (180 секунд)
+                clicked_at = time.time()
                 initial_balance = self.get_update_balance()
                 start_time = time.time()
 
@@ -1331,6 +1383,7 @@ class TelegramBotAutomation:
 
                     current_balance = self.get_update_balance()
                     if current_balance != initial_balance:
+                        self.claimed_at = clicked_at
                         logger.info(
                             f"Account {self.serial_number}: Balance updated successfully to {current_balance}.")
                         break
@@ -1538,6 +1591,8 @@ class TelegramBotAutomation:
                     f"Account {self.serial_number}: No valid time format found in <p> elements.")
                 return None
 
+            self.remaining_seconds = remaining_time
+
             # Добавляем случайное время от 5 до 10 минут
             additional_seconds = random.randint(5, 10) * 60
             remaining_time += additional_seconds
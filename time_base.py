@@ -0,0 +1,203 @@
+import time
+import heapq
+import itertools
+from threading import Thread, Condition
+from datetime import datetime
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+CHECK_INTERVAL = 30  # Максимальный интервал сна планировщика (сек)
+JUMP_THRESHOLD = 60  # Расхождение часов, которое считается скачком или сном (сек)
+
+# CLOCK_BOOTTIME (Linux) продолжает идти во время сна системы, time.monotonic — нет.
+# На Windows time.monotonic основан на счётчике, который учитывает сон.
+if hasattr(time, "CLOCK_BOOTTIME"):
+    def deadline_clock():
+        return time.clock_gettime(time.CLOCK_BOOTTIME)
+    SUSPEND_AWARE_CLOCK = True
+else:
+    deadline_clock = time.monotonic
+    SUSPEND_AWARE_CLOCK = False
+
+
+# ========================= Преобразования времени ==========================
+
+def epoch_now():
+    """Текущее время в секундах UTC (epoch)."""
+    return time.time()
+
+
+def to_epoch(value):
+    """
+    Приводит время к секундам UTC (epoch).
+
+    :param value: datetime, число (epoch) или строка в формате TIME_FORMAT (локальное время).
+    :return: Целое число секунд или None, если значение не распознано.
+    """
+    if value is None or value == "N/A":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    try:
+        return int(datetime.strptime(value, TIME_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def format_epoch(epoch):
+    """
+    Форматирует epoch в локальное время для вывода.
+    """
+    if epoch is None:
+        return "N/A"
+    return datetime.fromtimestamp(epoch).strftime(TIME_FORMAT)
+
+
+# ========================= Планировщик по монотонным часам ==========================
+
+class ScheduledTask:
+    """
+    Отложенная задача. Совместима с threading.Timer по методам cancel() и is_alive(),
+    поэтому хранится в том же списке active_timers.
+    """
+
+    def __init__(self, scheduler, key, epoch_deadline, callback):
+        self.scheduler = scheduler
+        self.key = key
+        self.epoch_deadline = epoch_deadline
+        self.callback = callback
+        self.cancelled = False
+        self.fired = False
+        self.sequence = 0
+        # Срок по монотонным часам, от него считается ожидание
+        self.deadline = deadline_clock() + (epoch_deadline - epoch_now())
+
+    def __lt__(self, other):
+        return (self.deadline, self.sequence) < (other.deadline, other.sequence)
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+    def is_alive(self):
+        return not self.cancelled and not self.fired
+
+
+class DeadlineScheduler:
+    """
+    Запускает отложенные задачи по монотонным часам вместо threading.Timer.
+
+    Сроки хранятся одновременно в epoch (UTC, для сохранения на диск) и по монотонным
+    часам (для ожидания). Планировщик сравнивает ход системных и монотонных часов:
+    - при переводе системных часов (NTP, ручная правка) сроки по монотонным часам
+      сохраняются, а epoch пересчитывается;
+    - при сне системы (если монотонные часы его не учитывают) истинным считается epoch,
+      просроченные задачи запускаются сразу.
+    После пересчёта вызывается on_reconcile(список задач) для сохранения новых сроков.
+    """
+
+    def __init__(self, stop_event, on_reconcile=None):
+        self.stop_event = stop_event
+        self.on_reconcile = on_reconcile
+        self.condition = Condition()
+        self.heap = []
+        self.counter = itertools.count()
+        self.thread = None
+
+    def schedule(self, key, epoch_deadline, callback):
+        """
+        Планирует вызов callback() в момент epoch_deadline.
+        Если срок уже прошёл, задача выполняется сразу.
+
+        :return: Объект ScheduledTask.
+        """
+        task = ScheduledTask(self, key, epoch_deadline, callback)
+        with self.condition:
+            task.sequence = next(self.counter)
+            heapq.heappush(self.heap, task)
+            self._ensure_thread()
+            self.condition.notify()
+        return task
+
+    def cancel(self, task):
+        with self.condition:
+            task.cancelled = True
+            self.condition.notify()
+
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        last_wall = epoch_now()
+        last_clock = deadline_clock()
+
+        while not self.stop_event.is_set():
+            due = []
+            with self.condition:
+                while self.heap and self.heap[0].cancelled:
+                    heapq.heappop(self.heap)
+
+                now = deadline_clock()
+                while self.heap and self.heap[0].deadline <= now:
+                    task = heapq.heappop(self.heap)
+                    if not task.cancelled:
+                        due.append(task)
+
+                if not due:
+                    timeout = CHECK_INTERVAL
+                    if self.heap:
+                        timeout = min(timeout, max(0.0, self.heap[0].deadline - now))
+                    self.condition.wait(timeout)
+
+            for task in due:
+                try:
+                    task.callback()
+                except Exception as e:
+                    logger.error(f"Error in scheduled task '{task.key}': {e}")
+                finally:
+                    # Как у threading.Timer, задача жива, пока выполняется callback
+                    task.fired = True
+
+            # Проверка скачка системных часов или сна системы
+            wall, clock = epoch_now(), deadline_clock()
+            drift = (wall - last_wall) - (clock - last_clock)
+            last_wall, last_clock = wall, clock
+            if abs(drift) >= JUMP_THRESHOLD:
+                self._reconcile(drift)
+
+    def _reconcile(self, drift):
+        suspended = drift > 0 and not SUSPEND_AWARE_CLOCK
+        if suspended:
+            logger.warning(
+                f"System suspend detected ({drift:.0f} seconds). Re-evaluating schedules.")
+        else:
+            logger.warning(
+                f"System clock jump detected ({drift:+.0f} seconds). Re-evaluating schedules.")
+
+        with self.condition:
+            wall, clock = epoch_now(), deadline_clock()
+            changed = []
+            for task in self.heap:
+                if task.cancelled:
+                    continue
+                if suspended:
+                    # Прошло реальное время: срок в epoch верен, просроченные запустятся сразу
+                    task.deadline = clock + (task.epoch_deadline - wall)
+                else:
+                    # Сдвинулись системные часы: сохраняем интервал ожидания
+                    task.epoch_deadline = int(wall + (task.deadline - clock))
+                changed.append(task)
+            heapq.heapify(self.heap)
+            self.condition.notify()
+
+        if changed and self.on_reconcile:
+            try:
+                self.on_reconcile(changed)
+            except Exception as e:
+                logger.error(f"Error while saving reconciled schedules: {e}")
@@ -4,14 +4,26 @@ import requests
 import sys
 import time
 from threading import Lock
-from utils import load_settings, GlobalFlags, stop_event
+from utils import load_settings, GlobalFlags, stop_event, drain_event, setup_logger
 from colorama import Fore, Style
 import logging
 import hashlib
+import json
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from update_recovery import (VERSIONS_DIR, SWITCH_JOURNAL_FILE, write_file_atomic, current_version_id,
+                             set_current_version, replace_files, restore_version)
 
 
 logger = logging.getLogger("application_logger")
 update_lock = Lock()
+MANIFEST_FILE = "update_manifest.json"  # Манифест с хэшами файлов в репозитории
+UPDATE_CACHE_FILE = os.path.join("temp", "update_cache.json")  # ETag и хэши удалённых файлов
+MAX_FETCH_WORKERS = 4  # Количество параллельных запросов при проверке обновлений
+STAGING_SUFFIX = ".staging"
+DEFAULT_KEEP_VERSIONS = 3  # Сколько предыдущих версий хранить для отката
+SMOKE_TEST_TIMEOUT = 120  # Ограничение времени пробного импорта (сек)
 
 # ========================= Классы ==========================
 
@@ -81,7 +93,15 @@ class GitUpdater:
 class FileUpdater:
     """
     Класс для обновления файлов напрямую через raw URL.
-    """ 
+
+    Проверка обновлений использует манифест update_manifest.json (хэши файлов) или,
+    если его нет, условные запросы If-None-Match по сохранённым ETag.
+    Запросы выполняются параллельно, неизменённые файлы не скачиваются.
+    """
+    # Хэши удалённых файлов из последней проверки, по ним проверяется скачанная версия
+    expected_hashes = {}
+    # Содержимое файлов, полученное при проверке: повторно не скачивается
+    fetched_content = {}
 
     @staticmethod
     def check_updates():
@@ -99,21 +119,32 @@ class FileUpdater:
             logger.error("Repository URL is not specified in settings.")
             return False, []
 
+        cache = load_update_cache()
+
+        # Манифест с хэшами позволяет проверить все файлы одним запросом
+        manifest = fetch_manifest(repo_url, branch, cache)
+        if manifest is not None:
+            updates = [file_path for file_path, remote_hash in manifest.items()
+                       if local_file_hash(file_path) != remote_hash]
+            FileUpdater.expected_hashes = {
+                file_path: manifest[file_path] for file_path in updates}
+            FileUpdater.fetched_content = {}
+            save_update_cache(cache)
+            if updates:
+                logger.debug(
+                    f"Updates found for the following files: {updates}")
+            else:
+                logger.debug("No updates found.")
+            return bool(updates), updates
+
         # Проверяем наличие специального файла remote_files_for_update
         if "remote_files_for_update" in files_to_update:
             logger.debug("Fetching file list from remote_files_for_update...")
             try:
-                # Формируем URL для получения файла remote_files_for_update
-                timestamp = int(time.time())
-                raw_url = f"https://raw.githubusercontent.com/{repo_url.split('/')[-2]}/{repo_url.split('/')[-1]}/{branch}/remote_files_for_update?nocache={timestamp}"
-                headers = {"Cache-Control": "no-cache"}
-                response = requests.get(raw_url, headers=headers, timeout=10)
-                response.raise_for_status()
-
-                # Загрузка и парсинг файла
-                remote_files_content = response.text.strip()
+                remote_files_content = fetch_cached_content(
+                    build_raw_url(repo_url, branch, "remote_files_for_update"), cache)
                 files_to_update = [
-                    file.strip() for file in remote_files_content.splitlines() if file.strip()]
+                    file.strip() for file in remote_files_content.decode("utf-8").splitlines() if file.strip()]
                 logger.debug(
                     f"Fetched files from remote_files_for_update: {files_to_update}")
             except Exception as e:
@@ -125,39 +156,29 @@ class FileUpdater:
                 "No files specified in FILES_TO_UPDATE or remote_files_for_update.")
             return False, []
 
-        updates = []
-        headers = {
-            "Cache-Control": "no-cache"  # Принудительное обновление без кэширования
-        }
-
-        for file_path in files_to_update:
+        def check_file(file_path):
             try:
-                # Формируем URL для получения файла через raw.githubusercontent.com с параметром для обхода кэша
-                timestamp = int(time.time())
-                raw_url = f"https://raw.githubusercontent.com/{repo_url.split('/')[-2]}/{repo_url.split('/')[-1]}/{branch}/{file_path}?nocache={timestamp}"
-
-                # Отправляем запрос
-                response = requests.get(raw_url, headers=headers, timeout=10)
-                response.raise_for_status()
-
-                # Получаем удалённое содержимое файла
-                remote_content = response.content
-                remote_hash = calculate_hash(remote_content)
+                url = build_raw_url(repo_url, branch, file_path)
+                content = conditional_get(url, cache)
+                remote_hash = cache[url]["sha256"]
                 logger.debug(f"remote_hash for {file_path}: {remote_hash}")
-                # Проверяем локальный файл
-                if os.path.exists(file_path):
-                    with open(file_path, "rb") as f:
-                        local_content = f.read()
-                    local_hash = calculate_hash(local_content)
-                    logger.debug(f"local_hash for {file_path}: {local_hash}")
-                    # Сравниваем хэши локального и удалённого содержимого
-                    if local_hash != remote_hash:
-                        updates.append(file_path)
-                else:
-                    updates.append(file_path)
-
+                return file_path, remote_hash, content
             except Exception as e:
                 logger.error(f"Error checking file {file_path}: {e}")
+                return file_path, None, None
+
+        # Параллельные условные запросы
+        with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+            results = [result for result in executor.map(check_file, files_to_update) if result[1]]
+        remote_hashes = {file_path: remote_hash for file_path, remote_hash, _ in results}
+        updates = [file_path for file_path, remote_hash in remote_hashes.items()
+                   if local_file_hash(file_path) != remote_hash]
+        FileUpdater.expected_hashes = {
+            file_path: remote_hashes[file_path] for file_path in updates}
+        FileUpdater.fetched_content = {
+            file_path: content for file_path, _, content in results
+            if file_path in updates and content is not None}
+        save_update_cache(cache)
 
         # Логируем список обновлений в конце
         if updates:
@@ -170,73 +191,266 @@ class FileUpdater:
     @staticmethod
     def perform_update(update_files, repo_url, stop_on_failure=True):
         """
-        Updates files via URL and creates backups in the temp folder.
-        Returns True if all files were successfully updated, otherwise False.
-        """       
+        Атомарно обновляет файлы через raw URL.
+
+        Новая версия собирается в temp/versions/<id>.staging (текущие файлы + скачанные),
+        проверяется по хэшам последней проверки обновлений и пробным импортом модулей
+        в отдельном процессе. Затем текущие файлы сохраняются как предыдущая версия
+        и заменяются через os.replace. При любой ошибке файлы возвращаются к
+        сохранённой версии, рабочее дерево остаётся согласованным.
+
+        :param update_files: Список файлов для обновления.
+        :param repo_url: URL репозитория.
+        :param stop_on_failure: Пробрасывать исключение при ошибке (иначе вернуть False).
+        :return: True, если обновление применено.
+        """
         logger.info("Updating files directly via raw URLs...", extra={
             'color': Fore.CYAN})
 
-        # Удаляем расширение .git из URL, если оно присутствует
-        if repo_url.endswith(".git"):
-            repo_url = repo_url[:-4]
-
         branch = "main"  # Укажите ветку
-        success = True   # Флаг успешности обновления
-        temp_dir = "temp"  # Директория для временных файлов
-
-        # Создаём папку temp, если она не существует
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-            logger.debug(f"Temporary folder created: {temp_dir}")
+        settings = load_settings()
+        files = managed_files(update_files)
+        stage_dir = os.path.join(VERSIONS_DIR, new_version_id() + STAGING_SUFFIX)
+        version_dir = None
 
-        # Обновляем каждый файл из списка
-        for file_path in update_files:
-            try:
-                logger.info(f"Updating file: {file_path}", extra={
+        try:
+            # Сборка новой версии: неизменённые файлы копируются, обновлённые скачиваются
+            copy_files([file_path for file_path in files if file_path not in update_files],
+                       ".", stage_dir)
+            download_files(update_files, repo_url, branch, stage_dir,
+                           FileUpdater.fetched_content)
+            verify_staged_version(
+                stage_dir, files, FileUpdater.expected_hashes)
+
+            previous_id = snapshot_current_version(files)
+            # Идентификатор выбирается после снимка, чтобы новая версия была старше предыдущей
+            version_id = new_version_id()
+            version_dir = os.path.join(VERSIONS_DIR, version_id)
+            os.replace(stage_dir, version_dir)
+            switch_to_version(version_dir, files, previous_id)
+            set_current_version(version_id)
+            version_dir = None
+            prune_versions(read_keep_versions(settings))
+
+            for file_path in update_files:
+                logger.info(f"File {file_path} successfully updated.", extra={
                             'color': Fore.CYAN})
+            logger.info(f"Update applied as version {version_id} (previous: {previous_id}).",
+                        extra={'color': Fore.CYAN})
+            return True
+
+        except Exception as e:
+            logger.error(f"Update aborted, current version kept: {e}")
+            if stop_on_failure:
+                raise
+            return False
+        finally:
+            for path in (stage_dir, version_dir):
+                if path and os.path.exists(path):
+                    shutil.rmtree(path, ignore_errors=True)
 
-                # Добавляем уникальный параметр для обхода кэша
-                timestamp = int(time.time())
-                raw_url = (
-                    f"https://raw.githubusercontent.com/"
-                    f"{repo_url.split('/')[-2]}/{repo_url.split('/')[-1]}/{branch}/{file_path}?nocache={timestamp}"
-                )
 
-                # Настраиваем заголовки Cache-Control для запроса
-                headers = {"Cache-Control": "no-cache"}
-                response = requests.get(raw_url, headers=headers, timeout=10)
-                response.raise_for_status()  # Проверяем, что запрос прошёл успешно
+# ========================= Версии ==========================
 
-                content = response.content  # Получаем содержимое файла
+def managed_files(extra_files=()):
+    """
+    Возвращает список файлов, которые входят в версию: локальный
+    remote_files_for_update и обновляемые файлы.
+    """
+    files = []
+    if os.path.exists("remote_files_for_update"):
+        with open("remote_files_for_update", "r", encoding="utf-8") as f:
+            files = [line.strip() for line in f if line.strip()]
+    for file_path in extra_files:
+        if file_path not in files:
+            files.append(file_path)
+    return files
 
-                # Путь для резервной копии
-                file_name = os.path.basename(file_path)  # Извлекаем имя файла
-                backup_path = os.path.join(temp_dir, f"{file_name}.backup")
 
-                # Удаляем старую резервную копию, если она существует
-                if os.path.exists(backup_path):
-                    os.remove(backup_path)
+def new_version_id():
+    """
+    Идентификатор версии по времени: 20240101-120000 (сортируется по возрасту).
+    """
+    version_id = time.strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    candidate = version_id
+    while os.path.exists(os.path.join(VERSIONS_DIR, candidate)):
+        candidate = f"{version_id}-{suffix}"
+        suffix += 1
+    return candidate
 
-                # Создаём резервную копию текущего файла
-                if os.path.exists(file_path):
-                    os.rename(file_path, backup_path)
-                    logger.info(f"Backup created: {backup_path}", extra={
+
+def list_versions():
+    """
+    Возвращает идентификаторы сохранённых версий от старых к новым.
+    """
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    return sorted(name for name in os.listdir(VERSIONS_DIR)
+                  if os.path.isdir(os.path.join(VERSIONS_DIR, name))
+                  and not name.endswith(STAGING_SUFFIX))
+
+
+def read_keep_versions(settings):
+    try:
+        return max(1, int(settings.get("UPDATE_KEEP_VERSIONS", DEFAULT_KEEP_VERSIONS)))
+    except ValueError:
+        logger.warning(
+            f"Invalid value for 'UPDATE_KEEP_VERSIONS'. Using {DEFAULT_KEEP_VERSIONS}.")
+        return DEFAULT_KEEP_VERSIONS
+
+
+def copy_files(files, source_dir, target_dir):
+    """
+    Копирует существующие файлы из source_dir в target_dir с сохранением путей.
+    """
+    for file_path in files:
+        source = os.path.join(source_dir, file_path)
+        if not os.path.exists(source):
+            continue
+        target = os.path.join(target_dir, file_path)
+        os.makedirs(os.path.dirname(target) or target_dir, exist_ok=True)
+        shutil.copy2(source, target)
+
+
+def download_files(update_files, repo_url, branch, target_dir, fetched_content=None):
+    """
+    Параллельно скачивает файлы в каталог сборки. Любая ошибка прерывает обновление.
+    Файлы, полученные при проверке обновлений, берутся из fetched_content: скачанная
+    версия совпадает с той, чей хэш был проверен. Остальные запрашиваются обычным GET
+    без обхода кэша CDN, чтобы получить ту же копию, что и при проверке.
+    """
+    fetched_content = fetched_content or {}
+
+    def download(file_path):
+        content = fetched_content.get(file_path)
+        if content is None:
+            logger.info(f"Downloading file: {file_path}", extra={
                         'color': Fore.CYAN})
+            response = requests.get(
+                build_raw_url(repo_url, branch, file_path), timeout=10)
+            response.raise_for_status()
+            content = response.content
+        target = os.path.join(target_dir, file_path)
+        os.makedirs(os.path.dirname(target) or target_dir, exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(content)
 
-                # Сохраняем обновленный файл обратно в его изначальный путь
-                with open(file_path, "wb") as f:
-                    f.write(content)
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        list(executor.map(download, update_files))
 
-                logger.info(f"File {file_name} successfully updated at {file_path}.", extra={
-                            'color': Fore.CYAN})
 
-            except Exception as e:
-                logger.error(f"Error updating file {file_path}: {e}")
-                success = False
-                if stop_on_failure:
-                    raise  # Немедленное прерывание, если флаг установлен
+def verify_staged_version(stage_dir, files, expected_hashes):
+    """
+    Проверяет собранную версию: хэши скачанных файлов совпадают с найденными
+    при проверке обновлений, все модули импортируются в отдельном процессе.
+
+    :raises RuntimeError: Если проверка не пройдена.
+    """
+    for file_path, expected_hash in expected_hashes.items():
+        staged_path = os.path.join(stage_dir, file_path)
+        if os.path.exists(staged_path) and local_file_hash(staged_path) != expected_hash:
+            raise RuntimeError(
+                f"Hash mismatch for {file_path}: remote file changed since the update check.")
+
+    modules = [os.path.splitext(file_path)[0].replace("/", ".")
+               for file_path in files if file_path.endswith(".py")]
+    if not modules:
+        return
+
+    # Пробный импорт в одноразовой копии, чтобы побочные файлы (temp, логи) не попали в версию
+    scratch_dir = tempfile.mkdtemp(prefix="update_check_")
+    try:
+        shutil.copytree(stage_dir, scratch_dir, dirs_exist_ok=True)
+        copy_files(["settings.txt"], ".", scratch_dir)
+        result = subprocess.run(
+            [sys.executable, "-B", "-c",
+             "import importlib, sys\n"
+             "for name in sys.argv[1:]:\n"
+             "    importlib.import_module(name)",
+             *modules],
+            cwd=scratch_dir, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, timeout=SMOKE_TEST_TIMEOUT)
+        if result.returncode != 0:
+            error = result.stderr.decode("utf-8", "replace").strip().splitlines()
+            raise RuntimeError(
+                f"Import check failed: {error[-1] if error else result.returncode}")
+        logger.debug(f"Import check passed for {len(modules)} modules.")
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def snapshot_current_version(files):
+    """
+    Сохраняет текущие файлы как версию (текущую по метке или новую).
+
+    :return: Идентификатор сохранённой версии.
+    """
+    version_id = current_version_id() or new_version_id()
+    version_dir = os.path.join(VERSIONS_DIR, version_id)
+    # Файлы могли быть изменены вручную, поэтому снимок всегда обновляется
+    if os.path.exists(version_dir):
+        shutil.rmtree(version_dir)
+    os.makedirs(version_dir)
+    copy_files(files, ".", version_dir)
+    set_current_version(version_id)
+    return version_id
+
+
+def switch_to_version(stage_dir, files, rollback_id):
+    """
+    Переключает рабочие файлы на собранную версию.
+    Перед заменой записывается журнал: если процесс прервётся посреди замены,
+    update_recovery.recover_interrupted_update() при следующем запуске main.py
+    (до импорта остальных модулей) вернёт версию rollback_id.
+    """
+    write_file_atomic(SWITCH_JOURNAL_FILE, json.dumps(
+        {"rollback_to": rollback_id, "files": files}).encode("utf-8"))
+    try:
+        replace_files(stage_dir, files)
+    except Exception:
+        logger.error(f"Switch failed. Restoring version {rollback_id}...")
+        # Если восстановление тоже не удалось, журнал остаётся для следующего запуска
+        restore_version(rollback_id)
+        os.remove(SWITCH_JOURNAL_FILE)
+        raise
+    os.remove(SWITCH_JOURNAL_FILE)
+
 
-        return success
+def prune_versions(keep):
+    """
+    Оставляет текущую версию и keep предыдущих, остальные удаляет.
+    """
+    current = current_version_id()
+    previous = [version for version in list_versions() if version != current]
+    for version_id in previous[:-keep]:
+        shutil.rmtree(os.path.join(VERSIONS_DIR, version_id), ignore_errors=True)
+        logger.debug(f"Old version removed: {version_id}")
+
+
+def rollback_update(version_id=None):
+    """
+    Мгновенный откат к сохранённой версии (по умолчанию — предыдущей).
+    Запуск: python update_manager.py --rollback [ID]
+
+    :return: Идентификатор восстановленной версии или None.
+    """
+    if version_id is None:
+        current = current_version_id()
+        older = [version for version in list_versions()
+                 if current is None or version < current]
+        if not older:
+            logger.error("No previous version to roll back to.")
+            return None
+        version_id = older[-1]
+    try:
+        restore_version(version_id)
+        logger.info(f"Rolled back to version {version_id}.",
+                    extra={'color': Fore.YELLOW})
+        return version_id
+    except Exception as e:
+        logger.error(f"Rollback to version {version_id} failed: {e}")
+        return None
 
 
 # ========================= Основная логика ==========================
@@ -249,17 +463,144 @@ def calculate_hash(content):
         sha256.update(content)
         return sha256.hexdigest()
 
+
+def build_raw_url(repo_url, branch, file_path):
+    """
+    Формирует URL файла на raw.githubusercontent.com.
+    """
+    if repo_url.endswith(".git"):
+        repo_url = repo_url[:-4]
+    owner, repo = repo_url.rstrip("/").split("/")[-2:]
+    return f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{file_path}"
+
+
+def local_file_hash(file_path):
+    """
+    Возвращает SHA256 локального файла или None, если файла нет.
+    """
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "rb") as f:
+        return calculate_hash(f.read())
+
+
+def load_update_cache():
+    """
+    Загружает сохранённые ETag и хэши удалённых файлов.
+    """
+    if not os.path.exists(UPDATE_CACHE_FILE):
+        return {}
+    try:
+        with open(UPDATE_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.debug(f"Failed to load update cache: {e}")
+        return {}
+
+
+def save_update_cache(cache):
+    try:
+        if not os.path.exists(os.path.dirname(UPDATE_CACHE_FILE)):
+            os.makedirs(os.path.dirname(UPDATE_CACHE_FILE))
+        with open(UPDATE_CACHE_FILE, "w") as f:
+            json.dump(cache, f, indent=4)
+    except Exception as e:
+        logger.debug(f"Failed to save update cache: {e}")
+
+
+def conditional_get(url, cache):
+    """
+    Выполняет GET с заголовком If-None-Match по сохранённому ETag.
+
+    :return: Содержимое ответа или None, если файл не изменился (304).
+    """
+    headers = {}
+    entry = cache.get(url)
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+
+    response = requests.get(url, headers=headers, timeout=10)
+    if response.status_code == 304 and entry:
+        logger.debug(f"Not modified: {url}")
+        return None
+    response.raise_for_status()
+
+    cache[url] = {
+        "etag": response.headers.get("ETag"),
+        "sha256": calculate_hash(response.content),
+    }
+    return response.content
+
+
+def fetch_cached_content(url, cache):
+    """
+    Возвращает содержимое небольшого удалённого файла, используя кэш при ответе 304.
+    """
+    content = conditional_get(url, cache)
+    if content is None:
+        content = cache[url].get("content", "").encode("utf-8")
+    else:
+        cache[url]["content"] = content.decode("utf-8")
+    return content
+
+
+def fetch_manifest(repo_url, branch, cache):
+    """
+    Загружает манифест обновлений {путь: sha256}.
+
+    :return: Словарь хэшей или None, если манифест недоступен.
+    """
+    try:
+        content = fetch_cached_content(
+            build_raw_url(repo_url, branch, MANIFEST_FILE), cache)
+        manifest = json.loads(content.decode("utf-8"))
+        return manifest.get("files", {})
+    except Exception as e:
+        logger.debug(f"Update manifest is not available: {e}")
+        return None
+
+
+def generate_manifest(files_list="remote_files_for_update", manifest_path=MANIFEST_FILE):
+    """
+    Создаёт манифест обновлений с хэшами файлов из списка.
+    Запускается при подготовке релиза: python update_manager.py --manifest
+    """
+    with open(files_list, "r", encoding="utf-8") as f:
+        files = [line.strip() for line in f if line.strip()]
+    manifest = {"files": {file_path: local_file_hash(file_path)
+                          for file_path in files if os.path.exists(file_path)}}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+def request_restart():
+    """
+    Запрашивает плавный перезапуск: main.py перестаёт запускать новые аккаунты,
+    дожидается завершения текущего, сохраняет очередь и вызывает restart_script().
+    """
+    stop_event.restart_mode = True
+    drain_event.set()
+
+
 def restart_script():
     # signal.signal(signal.SIGINT, signal.default_int_handler)
-    """Перезапускает текущий скрипт."""
+    """
+    Перезапускает текущий скрипт, заменяя процесс новым (exec),
+    чтобы интерпретаторы не вкладывались друг в друга при каждом обновлении.
+    """
     python = sys.executable  # Путь к Python
     args = [python] + sys.argv  # Все аргументы командной строки
+    if os.name == "nt":
+        # На Windows execv передаёт аргументы одной строкой, пути с пробелами нужно экранировать
+        args = [subprocess.list2cmdline([arg]) for arg in args]
     try:
-        # Создаём новый процесс
+        # Заменяем текущий процесс
         GlobalFlags.interrupted = True
         logger.info("Restarting script...",
                     extra={'color': Fore.YELLOW})
-        os.spawnv(os.P_WAIT, python, args)
+        for handler in logger.handlers:
+            handler.flush()
+        os.execv(python, args)
 
     except KeyboardInterrupt:
         if not GlobalFlags.interrupted:  # Обрабатываем только один раз
@@ -303,9 +644,8 @@ def check_and_update(priority_task_queue, is_task_active):
                         extra={'color': Fore.CYAN})
             if GitUpdater.perform_update():
                 logger.debug(
-                    "Update successful. Stopping processes for restart...")
-                stop_event.set()  # Останавливаем потоки
-                stop_event.restart_mode = True
+                    "Update successful. Draining processes for restart...")
+                request_restart()
         else:
             updates_available, update_files = FileUpdater.check_updates()
             if updates_available:
@@ -315,8 +655,7 @@ def check_and_update(priority_task_queue, is_task_active):
                     if FileUpdater.perform_update(
                         update_files, settings.get("REPOSITORY_URL")
                     ):
-                        stop_event.set()  # Останавливаем потоки
-                        stop_event.restart_mode = True
+                        request_restart()
                 else:
                     logger.info(
                         "Automatic updates are disabled. Updates available:", extra={'color': Fore.CYAN})
@@ -327,3 +666,27 @@ def check_and_update(priority_task_queue, is_task_active):
 
     except Exception as e:
         logger.error(f"Error during check_and_update: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    setup_logger()
+    parser = argparse.ArgumentParser(description="Update manager utilities.")
+    parser.add_argument("--manifest", action="store_true",
+                        help=f"Generate {MANIFEST_FILE} from remote_files_for_update")
+    parser.add_argument("--list-versions", action="store_true",
+                        help="List saved versions")
+    parser.add_argument("--rollback", nargs="?", const="", metavar="VERSION",
+                        help="Restore a saved version (the previous one by default)")
+    args = parser.parse_args()
+    if args.manifest:
+        manifest = generate_manifest()
+        print(f"{MANIFEST_FILE} written with {len(manifest['files'])} files.")
+    if args.list_versions:
+        current = current_version_id()
+        for version_id in list_versions():
+            print(f"{version_id}{'  (current)' if version_id == current else ''}")
+    if args.rollback is not None:
+        if rollback_update(args.rollback or None) is None:
+            sys.exit(1)
@@ -0,0 +1,119 @@
+"""
+Восстановление после прерванного обновления файлов.
+
+Модуль импортирует только стандартную библиотеку и вызывается в самом начале main.py,
+до импорта остальных модулей проекта: если процесс прервался посреди замены файлов,
+рядом могут оказаться модули разных версий, и их импорт завершится ошибкой раньше,
+чем журнал замены будет обработан.
+Интерфейс recover_interrupted_update() и restart() не должен меняться между версиями.
+"""
+import os
+import sys
+import json
+import shutil
+import subprocess
+import logging
+
+logger = logging.getLogger("application_logger")
+VERSIONS_DIR = os.path.join("temp", "versions")  # Сохранённые версии файлов
+CURRENT_VERSION_FILE = os.path.join(VERSIONS_DIR, "current")  # Метка текущей версии
+SWITCH_JOURNAL_FILE = os.path.join(VERSIONS_DIR, "switch.json")  # Журнал незавершённой замены
+ENTRY_POINT = "main.py"  # Заменяется последним: новый main.py появляется только рядом с новыми модулями
+
+
+def write_file_atomic(path, content):
+    """
+    Записывает файл через временный файл и os.replace: читатель видит
+    либо старое, либо новое содержимое целиком.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def current_version_id():
+    try:
+        with open(CURRENT_VERSION_FILE, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current_version(version_id):
+    write_file_atomic(CURRENT_VERSION_FILE, version_id.encode("utf-8"))
+
+
+def replace_files(source_dir, files):
+    """
+    Заменяет рабочие файлы файлами из source_dir через os.replace.
+    Копия создаётся рядом с целевым файлом, чтобы замена шла в пределах одной файловой системы.
+    ENTRY_POINT заменяется последним.
+    """
+    for file_path in sorted(files, key=lambda path: path == ENTRY_POINT):
+        source = os.path.join(source_dir, file_path)
+        if not os.path.exists(source):
+            continue
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{file_path}.update_tmp"
+        shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, file_path)
+
+
+def restore_version(version_id):
+    """
+    Возвращает рабочие файлы к сохранённой версии.
+    """
+    version_dir = os.path.join(VERSIONS_DIR, version_id)
+    if not os.path.isdir(version_dir):
+        raise FileNotFoundError(f"Version {version_id} not found.")
+    files = []
+    for root, _, names in os.walk(version_dir):
+        for name in names:
+            files.append(os.path.relpath(
+                os.path.join(root, name), version_dir).replace(os.sep, "/"))
+    replace_files(version_dir, files)
+    set_current_version(version_id)
+
+
+def recover_interrupted_update():
+    """
+    Завершает прерванное переключение версии: если остался журнал,
+    файлы возвращаются к версии, сохранённой перед заменой.
+
+    :return: True, если файлы были восстановлены (нужен перезапуск).
+    """
+    if not os.path.exists(SWITCH_JOURNAL_FILE):
+        return False
+    try:
+        with open(SWITCH_JOURNAL_FILE, "r") as f:
+            rollback_id = json.load(f)["rollback_to"]
+        logger.warning(
+            f"Interrupted update detected. Restoring version {rollback_id}...")
+        restore_version(rollback_id)
+        os.remove(SWITCH_JOURNAL_FILE)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to recover interrupted update: {e}")
+        return False
+
+
+def restart():
+    """
+    Перезапускает скрипт с теми же аргументами (exec), чтобы загрузить восстановленные файлы.
+    """
+    python = sys.executable
+    args = [python] + sys.argv
+    if os.name == "nt":
+        # На Windows execv передаёт аргументы одной строкой, пути с пробелами нужно экранировать
+        args = [subprocess.list2cmdline([arg]) for arg in args]
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.execv(python, args)
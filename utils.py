@@ -7,10 +7,9 @@ import atexit
 import sys
 import re
 import ctypes
-import requests
-import importlib
 import time
-import glob
+from settings_manager import settings_manager
+from profile_inventory import profile_inventory
 
 # Инициализация colorama для Windows
 init(autoreset=True)
@@ -19,9 +18,11 @@ init(autoreset=True)
 stop_event = threading.Event()
 visible = threading.Event()
 stop_event.restart_mode = False
+# Плавная остановка перед перезапуском: новые аккаунты не запускаются, текущий дорабатывает
+drain_event = threading.Event()
 
-# Глобальная переменная для логгера
-logger = None
+# Логгер приложения (обработчики добавляет setup_logger при запуске)
+logger = logging.getLogger("application_logger")
 # Класс для форматирования логов
 # Цвета для Windows API (альтернативный способ)
 WINDOWS_COLORS = {
@@ -267,30 +268,12 @@ def setup_logger(debug_mode=False, log_to_file=False, log_file_size=512 * 1024,
 
 # Загрузка настроек
 def load_settings():
-    settings = {}
-    try:
-        with open('settings.txt', 'r', encoding='utf-8') as f:
-            for line in f:
-                # Удаляем лишние пробелы и проверяем пустую строку или комментарий
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue  # Пропускаем пустые строки и комментарии
-
-                # Проверяем наличие символа '='
-                if '=' not in line:
-                    logging.warning(f"Ignoring invalid setting: {line}")
-                    continue
-
-                # Разделяем только по первому '='
-                key, value = line.split('=', 1)
-                # Удаляем комментарии из значения
-                value = value.split('#')[0].strip()
-                settings[key.strip()] = value
-    except FileNotFoundError:
-        logging.error("Settings file 'settings.txt' not found.")
-    except Exception as e:
-        logging.error(f"Error reading settings file: {e}")
-    return settings
+    """
+    Возвращает настройки из settings.txt.
+    Файл разбирается заново только если изменился (см. settings_manager).
+    """
+    settings_manager.reload()
+    return settings_manager.as_dict()
 # Функция для настройки логирования
 
 
@@ -298,15 +281,8 @@ def is_debug_enabled():
     """
     Проверяет, включён ли режим DEBUG для глобального логгера.
     """
-    global logger
-    if logger is None:
-        setup_logger()
     return logger.isEnabledFor(logging.DEBUG)
 
-
-# Настроим логирование (если не было настроено ранее)
-logger = setup_logger(debug_mode=False, log_dir="./log")
-
 balances = []
 
 
@@ -359,44 +335,18 @@ def parse_accounts_parameter(accounts_param):
 
 def get_all_profiles():
     """
-    Retrieves all profiles via the AdsPower local API.
+    Retrieves all profiles from the AdsPower profile inventory cache.
+    The cache is filled on first use and refreshed in the background (see profile_inventory).
     """
-    url = "http://localhost:50325/api/v1/user/list"
-    page = 1
-    profiles = []
-
-    while True:
-        params = {"page": page, "page_size": 100}
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-
-            data = response.json()
-            if data.get("code") != 0:
-                logger.debug(f"API error: {data.get('msg')}")
-                break
-
-            current_profiles = data["data"]["list"]
-            if not current_profiles:
-                break
-
-            profiles.extend(current_profiles)
-            page += 1
-
-            stop_event.wait(1)
-        except requests.RequestException as e:
-            logger.debug(f"An error occurred while accessing the API: {e}")
-            break
-
-    return profiles
+    profile_inventory.ensure_loaded()
+    return profile_inventory.all_profiles()
 
 
 def get_accounts():
     """
     Determines the list of accounts to process.
     """
-    settings = load_settings()
-    accounts_param = settings.get('ACCOUNTS', '').strip()
+    accounts_param = settings_manager.value('ACCOUNTS').strip()
 
     if accounts_param:
         accounts = parse_accounts_parameter(accounts_param)
@@ -417,11 +367,13 @@ def get_accounts():
         logger.debug(f"{accounts_from_file}")
         return accounts_from_file
 
-    # Retrieve all profiles
-    profiles = get_all_profiles()
-    if profiles:
-        accounts_from_profiles = [profile['serial_number']
-                                  for profile in profiles]
+    # Retrieve profiles from the inventory cache, filtered by group and tags
+    profile_inventory.ensure_loaded()
+    group = settings_manager.value('ACCOUNT_GROUP').strip() or None
+    tags = [tag.strip() for tag in settings_manager.value(
+        'ACCOUNT_TAGS').split(',') if tag.strip()]
+    accounts_from_profiles = profile_inventory.serial_numbers(group=group, tags=tags)
+    if accounts_from_profiles:
         logger.info(f"Accounts retrieved from ADS profiles")
         logger.debug(f"{accounts_from_profiles}")
         return accounts_from_profiles
@@ -465,12 +417,21 @@ def get_max_games(settings):
     return None  # Если max_games не задано или указано некорректно, возвращаем None
 
 
+def requirement_name(requirement):
+    """
+    Возвращает имя пакета из строки requirements.txt без версии, extras и маркеров.
+    """
+    requirement = requirement.split("#")[0].split(";")[0].strip()
+    return re.split(r"[\[<>=!~ ]", requirement, maxsplit=1)[0]
+
+
 def check_requirements(requirements_file="requirements.txt"):
     """
     Проверяет зависимости из файла requirements.txt.
     Если зависимости отсутствуют, выводит предупреждение и завершает выполнение.
     :param requirements_file: Путь к файлу requirements.txt
     """
+    from importlib import metadata
 
     try:
         # Читаем зависимости из requirements.txt
@@ -479,11 +440,13 @@ def check_requirements(requirements_file="requirements.txt"):
 
         missing_packages = []
         for req in requirements:
-            # Удаляем указание версии (если есть) для проверки пакета
-            package = req.split("==")[0].strip()
+            package = requirement_name(req)
+            if not package:
+                continue
+            # Проверяем установленный дистрибутив без импорта самого пакета
             try:
-                importlib.import_module(package)
-            except ImportError:
+                metadata.version(package)
+            except metadata.PackageNotFoundError:
                 missing_packages.append(req)
 
         # Если есть недостающие зависимости